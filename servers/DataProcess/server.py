@@ -1,14 +1,34 @@
 from typing import List, Tuple, Any
 import numpy as np
 from mcp.server import FastMCP
+from mcp.server.fastmcp import Context
 from sklearn.preprocessing import MinMaxScaler, StandardScaler
 import mcp.types as types
 
-mcp = FastMCP()
+# Data plane of the proxy server (`pip install mcp-proxy-exec`), to exchange large arrays as payloads or
+# shared-memory handles. Without it, arrays are only exchanged as text.
+try:
+    from mpe.data_plane import (PayloadArg, ResultFormat, ChunkSize, DEFAULT_CHUNK_SIZE, chunked, format_result,
+                                load_argument, stream_result)
+except ImportError:
+    ResultFormat, ChunkSize, DEFAULT_CHUNK_SIZE = str, int, 10000
+
+    def PayloadArg(annotation: Any) -> Any:
+        return annotation
+
+    def load_argument(arg: Any) -> Any:
+        return arg
+
+    def chunked(rows, chunk_size):
+        return [list(rows)]
 
+    def format_result(value: Any, result_format: str = "text") -> List[types.TextContent]:
+        return [types.TextContent(type="text", text=str(value))]
 
-def format_response(res: Any) -> List[types.TextContent]:
-    return [types.TextContent(type="text", text=str(res))]
+    async def stream_result(ctx, chunks) -> List[types.TextContent]:
+        return format_result([row for chunk in chunks for row in chunk])
+
+mcp = FastMCP()
 
 
 def round_tuple(t: Tuple[float, ...], precision: int = 3) -> Tuple[float, ...]:
@@ -25,42 +45,52 @@ def round_tuple(t: Tuple[float, ...], precision: int = 3) -> Tuple[float, ...]:
     return tuple(round(x, precision) for x in t)
 
 
+async def _format_rows(ctx: Context, X: np.ndarray, result_format: str, chunk_size: int):
+    # Convert to tuples rounded to 3 decimal places, chunk by chunk when the result is streamed
+    rows = (round_tuple(tuple(float(x) for x in row), 3) for row in X)
+    if result_format == "stream":
+        return await stream_result(ctx, chunked(rows, chunk_size))
+    return format_result(list(rows), result_format)
+
+
 @mcp.tool()
-def min_max_scaling(data: List[Tuple[float, ...]]) -> List[Tuple[float, ...]]:
+async def min_max_scaling(data: PayloadArg(List[Tuple[float, ...]]), ctx: Context, result_format: ResultFormat = "text",
+                          chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE) -> List[Tuple[float, ...]]:
     """
     Perform Min-Max Scaling on the input data and round results to 3 decimal places.
 
     Args:
-        data (List[Tuple[float, ...]]): Input data where each tuple contains feature values.
+        data (List[Tuple[float, ...]]): Input data where each tuple contains feature values, or a payload or handle of it.
+        result_format (str): "text", "payload", "handle" or "stream", see `data_plane.format_result` and `data_plane.stream_result`.
+        chunk_size (int): Rows per chunk of a streamed result.
 
     Returns:
         List[Tuple[float, ...]]: Scaled data with values rounded to 3 decimal places.
     """
-    X = np.array(data, dtype=float)
+    X = np.array(load_argument(data), dtype=float)
     scaler = MinMaxScaler(feature_range=(0, 1))
     X_scaled = scaler.fit_transform(X)
-    # Convert to list of tuples and round each value to 3 decimal places
-    scaled_data = [round_tuple(tuple(float(x) for x in row), 3) for row in X_scaled]
-    return format_response(scaled_data)
+    return await _format_rows(ctx, X_scaled, result_format, chunk_size)
 
 
 @mcp.tool()
-def z_score_scaling(data: List[Tuple[float, ...]]) -> List[Tuple[float, ...]]:
+async def z_score_scaling(data: PayloadArg(List[Tuple[float, ...]]), ctx: Context, result_format: ResultFormat = "text",
+                          chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE) -> List[Tuple[float, ...]]:
     """
     Perform Z-Score Standardization on the input data and round results to 3 decimal places.
 
     Args:
-        data (List[Tuple[float, ...]]): Input data where each tuple contains feature values.
+        data (List[Tuple[float, ...]]): Input data where each tuple contains feature values, or a payload or handle of it.
+        result_format (str): "text", "payload", "handle" or "stream", see `data_plane.format_result` and `data_plane.stream_result`.
+        chunk_size (int): Rows per chunk of a streamed result.
 
     Returns:
         List[Tuple[float, ...]]: Standardized data with values rounded to 3 decimal places.
     """
-    X = np.array(data, dtype=float)
+    X = np.array(load_argument(data), dtype=float)
     scaler = StandardScaler()
     X_standardized = scaler.fit_transform(X)
-    # Convert to list of tuples and round each value to 3 decimal places
-    standardized_data = [round_tuple(tuple(float(x) for x in row), 3) for row in X_standardized]
-    return format_response(standardized_data)
+    return await _format_rows(ctx, X_standardized, result_format, chunk_size)
 
 
 mcp.run()
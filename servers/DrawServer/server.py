@@ -6,13 +6,30 @@ import uuid
 import warnings
 import numpy as np
 import matplotlib.pyplot as plt
+from typing import Any, Dict, Optional
 
 warnings.filterwarnings("ignore", category=UserWarning, message=".*parsable as floats or dates*")
 
 from mcp.server import FastMCP
 
+# Data plane of the proxy server (`pip install mcp-proxy-exec`), to receive large arrays as payloads or
+# shared-memory handles. Without it, arrays are only received as values.
+try:
+    from mpe.data_plane import PayloadArg, StreamInfo, load_argument
+except ImportError:
+    StreamInfo = Optional[Dict[str, Any]]
+
+    def PayloadArg(annotation: Any) -> Any:
+        return annotation
+
+    def load_argument(arg: Any) -> Any:
+        return arg
+
 mcp = FastMCP()
 
+# Figures of scatter plots drawn chunk by chunk, by stream identifier
+_figures: Dict[str, Any] = {}
+
 # Create static directory
 STATIC_DIR = "static"
 if not os.path.exists(STATIC_DIR):
@@ -33,7 +50,8 @@ def _save(plt):
 
 
 @mcp.tool()
-def create_scatter(x_data, y_data, x_name="", y_name="", classify=None, describe=""):
+def create_scatter(x_data: PayloadArg(Any), y_data: PayloadArg(Any), x_name="", y_name="", classify=None, describe="",
+                   stream: StreamInfo = None):
     """
     Creates and returns a scatter plot.
 
@@ -60,6 +78,10 @@ def create_scatter(x_data, y_data, x_name="", y_name="", classify=None, describe
     describe : str, optional
         Description or title of the overall chart.
 
+    stream : dict, optional
+        Set by the proxy when the data comes in chunks. The points of each chunk are drawn as they arrive,
+        and the image is saved on the final call.
+
     Returns:
     --------
     str: Path to the generated image.
@@ -75,13 +97,26 @@ def create_scatter(x_data, y_data, x_name="", y_name="", classify=None, describe
         describe="Income vs Age of Residents"
     )
     """
-    if isinstance(x_data[0], (list, tuple)):
+    x_data, y_data = load_argument(x_data), load_argument(y_data)
+    if len(x_data) and isinstance(x_data[0], (list, tuple)):
         x_data = [item[0] for item in x_data]
 
-    if isinstance(y_data[0], (list, tuple)):
+    if len(y_data) and isinstance(y_data[0], (list, tuple)):
         y_data = [item[0] for item in y_data]
 
-    plt.figure(figsize=(10, 6))
+    if stream is not None and stream.get("abort"):
+        figure = _figures.pop(stream["id"], None)
+        if figure is not None:
+            plt.close(figure)
+        return ""
+
+    # The chunks of a stream are drawn on the same figure
+    if stream is None or stream["id"] not in _figures:
+        figure = plt.figure(figsize=(10, 6))
+        if stream is not None:
+            _figures[stream["id"]] = figure
+    else:
+        plt.figure(_figures[stream["id"]].number)
 
     # Check if x_data and y_data are one-dimensional
     if not isinstance(x_data, (list, np.ndarray)) or not isinstance(y_data, (list, np.ndarray)):
@@ -93,7 +128,16 @@ def create_scatter(x_data, y_data, x_name="", y_name="", classify=None, describe
     if classify and len(classify) != 1:
         raise ValueError("Only a single classification label is supported")
 
-    if classify:
+    if stream is not None:
+        # One color for all chunks, the label is added with the final (empty) chunk
+        if classify and stream.get("final"):
+            plt.scatter(x_data, y_data, color="C0", label=classify[0])
+        else:
+            plt.scatter(x_data, y_data, color="C0")
+        if not stream.get("final"):
+            return ""
+        _figures.pop(stream["id"])
+    elif classify:
         plt.scatter(x_data, y_data, label=classify[0])
     else:
         plt.scatter(x_data, y_data)
@@ -112,7 +156,7 @@ def create_scatter(x_data, y_data, x_name="", y_name="", classify=None, describe
 
 
 @mcp.tool()
-def create_pie(x_data, y_data, x_name="", y_name="", classify=None, describe=""):
+def create_pie(x_data: PayloadArg(Any), y_data: PayloadArg(Any), x_name="", y_name="", classify=None, describe=""):
     """
     Creates and returns a pie chart showing the proportional distribution of categorical data.
 
@@ -152,6 +196,7 @@ def create_pie(x_data, y_data, x_name="", y_name="", classify=None, describe="")
         describe="Fruit Sales Distribution"
     )
     """
+    x_data, y_data = load_argument(x_data), load_argument(y_data)
     plt.figure(figsize=(10, 8))
 
     if isinstance(x_data[0], (list, tuple)):
@@ -194,7 +239,7 @@ def create_pie(x_data, y_data, x_name="", y_name="", classify=None, describe="")
 
 
 @mcp.tool()
-def create_bar(x_data, y_data, x_name="", y_name="", classify=None, describe=""):
+def create_bar(x_data: PayloadArg(Any), y_data: PayloadArg(Any), x_name="", y_name="", classify=None, describe=""):
     """
     Creates and returns a bar chart showing the distribution of categorical data.
 
@@ -234,6 +279,7 @@ def create_bar(x_data, y_data, x_name="", y_name="", classify=None, describe="")
         describe="Fruit Sales Comparison"
     )
     """
+    x_data, y_data = load_argument(x_data), load_argument(y_data)
     plt.figure(figsize=(10, 6))
 
     if isinstance(x_data[0], (list, tuple)):
@@ -275,7 +321,7 @@ def create_bar(x_data, y_data, x_name="", y_name="", classify=None, describe="")
 
 
 @mcp.tool()
-def create_line(x_data, y_data, x_name="", y_name="", classify=None, describe=""):
+def create_line(x_data: PayloadArg(Any), y_data: PayloadArg(Any), x_name="", y_name="", classify=None, describe=""):
     """
     Creates and returns a line chart showing trends over time or another variable.
 
@@ -317,6 +363,7 @@ def create_line(x_data, y_data, x_name="", y_name="", classify=None, describe=""
         describe="Monthly Sales Trend of Company A"
     )
     """
+    x_data, y_data = load_argument(x_data), load_argument(y_data)
     plt.figure(figsize=(12, 6))
 
     if isinstance(x_data[0], (list, tuple)):
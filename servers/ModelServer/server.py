@@ -3,7 +3,7 @@ import os
 import uuid
 import joblib
 import numpy as np
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 from sklearn.linear_model import LinearRegression
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.ensemble import RandomForestRegressor
@@ -14,6 +14,19 @@ from mcp import Tool
 from mcp.types import TextContent
 from agentscope.service import ServiceExecStatus, ServiceResponse
 
+# Data plane of the proxy server (`pip install mcp-proxy-exec`), to receive large arrays as payloads or
+# shared-memory handles. Without it, arrays are only received as values.
+try:
+    from mpe.data_plane import PayloadArg, StreamInfo, load_argument
+except ImportError:
+    StreamInfo = Optional[Dict[str, Any]]
+
+    def PayloadArg(annotation: Any) -> Any:
+        return annotation
+
+    def load_argument(arg: Any) -> Any:
+        return arg
+
 # Initialize the FastMCP server instance
 mcp = FastMCP()
 
@@ -25,12 +38,17 @@ if not os.path.exists(MODEL_DIR):
     os.makedirs(MODEL_DIR)
 
 
+# Normal equations (X^T X, X^T y) accumulated over the chunks of streamed training data, by stream identifier
+_normal_equations: Dict[str, List[np.ndarray]] = {}
+
+
 def _gen_model_id():
     return "aaa" + str(uuid.uuid4()) + "aaa"
 
 
 @mcp.tool()
-def train_linear_regression(features: List[Tuple], labels: List[Tuple]) -> str:
+def train_linear_regression(features: PayloadArg(List[Tuple]), labels: PayloadArg(List[Tuple]),
+                            stream: StreamInfo = None) -> str:
     """
     Train a Linear Regression model using the provided features and labels.
     The trained model is saved locally, and a unique model identifier is returned.
@@ -38,15 +56,40 @@ def train_linear_regression(features: List[Tuple], labels: List[Tuple]) -> str:
     Args:
         features (List[Tuple]): A list of feature tuples for training.
         labels (List[Tuple]): A list of target values in singleton tuples like [(y1,), (y2,), ...].
+        stream (Optional[Dict[str, Any]]): Set by the proxy when the data comes in chunks. The model
+            is fitted on the final call, from the normal equations accumulated over the chunks.
 
     Returns:
         str: A unique identifier for the saved model.
     """
-    X = np.array(features)
-    y = np.array([label[0] for label in labels])  # Flatten labels from [(y1,), (y2,)] to [y1, y2]
-
-    model = LinearRegression()
-    model.fit(X, y)
+    X = np.array(load_argument(features), dtype=float)
+    y = np.array([label[0] for label in load_argument(labels)], dtype=float)  # Flatten labels from [(y1,), (y2,)] to [y1, y2]
+
+    if stream is None:
+        model = LinearRegression()
+        model.fit(X, y)
+    else:
+        if stream.get("abort"):
+            _normal_equations.pop(stream["id"], None)
+            return ""
+
+        if len(X):
+            # Append a column of ones for the intercept
+            X1 = np.hstack([X, np.ones((len(X), 1))])
+            if stream["id"] not in _normal_equations:
+                _normal_equations[stream["id"]] = [np.zeros((X1.shape[1], X1.shape[1])), np.zeros(X1.shape[1])]
+            xtx, xty = _normal_equations[stream["id"]]
+            xtx += X1.T @ X1
+            xty += X1.T @ y
+        if not stream.get("final"):
+            return ""
+
+        if stream["id"] not in _normal_equations:
+            raise ValueError("No training data was received.")
+        xtx, xty = _normal_equations.pop(stream["id"])
+        coef = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+        model = LinearRegression()
+        model.coef_, model.intercept_, model.n_features_in_ = coef[:-1], coef[-1], len(coef) - 1
 
     model_id = _gen_model_id()
     model_path = os.path.join(MODEL_DIR, f'{model_id}.joblib')
@@ -56,7 +99,7 @@ def train_linear_regression(features: List[Tuple], labels: List[Tuple]) -> str:
 
 
 @mcp.tool()
-def train_decision_tree(features: List[Tuple], labels: List[Tuple]) -> str:
+def train_decision_tree(features: PayloadArg(List[Tuple]), labels: PayloadArg(List[Tuple])) -> str:
     """
     Train a Decision Tree Regressor using the provided features and labels.
     The trained model is saved locally, and a unique model identifier is returned.
@@ -68,8 +111,8 @@ def train_decision_tree(features: List[Tuple], labels: List[Tuple]) -> str:
     Returns:
         str: A unique identifier for the saved model.
     """
-    X = np.array(features)
-    y = np.array([label[0] for label in labels])
+    X = np.array(load_argument(features))
+    y = np.array([label[0] for label in load_argument(labels)])
 
     model = DecisionTreeRegressor(random_state=42)
     model.fit(X, y)
@@ -82,7 +125,7 @@ def train_decision_tree(features: List[Tuple], labels: List[Tuple]) -> str:
 
 
 @mcp.tool()
-def train_random_forest(features: List[Tuple], labels: List[Tuple]) -> str:
+def train_random_forest(features: PayloadArg(List[Tuple]), labels: PayloadArg(List[Tuple])) -> str:
     """
     Train a Random Forest Regressor using the provided features and labels.
     The trained model is saved locally, and a unique model identifier is returned.
@@ -94,8 +137,8 @@ def train_random_forest(features: List[Tuple], labels: List[Tuple]) -> str:
     Returns:
         str: A unique identifier for the saved model.
     """
-    X = np.array(features)
-    y = np.array([label[0] for label in labels])
+    X = np.array(load_argument(features))
+    y = np.array([label[0] for label in load_argument(labels)])
 
     model = RandomForestRegressor(n_estimators=3, random_state=42)
     model.fit(X, y)
@@ -108,7 +151,7 @@ def train_random_forest(features: List[Tuple], labels: List[Tuple]) -> str:
 
 
 @mcp.tool()
-def train_svm(features: List[Tuple], labels: List[Tuple]) -> str:
+def train_svm(features: PayloadArg(List[Tuple]), labels: PayloadArg(List[Tuple])) -> str:
     """
     Train a Support Vector Machine (SVM) regressor using the provided features and labels.
     The trained model is saved locally, and a unique model identifier is returned.
@@ -120,8 +163,8 @@ def train_svm(features: List[Tuple], labels: List[Tuple]) -> str:
     Returns:
         str: A unique identifier for the saved model.
     """
-    X = np.array(features)
-    y = np.array([label[0] for label in labels])
+    X = np.array(load_argument(features))
+    y = np.array([label[0] for label in load_argument(labels)])
 
     kernel = "linear"  # Supported kernels are 'linear', 'poly', 'rbf', 'sigmoid'. Defaults to 'rbf'.
 
@@ -136,7 +179,7 @@ def train_svm(features: List[Tuple], labels: List[Tuple]) -> str:
 
 
 @mcp.tool()
-def model_predict(model_id: str, features: List[Tuple]) -> List[Tuple]:
+def model_predict(model_id: str, features: PayloadArg(List[Tuple])) -> List[Tuple]:
     """
     Make predictions using a previously trained model identified by model_id.
     The function loads the model from disk, performs prediction on the provided features,
@@ -158,7 +201,7 @@ def model_predict(model_id: str, features: List[Tuple]) -> List[Tuple]:
         raise FileNotFoundError(f"Model with ID {model_id} does not exist.")
 
     model = joblib.load(model_path)
-    X = np.array(features)
+    X = np.array(load_argument(features))
     predictions = model.predict(X)
 
     # Wrap each prediction into a singleton tuple
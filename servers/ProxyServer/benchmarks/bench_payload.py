@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the throughput of proxied intermediates passed as text (str /
+literal_eval) against msgpack and Arrow payloads. A producer tool returns
+rows shaped like the `housing.csv` data and a consumer tool counts them;
+the proxy passes the rows from one to the other.
+
+Usage:
+    python bench_payload.py --rows 10000 100000 1000000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Annotated, Any
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from pydantic import Field
+
+MPE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mpe"))
+PROXY_SERVER = os.path.join(MPE, "server.py")
+sys.path.insert(0, MPE)
+
+from payload import Payload, PAYLOAD_SCHEMA_MARKER, load_argument
+
+
+def make_rows(n):
+    """Rows of (longitude, latitude, housing_median_age, median_house_value, ocean_proximity)."""
+    proximity = ["NEAR BAY", "<1H OCEAN", "INLAND", "NEAR OCEAN", "ISLAND"]
+    return [(-122.23 + i * 1e-5, 37.88 - i * 1e-5, i % 52, 452600.0 - i % 1000, proximity[i % 5]) for i in range(n)]
+
+
+def serve():
+    """Run the producer and consumer tools as an MCP server."""
+    from mcp.server import FastMCP
+
+    server = FastMCP()
+
+    @server.tool()
+    def produce(n: int, format: str = "text") -> Any:
+        rows = make_rows(n)
+        if format == "text":
+            return str(rows)
+        if format == "arrow":
+            import pyarrow
+            columns = list(zip(*rows))
+            names = ["longitude", "latitude", "housing_median_age", "median_house_value", "ocean_proximity"]
+            return Payload.encode(pyarrow.table(dict(zip(names, columns))), "arrow").to_resource()
+        return Payload.encode(rows, format).to_resource()
+
+    @server.tool()
+    def consume(data: Annotated[Any, Field(json_schema_extra={PAYLOAD_SCHEMA_MARKER: True})]) -> int:
+        return len(load_argument(data))
+
+    server.run(transport="stdio")
+
+
+# Servers are spawned with a minimal environment, keep the import path of the payload libraries
+ENV = {"PYTHONPATH": os.environ["PYTHONPATH"]} if "PYTHONPATH" in os.environ else {}
+
+
+def proxy_args(n, format):
+    return {
+        "target_tool": "consume",
+        "tool_args": {
+            "data": {"__tool__": "produce", "args": {"n": n, "format": format}, "identifier": "rows"},
+        },
+        "server_config": {
+            "mcpServers": {"bench": {"command": sys.executable, "args": [os.path.abspath(__file__), "--serve"], "env": ENV}},
+        },
+    }
+
+
+async def main(args):
+    params = StdioServerParameters(command=sys.executable, args=[PROXY_SERVER], env=ENV)
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            # Spawn the benchmark server before measuring
+            await session.call_tool("proxy", proxy_args(1, "text"))
+
+            for n in args.rows:
+                for format in args.formats:
+                    latencies = []
+                    for run in range(args.n_runs):
+                        start = time.perf_counter()
+                        result = await session.call_tool("proxy", proxy_args(n, format))
+                        latencies.append(time.perf_counter() - start)
+                        if result.isError or result.content[0].text != str(n):
+                            print(f"{format} with {n} rows failed: {result.content}")
+                            break
+                    else:
+                        latency = statistics.median(latencies)
+                        print(f"{n:>8} rows {format:>8}: p50={latency:.3f}s, {n / latency:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        serve()
+        sys.exit()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="Numbers of intermediate rows.")
+    parser.add_argument("--formats", nargs="+", default=["text", "msgpack", "arrow"], help="Formats of the intermediates.")
+    parser.add_argument("--n_runs", type=int, default=3, help="Runs per size and format.")
+    asyncio.run(main(parser.parse_args()))
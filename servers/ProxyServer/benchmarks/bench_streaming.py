@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark streamed intermediates against materialized ones (shared-memory
+handles). A producer tool generates rows shaped like the `housing.csv` data
+and a consumer tool counts them; each mode runs its own producer and
+consumer processes, whose peak resident memory is reported.
+
+Usage:
+    python bench_streaming.py --rows 100000 1000000 --chunk_size 10000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+MPE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mpe"))
+PROXY_SERVER = os.path.join(MPE, "server.py")
+sys.path.insert(0, MPE)
+
+from data_plane import (PayloadArg, ResultFormat, ChunkSize, StreamInfo, DEFAULT_CHUNK_SIZE, chunked, format_result,
+                        load_argument, stream_result)
+
+
+def generate_rows(n):
+    """Rows of (longitude, latitude, housing_median_age, median_house_value, ocean_proximity)."""
+    proximity = ["NEAR BAY", "<1H OCEAN", "INLAND", "NEAR OCEAN", "ISLAND"]
+    return ((-122.23 + i * 1e-5, 37.88 - i * 1e-5, i % 52, 452600.0 - i % 1000, proximity[i % 5]) for i in range(n))
+
+
+def peak_memory():
+    """Peak resident memory of this process in MiB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def serve(role):
+    """Run the producer or the consumer tool as an MCP server."""
+    from mcp.server import FastMCP
+    from mcp.server.fastmcp import Context
+
+    server = FastMCP()
+    counts = {}
+
+    async def produce(n: int, ctx: Context, result_format: ResultFormat = "text",
+                      chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE):
+        if result_format == "stream":
+            return await stream_result(ctx, chunked(generate_rows(n), chunk_size))
+        return format_result(list(generate_rows(n)), result_format)
+
+    def consume(data: PayloadArg(list), stream: StreamInfo = None) -> str:
+        n = len(load_argument(data))
+        if stream is not None:
+            counts[stream["id"]] = counts.get(stream["id"], 0) + n
+            if not stream.get("final"):
+                return ""
+            n = counts.pop(stream["id"])
+        return f"{n} {peak_memory():.1f}"
+
+    def peak() -> str:
+        return f"{peak_memory():.1f}"
+
+    server.add_tool(produce if role == "producer" else consume)
+    server.add_tool(peak, name=f"{role}_peak")
+    server.run(transport="stdio")
+
+
+# Servers are spawned with a minimal environment, keep the import path of the payload libraries
+ENV = {"PYTHONPATH": os.environ["PYTHONPATH"]} if "PYTHONPATH" in os.environ else {}
+
+
+def server_config(mode, n):
+    # Separate processes per mode and size, so that their peak memory is their own
+    return {
+        "mcpServers": {
+            role: {"command": sys.executable, "args": [os.path.abspath(__file__), "--serve", role, mode, str(n)], "env": ENV}
+            for role in ("producer", "consumer")
+        },
+    }
+
+
+async def main(args):
+    params = StdioServerParameters(command=sys.executable, args=[PROXY_SERVER], env=ENV)
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+
+            for n in args.rows:
+                for mode in ("handle", "stream"):
+                    producer = {"__tool__": "produce", "args": {"n": n}, "identifier": "rows"}
+                    if mode == "stream":
+                        producer.update({"stream": True, "chunk_size": args.chunk_size})
+
+                    start = time.perf_counter()
+                    result = await session.call_tool("proxy", {
+                        "target_tool": "consume", "tool_args": {"data": producer}, "server_config": server_config(mode, n),
+                    })
+                    latency = time.perf_counter() - start
+                    if result.isError or result.content[0].text.split()[0] != str(n):
+                        print(f"{mode} with {n} rows failed: {result.content}")
+                        continue
+                    consumer_peak = float(result.content[0].text.split()[1])
+
+                    # The producer and consumer tools are served by different processes
+                    result = await session.call_tool("proxy", {
+                        "target_tool": "producer_peak", "tool_args": {}, "server_config": server_config(mode, n),
+                    })
+                    producer_peak = float(result.content[0].text)
+
+                    print(f"{n:>8} rows {mode:>6}: {latency:.3f}s, {n / latency:,.0f} rows/s, "
+                          f"peak RSS producer={producer_peak:.0f}MiB consumer={consumer_peak:.0f}MiB")
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        serve(sys.argv[sys.argv.index("--serve") + 1])
+        sys.exit()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000], help="Numbers of intermediate rows.")
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk of streamed intermediates.")
+    asyncio.run(main(parser.parse_args()))
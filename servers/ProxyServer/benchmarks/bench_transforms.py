@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark `__transform__` expressions on large intermediates: evaluating the
+lambda expression on every use (as before) against compiled transforms on
+rows, and on Arrow payloads when `pyarrow` is installed, against decoding
+the payload into rows first.
+
+Usage:
+    python bench_transforms.py --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+MPE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mpe"))
+sys.path.insert(0, MPE)
+
+from payload import Payload, pyarrow
+from transforms import compile_transform, SAFE_BUILTINS
+
+TRANSFORMS = [
+    "lambda data: [row[0] for row in data]",
+    "lambda data: [(row[0], row[3]) for row in data]",
+    "lambda data: [float(row[2]) for row in data]",
+    "lambda data: [row for row in data if row[2] > 30]",
+    "lambda data: list(zip(*data))",
+    "cols(0, 1)",
+    "col(3) | to_float",
+]
+
+NAMES = ["longitude", "latitude", "housing_median_age", "median_house_value", "ocean_proximity"]
+
+
+def make_rows(n):
+    """Rows of (longitude, latitude, housing_median_age, median_house_value, ocean_proximity)."""
+    proximity = ["NEAR BAY", "<1H OCEAN", "INLAND", "NEAR OCEAN", "ISLAND"]
+    return [(-122.23 + i * 1e-5, 37.88 - i * 1e-5, i % 52, 452600 - i % 1000, proximity[i % 5]) for i in range(n)]
+
+
+def measure(func, n_runs):
+    latencies = []
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+
+def main(args):
+    rows = make_rows(args.rows)
+    arrow = None
+    if pyarrow is not None:
+        arrow = Payload.encode(pyarrow.table(dict(zip(NAMES, zip(*rows)))), "arrow")
+
+    print(f"{args.rows} rows, p50 of {args.n_runs} runs")
+    for expr in TRANSFORMS:
+        results = []
+        if expr.startswith("lambda"):
+            # Evaluated on every use, as before compilation
+            results.append(("eval", measure(lambda: eval(expr, {"__builtins__": SAFE_BUILTINS})(rows), args.n_runs)))
+        results.append(("rows", measure(lambda: compile_transform(expr)(rows), args.n_runs)))
+        if arrow is not None:
+            if expr.startswith("lambda"):
+                # Arrow payloads were decoded into rows before being transformed
+                results.append(("decode+eval", measure(
+                    lambda: eval(expr, {"__builtins__": SAFE_BUILTINS})(Payload(arrow.mime_type, arrow.data).value),
+                    args.n_runs,
+                )))
+            # A new payload per run, as decoded rows are cached by the payload
+            results.append(("arrow", measure(
+                lambda: compile_transform(expr)(Payload(arrow.mime_type, arrow.data)), args.n_runs,
+            )))
+
+        print(f"{expr:<50} " + "  ".join(f"{name}={latency * 1000:8.1f}ms" for name, latency in results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of rows of the intermediate.")
+    parser.add_argument("--n_runs", type=int, default=5, help="Runs per transform.")
+    main(parser.parse_args())
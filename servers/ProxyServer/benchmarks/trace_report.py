@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Summarize the execution traces written by the proxy (see `MPE_TRACE_FILE`):
+the critical path of the last traced calls, with where each of its nodes
+spent its time, and the p50 / max wall time of each tool over all traces.
+
+Usage:
+    python trace_report.py ~/.cache/mcp-proxy-exec/traces.jsonl --last 3
+"""
+import json
+import argparse
+import statistics
+from collections import defaultdict
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def node_time(node):
+    """Wall time of a node from when its dependencies were done, or 0 if it did not run."""
+    if node["ready_ms"] is None or node["done_ms"] is None:
+        return 0.0
+    return node["done_ms"] - node["ready_ms"]
+
+
+def print_critical_path(trace):
+    nodes = {node["identifier"]: node for node in trace["nodes"]}
+    print(f"{trace['call_id']} {trace['target_tool']} {trace['status']} "
+          f"wall={trace['wall_ms']:.1f}ms setup={trace['setup_ms'] or 0:.1f}ms "
+          f"memo={trace['memo']['hits']}/{trace['memo']['lookups']}")
+    for identifier in trace["critical_path"]:
+        node = nodes[identifier]
+        calls = node["calls"]
+        print(f"  {identifier:<24} {node['tool']:<24} {node['server'] or '-':<12} "
+              f"node={node_time(node):8.1f}ms transform={node['transform_ms'] or 0:6.1f}ms "
+              f"queue={sum(c['queue_ms'] for c in calls):8.1f}ms call={sum(c['call_ms'] for c in calls):8.1f}ms "
+              f"parse={sum(c['parse_ms'] for c in calls):6.1f}ms "
+              f"in={sum(c['bytes_in'] for c in calls)}B out={sum(c['bytes_out'] for c in calls)}B "
+              f"calls={len(calls)} hits={sum(1 for c in calls if c['cache_hit'])}")
+
+
+def main(args):
+    traces = load(args.path)
+
+    for trace in traces[-args.last:]:
+        print_critical_path(trace)
+
+    # Wall time of the nodes of each tool over all traces
+    times = defaultdict(list)
+    for trace in traces:
+        for node in trace["nodes"]:
+            if node["calls"]:
+                times[node["tool"]].append(node_time(node))
+    print(f"\n{'tool':<24} {'nodes':>6} {'p50':>10} {'max':>10}")
+    for tool, values in sorted(times.items(), key=lambda item: -statistics.median(item[1])):
+        print(f"{tool:<24} {len(values):>6} {statistics.median(values):>8.1f}ms {max(values):>8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="Trace file, one JSON trace per line.")
+    parser.add_argument("--last", type=int, default=1, help="Number of last traces whose critical path is printed.")
+    main(parser.parse_args())
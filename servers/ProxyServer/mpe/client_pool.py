@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+This module keeps MCP client sessions alive across proxy calls. Clients are
+pooled by a canonical hash of their server configuration, so a stdio server
+is spawned once and reused until it becomes idle, unhealthy or is evicted.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from mcp_client import MCPClient
+
+# Maximum number of live clients kept in the pool
+DEFAULT_MAX_SIZE = 16
+
+# Seconds after which an unused client is closed
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+# Seconds after which a client is health-checked before being reused
+DEFAULT_CHECK_INTERVAL = 30.0
+
+# Seconds to wait for a health check or a client to shut down
+DEFAULT_CHECK_TIMEOUT = 5.0
+
+# Maximum number of concurrent tool calls per server, unless set by `max_concurrency` in its config
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    """
+    Compute the canonical hash of a server configuration.
+
+    Args:
+        config (Dict[str, Any]): Server configuration, e.g. {"command": ..., "args": [...], "env": {...}}.
+
+    Returns:
+        str: Hex digest identifying the configuration regardless of key order.
+    """
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PooledClient:
+    """
+    A pooled MCP client with its cached tool list.
+
+    The transport of a client must be opened and closed in the same task,
+    so each client is owned by a dedicated task that lives as long as the
+    client, while other tasks only use its session.
+    """
+
+    def __init__(self, key: str, name: str, config: Dict[str, Any], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+        self.key = key
+        self.client = MCPClient(name, config, sync=False)
+        self.tools: List[Any] = []
+
+        # Limits concurrent tool calls on the server, across proxy calls
+        self.semaphore = asyncio.Semaphore(int(config.get("max_concurrency", max_concurrency)))
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+
+        self._ready: Optional[asyncio.Future] = None
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def name(self) -> str:
+        return self.client.name
+
+    async def start(self) -> None:
+        """Start the owner task and wait until the session is initialized."""
+        self._ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._own())
+        await self._ready
+
+    async def _own(self) -> None:
+        try:
+            await self.client.initialize()
+        except Exception as e:
+            # The client has cleaned up after itself
+            self._ready.set_exception(e)
+            return
+
+        try:
+            self.tools = await self.client.list_tools()
+        except Exception as e:
+            await self.client.cleanup()
+            self._ready.set_exception(e)
+            return
+
+        self._ready.set_result(None)
+
+        # Stop once closed, or as soon as the transport ends so that the client is replaced
+        closing = asyncio.ensure_future(self._closing.wait())
+        disconnected = asyncio.ensure_future(self.client.disconnected.wait())
+        try:
+            await asyncio.wait([closing, disconnected], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closing.cancel()
+            disconnected.cancel()
+            if self.client.disconnected.is_set() and not self._closing.is_set():
+                logger.warning(f"MCP Server `{self.name}` disconnected")
+            await self.client.cleanup()
+
+    @property
+    def alive(self) -> bool:
+        """Whether the owner task, and so the session and its transport, is still running."""
+        return self._task is not None and not self._task.done()
+
+    async def check(self, timeout: float) -> bool:
+        """
+        Check that the server still responds, refreshing the cached tool list.
+
+        Args:
+            timeout (float): Seconds to wait for the response.
+
+        Returns:
+            bool: True if the server is healthy, False otherwise.
+        """
+        if not self.alive:
+            return False
+        try:
+            self.tools = await asyncio.wait_for(self.client.list_tools(), timeout)
+        except Exception as e:
+            logger.warning(f"Health check of MCP Server `{self.name}` failed: {e}")
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    async def close(self, timeout: float) -> None:
+        """Close the session and stop the owner task."""
+        self._closing.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except Exception:
+                self._task.cancel()
+
+
+class ClientPool:
+    """
+    Long-lived pool of MCP clients keyed by the canonical hash of their
+    server configuration, with health checks, idle eviction and a size limit.
+    """
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_MAX_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            check_interval: float = DEFAULT_CHECK_INTERVAL,
+            check_timeout: float = DEFAULT_CHECK_TIMEOUT,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        """
+        Initialize a ClientPool instance.
+
+        Parameters:
+        max_size (int): Maximum number of live clients. Least recently used
+            idle clients are closed beyond it.
+        idle_timeout (float): Seconds after which an unused client is closed.
+        check_interval (float): Seconds after which an idle client is
+            health-checked before being reused.
+        check_timeout (float): Seconds to wait for a health check.
+        max_concurrency (int): Default maximum number of concurrent tool
+            calls per server, overridden by `max_concurrency` in a server config.
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.max_concurrency = max_concurrency
+
+        self._clients: "OrderedDict[str, PooledClient]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def acquire(self, name: str, config: Dict[str, Any]) -> PooledClient:
+        """
+        Get a live client for a server configuration, spawning it if needed.
+
+        Parameters:
+        name (str): Name of the server.
+        config (Dict[str, Any]): Configuration of the server.
+
+        Returns:
+            PooledClient: The client, to be given back with `release`.
+        """
+        key = config_key(config)
+
+        async with self._locks[key]:
+            entry = self._clients.get(key)
+            if entry is not None and not entry.alive:
+                # The session or its transport has ended, calls still using it fail on their own
+                await self._evict(key)
+                entry = None
+            elif entry is not None and entry.in_use == 0 and time.monotonic() - entry.last_checked >= self.check_interval:
+                # A busy server may not answer a health check while it runs a synchronous tool, and closing
+                # its session would fail the calls using it, so only idle ones are checked
+                if not await entry.check(self.check_timeout):
+                    await self._evict(key)
+                    entry = None
+
+            if entry is None:
+                logger.info(f"Starting MCP Server `{name}` for the client pool")
+                entry = PooledClient(key, name, config, self.max_concurrency)
+                await entry.start()
+                self._clients[key] = entry
+                await self._shrink()
+
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            self._clients.move_to_end(key)
+
+        self._ensure_reaper()
+        return entry
+
+    async def acquire_many(self, servers: Dict[str, Dict[str, Any]]) -> List[PooledClient]:
+        """
+        Get live clients for several servers concurrently. Servers with
+        identical configurations share one client.
+
+        Parameters:
+        servers (Dict[str, Dict[str, Any]]): Mapping from server names to configurations.
+
+        Returns:
+            List[PooledClient]: Distinct clients, to be given back with `release_many`.
+        """
+        distinct = {}
+        for name, config in servers.items():
+            distinct.setdefault(config_key(config), (name, config))
+
+        results = await asyncio.gather(
+            *[self.acquire(name, config) for name, config in distinct.values()],
+            return_exceptions=True,
+        )
+
+        clients = [r for r in results if isinstance(r, PooledClient)]
+        errors = [r for r in results if not isinstance(r, PooledClient)]
+        if errors:
+            self.release_many(clients)
+            raise errors[0]
+        return clients
+
+    def release(self, entry: PooledClient) -> None:
+        """Give a client back to the pool."""
+        entry.in_use -= 1
+        entry.last_used = time.monotonic()
+
+    def release_many(self, entries: List[PooledClient]) -> None:
+        """Give clients back to the pool."""
+        for entry in entries:
+            self.release(entry)
+
+    async def close(self) -> None:
+        """Close all clients."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for key in list(self._clients):
+            await self._evict(key)
+
+    async def _evict(self, key: str) -> None:
+        entry = self._clients.pop(key, None)
+        if entry is not None:
+            logger.info(f"Closing pooled MCP Server `{entry.name}`")
+            await entry.close(self.check_timeout)
+
+    async def _shrink(self) -> None:
+        while len(self._clients) > self.max_size:
+            # Least recently used first
+            idle = [key for key in self._clients if self._is_idle(key)]
+            if not idle:
+                break
+            await self._evict(idle[0])
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def _reap(self) -> None:
+        while self._clients:
+            await asyncio.sleep(min(self.idle_timeout, 60.0))
+            now = time.monotonic()
+            for key, entry in list(self._clients.items()):
+                if key in self._clients and self._is_idle(key) and now - entry.last_used >= self.idle_timeout:
+                    await self._evict(key)
+
+    def _is_idle(self, key: str) -> bool:
+        # Clients being acquired are not idle either
+        return self._clients[key].in_use == 0 and not self._locks[key].locked()
@@ -0,0 +1,753 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the local data plane of the proxy: large tool results
+are written to shared memory (or to disk under memory pressure) by the
+producer, and only a small handle travels through the proxy to consumers,
+which map the region without copying it.
+"""
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import stat
+import tempfile
+import time
+import uuid
+from typing import Annotated, Any, AsyncIterable, Dict, Iterable, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+from mcp.types import EmbeddedResource, TextContent, TextResourceContents
+from pydantic import Field
+
+try:
+    # Imported from the installed package by tool servers
+    from .payload import Payload, PAYLOAD_SCHEMA_MARKER, NOTE_KEY, msgpack
+except ImportError:
+    from payload import Payload, PAYLOAD_SCHEMA_MARKER, NOTE_KEY, msgpack
+
+# MIME type of handle resources
+HANDLE_MIME_TYPE = "application/vnd.mpe.handle+json"
+
+# Key of a handle passed as a tool argument
+HANDLE_KEY = "__handle__"
+
+# Argument of producer tools selecting the form of their result
+RESULT_FORMAT_ARG = "result_format"
+
+# Prefix of the files of the data plane, only such files can be opened from a handle
+FILE_PREFIX = "mpe-"
+
+# Prefix of the acknowledgement channels of streams, distinct from regions so that no handle can refer to them
+ACK_PREFIX = "mpeack-"
+
+# Directory of the regions kept in memory
+SHM_DIR = os.environ.get("MPE_SHM_DIR", "/dev/shm")
+
+# Directory of the regions spilled to disk
+SPILL_DIR = os.environ.get("MPE_SPILL_DIR", os.path.join(tempfile.gettempdir(), "mpe-spill"))
+
+# Bytes of memory to keep available, regions are spilled to disk below it
+MEMORY_RESERVE = int(os.environ.get("MPE_MEMORY_RESERVE", 512 * 1024 * 1024))
+
+# Results encoded in fewer bytes are returned inline as payloads when a handle is requested
+HANDLE_MIN_SIZE = int(os.environ.get("MPE_HANDLE_MIN_SIZE", 64 * 1024))
+
+# Seconds after which a region that no proxy retains is removed, e.g. the result of a direct call
+REGION_TTL = float(os.environ.get("MPE_REGION_TTL", 600))
+
+# Separator of the note appended to text results, as a comment that keeps them parsable by `ast.literal_eval`
+NOTE_SEPARATOR = "\n# "
+
+# Argument of producer tools setting the number of rows per chunk of a streamed result
+CHUNK_SIZE_ARG = "chunk_size"
+
+# Rows per chunk of a streamed result, unless set by the proxy
+DEFAULT_CHUNK_SIZE = 10000
+
+# Argument of incremental consumer tools receiving the position of a chunk in its stream
+STREAM_ARG = "stream"
+
+# Key of the final result of a streamed tool call, giving its number of chunks
+STREAM_END_KEY = "__stream_end__"
+
+# Number of chunks a producer may have ahead of its consumer, which bounds the memory of a stream
+STREAM_WINDOW = int(os.environ.get("MPE_STREAM_WINDOW", 4))
+
+# Seconds a producer waits for its consumer to take a chunk before giving up
+STREAM_TIMEOUT = float(os.environ.get("MPE_STREAM_TIMEOUT", 60))
+
+# Key of the acknowledgement channel of a stream in the progress message of a chunk
+STREAM_ACK_KEY = "__ack__"
+
+# Seconds between two checks for taken chunks where acknowledgement channels are not available
+STREAM_POLL_INTERVAL = 0.05
+
+
+def available_memory() -> Optional[int]:
+    """
+    Get the memory available without swapping.
+
+    Returns:
+        Optional[int]: Available bytes, or None if unknown.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def under_pressure(size: int = 0) -> bool:
+    """
+    Check whether `size` more bytes of shared memory would leave less than `MEMORY_RESERVE` available.
+
+    Args:
+        size (int): Bytes to be allocated.
+
+    Returns:
+        bool: True if the region should go to disk.
+    """
+    if not os.path.isdir(SHM_DIR) or not os.access(SHM_DIR, os.W_OK):
+        return True
+    if shutil.disk_usage(SHM_DIR).free < size + MEMORY_RESERVE:
+        return True
+    available = available_memory()
+    return available is not None and available < size + MEMORY_RESERVE
+
+
+# Monotonic time of the last sweep of expired regions by this process
+_last_sweep = 0.0
+
+
+def sweep_regions(ttl: Optional[float] = None) -> int:
+    """
+    Remove the regions of the data plane that were not modified or retained for `ttl` seconds.
+    Proxies refresh the regions they retain, so only regions nobody claimed expire.
+
+    Args:
+        ttl (Optional[float]): Seconds after which a region expires, `REGION_TTL` by default.
+
+    Returns:
+        int: Number of removed regions.
+    """
+    global _last_sweep
+    _last_sweep = time.monotonic()
+    expiry = time.time() - (REGION_TTL if ttl is None else ttl)
+
+    removed = 0
+    for directory in (SHM_DIR, SPILL_DIR):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.name.startswith(FILE_PREFIX):
+                continue
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < expiry:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError:
+                # Removed or refreshed meanwhile
+                pass
+    if removed:
+        logger.info(f"Removed {removed} expired regions of the data plane")
+    return removed
+
+
+class Handle(Payload):
+    """
+    A payload stored in a file of the data plane: a tmpfs file in `SHM_DIR`,
+    or a file in `SPILL_DIR`. Its bytes are memory-mapped on first access.
+    """
+
+    def __init__(self, path: str, mime_type: str, size: int) -> None:
+        """
+        Initialize a Handle instance.
+
+        Parameters:
+        path (str): Path of the file of the region.
+        mime_type (str): MIME type of the payload stored in the region.
+        size (int): Size of the region in bytes.
+        """
+        real_path = os.path.realpath(path)
+        if (os.path.dirname(real_path) not in (os.path.realpath(SHM_DIR), os.path.realpath(SPILL_DIR))
+                or not os.path.basename(real_path).startswith(FILE_PREFIX)):
+            raise RuntimeError(f"Path {path} is not a region of the data plane.")
+        super().__init__(mime_type, b"")
+        self.path = real_path
+        self.size = size
+        # Acknowledgement channel of the stream the region is a chunk of, signalled once the region is removed
+        self.ack: Optional[str] = None
+        self._map: Optional[mmap.mmap] = None
+
+    @classmethod
+    def put(cls, payload: Payload) -> "Handle":
+        """
+        Store a payload in a new region, in shared memory unless memory is under pressure.
+
+        Args:
+            payload (Payload): The payload.
+
+        Returns:
+            Handle: Handle of the region.
+        """
+        # Producers also expire unclaimed regions, as no proxy may run
+        if time.monotonic() - _last_sweep >= REGION_TTL / 2:
+            sweep_regions()
+
+        directory = SPILL_DIR if under_pressure(len(payload.data)) else SHM_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{FILE_PREFIX}{uuid.uuid4().hex}")
+        with open(path, "wb") as f:
+            f.write(payload.data)
+        return cls(path, payload.mime_type, len(payload.data))
+
+    @property
+    def data(self) -> memoryview:
+        """Read-only view of the mapped region."""
+        if self._map is None:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._map)
+
+    @data.setter
+    def data(self, value: bytes) -> None:
+        # The bytes always come from the region
+        pass
+
+    def touch(self) -> None:
+        """Refresh the modification time of the region, so that it does not expire, see `sweep_regions`."""
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def spilled(self) -> bool:
+        return os.path.dirname(self.path) != os.path.realpath(SHM_DIR)
+
+    def spill(self) -> None:
+        """Move the region from shared memory to disk. Open maps of the region stay valid."""
+        if self.spilled:
+            return
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        path = os.path.join(os.path.realpath(SPILL_DIR), os.path.basename(self.path))
+        shutil.move(self.path, path)
+        self.path = path
+
+    def unlink(self) -> None:
+        """Remove the region. It is freed once no process maps it anymore."""
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Still referenced by decoded values, closed when they are collected
+                pass
+            self._map = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        if self.ack is not None:
+            StreamAck.signal(self.ack)
+            self.ack = None
+
+    def to_resource(self, uri: Optional[str] = None, note: Optional[str] = None) -> EmbeddedResource:
+        """
+        Wrap the handle in an `EmbeddedResource`, to be returned by a producer tool.
+
+        Args:
+            uri (Optional[str]): URI of the resource, the file URI of the region by default.
+            note (Optional[str]): Note to the reader of the result, added to the fields of the handle.
+
+        Returns:
+            EmbeddedResource: The resource.
+        """
+        fields = self._fields()
+        if note:
+            fields[NOTE_KEY] = note
+        return EmbeddedResource(
+            type="resource",
+            resource=TextResourceContents(
+                uri=uri or f"file://{self.path}",
+                mimeType=HANDLE_MIME_TYPE,
+                text=json.dumps(fields),
+            ),
+        )
+
+    def to_argument(self) -> Dict[str, Any]:
+        """
+        Wrap the handle as a tool argument.
+
+        Returns:
+            Dict[str, Any]: `{"__handle__": {"path": ..., "mimeType": ..., "size": ...}}`.
+        """
+        return {HANDLE_KEY: self._fields()}
+
+    def _fields(self) -> Dict[str, Any]:
+        return {"path": self.path, "mimeType": self.mime_type, "size": self.size}
+
+    @classmethod
+    def from_content(cls, content: Dict[str, Any]) -> Optional["Handle"]:
+        """
+        Get the handle of a tool result content item.
+
+        Args:
+            content (Dict[str, Any]): Dumped content item.
+
+        Returns:
+            Optional[Handle]: The handle, or None if the item is not a handle resource.
+        """
+        if content.get("type") != "resource":
+            return None
+        resource = content.get("resource") or {}
+        if resource.get("mimeType") != HANDLE_MIME_TYPE:
+            return None
+        fields = json.loads(resource["text"])
+        return cls(fields["path"], fields["mimeType"], fields["size"])
+
+    @classmethod
+    def from_argument(cls, arg: Any) -> Optional["Handle"]:
+        """
+        Get the handle of a tool argument.
+
+        Args:
+            arg (Any): Tool argument.
+
+        Returns:
+            Optional[Handle]: The handle, or None if the argument is not a handle.
+        """
+        if not isinstance(arg, dict) or set(arg) != {HANDLE_KEY}:
+            return None
+        fields = arg[HANDLE_KEY]
+        return cls(fields["path"], fields["mimeType"], fields["size"])
+
+
+class DataPlane:
+    """
+    Lifetime of the regions returned to the proxy. Each region is retained
+    once per pending use, released as its consumers finish, and removed when
+    no use is left. While regions are retained, they are refreshed and
+    unclaimed regions of the data plane are removed after `REGION_TTL`.
+    """
+
+    def __init__(self) -> None:
+        self._refs: Dict[str, int] = {}
+        self._handles: Dict[str, Handle] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def retain(self, handle: Handle, refs: int) -> None:
+        """
+        Retain a region for its pending uses, spilling regions to disk if memory is under pressure.
+
+        Args:
+            handle (Handle): Handle of the region.
+            refs (int): Number of pending uses.
+        """
+        if refs <= 0:
+            handle.unlink()
+            return
+        self._refs[handle.path] = self._refs.get(handle.path, 0) + refs
+        self._handles[handle.path] = handle
+        handle.touch()
+        self.spill()
+        self._ensure_reaper()
+
+    def release(self, handle: Handle) -> None:
+        """Release one use of a region, removing it if no use is left."""
+        path = handle.path
+        if path not in self._refs:
+            return
+        self._refs[path] -= 1
+        if self._refs[path] <= 0:
+            self.discard(handle)
+
+    def discard(self, handle: Handle) -> None:
+        """Remove a region regardless of its pending uses."""
+        self._refs.pop(handle.path, None)
+        self._handles.pop(handle.path, None)
+        handle.unlink()
+
+    def spill(self) -> None:
+        """Move retained regions to disk, largest first, until memory is no longer under pressure."""
+        resident = sorted((h for h in self._handles.values() if not h.spilled), key=lambda h: -h.size)
+        for handle in resident:
+            if not under_pressure():
+                break
+            refs = self._refs.pop(handle.path)
+            del self._handles[handle.path]
+            try:
+                handle.spill()
+            except OSError as e:
+                logger.warning(f"Could not spill region {handle.path}: {e}")
+            self._refs[handle.path] = refs
+            self._handles[handle.path] = handle
+
+    def close(self) -> None:
+        """Remove all retained regions."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for handle in list(self._handles.values()):
+            self.discard(handle)
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is not None and not self._reaper.done():
+            return
+        try:
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+        except RuntimeError:
+            # Outside of an event loop, producers still sweep when they create regions
+            self._reaper = None
+
+    async def _reap(self) -> None:
+        while self._handles:
+            await asyncio.sleep(REGION_TTL / 3)
+            # Retained regions are refreshed well before they would expire
+            for handle in list(self._handles.values()):
+                handle.touch()
+            sweep_regions()
+
+
+def PayloadArg(annotation: Any) -> Any:
+    """
+    Annotation of a tool argument that accepts payloads and handles in place of values.
+
+    Args:
+        annotation (Any): Type of the values.
+
+    Returns:
+        Any: The annotation, marked with `"x-mpe-payload": true`.
+    """
+    return Annotated[Union[annotation, Dict[str, Any]], Field(json_schema_extra={PAYLOAD_SCHEMA_MARKER: True})]
+
+
+# Annotation of the `result_format` argument of producer tools
+ResultFormat = Annotated[str, Field(
+    description='"text" (default), "payload" or "handle", or "stream" for tools with a `chunk_size` argument. '
+                'Set by the proxy, do not set it otherwise.',
+    json_schema_extra={PAYLOAD_SCHEMA_MARKER: True},
+)]
+
+# Annotation of the `chunk_size` argument of producer tools that can stream their result
+ChunkSize = Annotated[int, Field(
+    description='Rows per chunk when `result_format` is "stream". Set by the proxy, do not set it otherwise.',
+    json_schema_extra={PAYLOAD_SCHEMA_MARKER: True},
+)]
+
+# Annotation of the `stream` argument of consumer tools that can process their input chunk by chunk
+StreamInfo = Annotated[Optional[Dict[str, Any]], Field(
+    description='Position of the input in a stream of chunks. Set by the proxy, do not set it otherwise.',
+    json_schema_extra={PAYLOAD_SCHEMA_MARKER: True},
+)]
+
+
+def load_argument(arg: Any) -> Any:
+    """
+    Decode a tool argument that may be a handle or a payload, for use by consumer tools.
+
+    Args:
+        arg (Any): Tool argument.
+
+    Returns:
+        Any: The decoded value of a handle or a payload, or the argument itself.
+    """
+    payload = Handle.from_argument(arg) or Payload.from_argument(arg)
+    return payload.value if payload is not None else arg
+
+
+def format_result(value: Any, result_format: str = "text",
+                  note: Optional[str] = None) -> List[Union[TextContent, EmbeddedResource]]:
+    """
+    Format the result of a producer tool.
+
+    Args:
+        value (Any): The result.
+        result_format (str): "text" for `str(value)`, "payload" for a msgpack
+            payload resource, or "handle" for a handle of a msgpack payload
+            stored in the data plane. Payloads smaller than `HANDLE_MIN_SIZE`
+            are returned inline rather than as handles. Without msgpack,
+            results are text.
+        note (Optional[str]): Note to the reader of the result, e.g. that it
+            is truncated. It is kept in the single content item of the result,
+            see `result_note`.
+
+    Returns:
+        List[Union[TextContent, EmbeddedResource]]: Content of the tool result.
+    """
+    if result_format == "text" or msgpack is None:
+        return [TextContent(type="text", text=str(value) + (NOTE_SEPARATOR + note if note else ""))]
+    if result_format in ("payload", "handle"):
+        payload = Payload.encode(value)
+        if result_format == "handle" and len(payload.data) >= HANDLE_MIN_SIZE:
+            return [Handle.put(payload).to_resource(note=note)]
+        return [payload.to_resource(note=note)]
+    raise RuntimeError(f"Unsupported result format: {result_format}")
+
+
+def result_note(content: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the note of a tool result content item, see `format_result`.
+
+    Args:
+        content (Dict[str, Any]): Dumped content item.
+
+    Returns:
+        Optional[str]: The note, or None if the result has none.
+    """
+    if content.get("type") == "text":
+        # Text of values never contains a raw newline, their strings are escaped
+        _, separator, note = content.get("text", "").rpartition(NOTE_SEPARATOR)
+        return note if separator and "\n" not in note else None
+    if content.get("type") != "resource":
+        return None
+
+    resource = content.get("resource") or {}
+    if resource.get("mimeType") == HANDLE_MIME_TYPE:
+        return json.loads(resource["text"]).get(NOTE_KEY)
+    query = parse_qs(urlparse(str(resource.get("uri", ""))).query)
+    return query[NOTE_KEY][0] if NOTE_KEY in query else None
+
+
+def chunked(rows: Iterable[Any], chunk_size: int) -> Iterable[List[Any]]:
+    """
+    Split rows into chunks.
+
+    Args:
+        rows (Iterable[Any]): The rows.
+        chunk_size (int): Rows per chunk.
+
+    Returns:
+        Iterable[List[Any]]: Lists of up to `chunk_size` rows.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class StreamAck:
+    """
+    Channel through which the consumer of a stream tells its producer that
+    it took a chunk: a FIFO in the data plane, whose path is sent with each
+    chunk. The producer waits on it instead of polling its regions.
+    """
+
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self._event = asyncio.Event()
+        self._fds: List[int] = []
+
+        directory = SPILL_DIR if under_pressure() else SHM_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{ACK_PREFIX}{uuid.uuid4().hex}")
+            os.mkfifo(path, 0o600)
+        except (AttributeError, OSError) as e:
+            # Without FIFOs, e.g. on Windows, taken chunks are polled
+            logger.debug(f"Stream acknowledgements are not available: {e}")
+            return
+
+        try:
+            reader = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            self._fds.append(reader)
+            # Keep a writer open, so that the FIFO does not report the end of file between two consumer writes
+            self._fds.append(os.open(path, os.O_WRONLY | os.O_NONBLOCK))
+            asyncio.get_running_loop().add_reader(reader, self._on_ack, reader)
+        except (NotImplementedError, OSError) as e:
+            logger.debug(f"Stream acknowledgements are not available: {e}")
+            self._close_fds()
+            os.unlink(path)
+            return
+        self.path = path
+
+    def _on_ack(self, fd: int) -> None:
+        try:
+            os.read(fd, 4096)
+        except BlockingIOError:
+            pass
+        self._event.set()
+
+    async def wait(self, timeout: float) -> None:
+        """
+        Wait until a chunk may have been taken.
+
+        Args:
+            timeout (float): Maximum seconds to wait.
+        """
+        if self.path is None:
+            await asyncio.sleep(min(timeout, STREAM_POLL_INTERVAL))
+            return
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+    def close(self) -> None:
+        """Remove the channel."""
+        if self.path is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._fds[0])
+        self._close_fds()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.path = None
+
+    def _close_fds(self) -> None:
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+    @staticmethod
+    def signal(path: str) -> None:
+        """
+        Tell the producer of a stream that a chunk was taken.
+
+        Args:
+            path (str): Path of the channel of the stream.
+        """
+        real_path = os.path.realpath(path)
+        if (os.path.dirname(real_path) not in (os.path.realpath(SHM_DIR), os.path.realpath(SPILL_DIR))
+                or not os.path.basename(real_path).startswith(ACK_PREFIX)):
+            logger.warning(f"Ignore acknowledgement channel {path} outside of the data plane.")
+            return
+        try:
+            fd = os.open(real_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            # The producer has finished
+            return
+        try:
+            if stat.S_ISFIFO(os.fstat(fd).st_mode):
+                os.write(fd, b"\0")
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+async def stream_result(ctx: Any, chunks: Union[Iterable[List[Any]], AsyncIterable[List[Any]]]) -> List[TextContent]:
+    """
+    Stream the result of a producer tool called with `result_format="stream"`.
+    Each chunk is stored in a region of the data plane, and its handle is
+    sent as the message of a progress notification of the call, along with
+    the acknowledgement channel of the stream. The proxy removes the region
+    once the consumer has processed the chunk and signals the channel; the
+    producer waits on it while `STREAM_WINDOW` chunks are pending.
+
+    Without a progress token or msgpack, the chunks are concatenated and
+    returned as a handle, or as text.
+
+    Args:
+        ctx (Context): The context of the tool call.
+        chunks (Union[Iterable[List[Any]], AsyncIterable[List[Any]]]): Lists of rows of the result.
+
+    Returns:
+        List[TextContent]: `{"__stream_end__": <number of chunks>}`.
+
+    Raises:
+        RuntimeError: If the consumer does not take a chunk within `STREAM_TIMEOUT`.
+    """
+    if not isinstance(chunks, AsyncIterable):
+        chunks = _aiter(chunks)
+
+    progress_token = ctx.request_context.meta.progressToken if ctx.request_context.meta else None
+    if progress_token is None or msgpack is None:
+        rows = []
+        async for chunk in chunks:
+            rows.extend(chunk)
+        return format_result(rows, "handle")
+
+    pending: List[Handle] = []
+    n_chunks = 0
+    ack = StreamAck()
+    try:
+        async for chunk in chunks:
+            # Regions removed by the proxy are no longer pending
+            deadline = time.monotonic() + STREAM_TIMEOUT
+            pending = [handle for handle in pending if os.path.exists(handle.path)]
+            while len(pending) >= STREAM_WINDOW:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(f"The consumer of the stream did not take a chunk within {STREAM_TIMEOUT}s.")
+                await ack.wait(remaining)
+                pending = [handle for handle in pending if os.path.exists(handle.path)]
+
+            handle = Handle.put(Payload.encode(chunk))
+            pending.append(handle)
+            n_chunks += 1
+            await ctx.report_progress(n_chunks, None, json.dumps({**handle.to_argument(), STREAM_ACK_KEY: ack.path}))
+    except BaseException:
+        # Chunks that were not taken are left to nobody
+        for handle in pending:
+            handle.unlink()
+        raise
+    finally:
+        ack.close()
+        # Release what the source holds, e.g. a database cursor, when the consumer gives up
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    return [TextContent(type="text", text=json.dumps({STREAM_END_KEY: n_chunks}))]
+
+
+async def _aiter(iterable: Iterable[Any]) -> AsyncIterable[Any]:
+    for item in iterable:
+        yield item
+        # Let the notifications of the chunks be sent
+        await asyncio.sleep(0)
+
+
+def produces_handles(tool: Any) -> bool:
+    """
+    Check whether a tool can return its result as a handle.
+
+    Args:
+        tool (Tool): The tool.
+
+    Returns:
+        bool: True if the tool has a `result_format` argument marked with `"x-mpe-payload": true`.
+    """
+    properties = (tool.inputSchema or {}).get("properties", {})
+    return bool(properties.get(RESULT_FORMAT_ARG, {}).get(PAYLOAD_SCHEMA_MARKER))
+
+
+def produces_streams(tool: Any) -> bool:
+    """
+    Check whether a tool can stream its result in chunks.
+
+    Args:
+        tool (Tool): The tool.
+
+    Returns:
+        bool: True if the tool can return handles and has a `chunk_size` argument marked with `"x-mpe-payload": true`.
+    """
+    properties = (tool.inputSchema or {}).get("properties", {})
+    return produces_handles(tool) and bool(properties.get(CHUNK_SIZE_ARG, {}).get(PAYLOAD_SCHEMA_MARKER))
+
+
+def consumes_streams(tool: Any) -> bool:
+    """
+    Check whether a tool can process its input chunk by chunk.
+
+    Args:
+        tool (Tool): The tool.
+
+    Returns:
+        bool: True if the tool has a `stream` argument marked with `"x-mpe-payload": true`.
+    """
+    properties = (tool.inputSchema or {}).get("properties", {})
+    return bool(properties.get(STREAM_ARG, {}).get(PAYLOAD_SCHEMA_MARKER))
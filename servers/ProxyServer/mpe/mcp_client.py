@@ -52,12 +52,41 @@ class ServiceResponse(dict):
 
 
 try:
+    import anyio
     import mcp
+    from anyio.abc import ObjectReceiveStream
     from mcp.client.sse import sse_client
     from mcp.client.stdio import stdio_client
 
 except ImportError:
     mcp = None
+    ObjectReceiveStream = object
+
+
+class WatchedReceiveStream(ObjectReceiveStream):
+    """Receive stream of a transport that reports when the transport has ended."""
+
+    def __init__(self, stream: Any, on_end: Callable[[], None]) -> None:
+        """
+        Args:
+            stream (`ObjectReceiveStream`):
+                The receive stream of the transport.
+            on_end (`Callable[[], None]`):
+                Called once the stream ends or is closed.
+        """
+        self.stream = stream
+        self.on_end = on_end
+
+    async def receive(self) -> Any:
+        try:
+            return await self.stream.receive()
+        except (anyio.EndOfStream, anyio.ClosedResourceError, anyio.BrokenResourceError):
+            self.on_end()
+            raise
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+        self.on_end()
 
 
 # from .service_response import ServiceResponse, ServiceExecStatus
@@ -159,10 +188,14 @@ class MCPClient:
         self.name: str = name
         self.config: dict[str, Any] = config
         self.session: Optional[mcp.ClientSession] = None
+        self.server_info: Optional[Any] = None
 
         self._exit_stack: AsyncExitStack = AsyncExitStack()
         self._cleanup_lock: asyncio.Lock = asyncio.Lock()
 
+        # Set once the transport has ended, e.g. the server process exited
+        self.disconnected: asyncio.Event = asyncio.Event()
+
         # Initialize
         if sync:
             sync_exec(self.initialize)
@@ -201,10 +234,15 @@ class MCPClient:
                 streams = await self._exit_stack.enter_async_context(
                     sse_client(url=self.config["url"]),
                 )
+            read_stream, write_stream = streams[0], streams[1]
             session = await self._exit_stack.enter_async_context(
-                mcp.ClientSession(*streams),
+                mcp.ClientSession(
+                    WatchedReceiveStream(read_stream, self.disconnected.set),
+                    write_stream,
+                ),
             )
-            await session.initialize()
+            result = await session.initialize()
+            self.server_info = result.serverInfo
             self.session = session
         except Exception as e:
             logger.error(f"Error initializing server {self.name}: {e}")
@@ -281,16 +319,17 @@ class MCPClient:
     async def execute_tool(
             self,
             tool_name: str,
+            progress_callback: Optional[Callable[..., Any]] = None,
             **kwargs: Any,
     ) -> ServiceResponse:
-        """Execute a tool and return ServiceResponse"""
+        """Execute a tool and return ServiceResponse. Progress notifications of the call go to `progress_callback`."""
         if not self.session:
             raise RuntimeError(f"Session {self.name} not initialized")
 
         logger.info(f"Executing {tool_name}...")
 
         try:
-            result = await self.session.call_tool(tool_name, kwargs)
+            result = await self.session.call_tool(tool_name, kwargs, progress_callback=progress_callback)
             # TODO: consider support image data and embedding resources
             content, is_error = (
                 [x.model_dump() for x in result.content],
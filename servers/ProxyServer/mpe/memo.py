@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+This module memoizes tool results across proxy calls. Results are keyed by
+the content of the call: the hash of the server configuration, the tool name
+and the canonicalized arguments, so a repeated sub-plan is answered without
+calling the server.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from client_pool import config_key
+from payload import Payload
+
+# Seconds during which a memoized result is reused
+DEFAULT_MEMO_TTL = 300.0
+
+# Maximum total size of memoized results in bytes
+DEFAULT_MEMO_MAX_BYTES = 256 * 1024 * 1024
+
+# Key of a server configuration listing the tools whose results may be memoized
+MEMOIZE_KEY = "memoize"
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, Payload):
+        # Payloads and handles are keyed by their content
+        return {"__sha256__": hashlib.sha256(value.data).hexdigest(), "mimeType": value.mime_type}
+    return str(value)
+
+
+def _sizeof(value: Any) -> int:
+    if isinstance(value, Payload):
+        return len(value.data)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(repr(value))
+
+
+class ResultMemo:
+    """
+    LRU cache of tool results with a time to live and a byte budget. Only
+    the tools listed in the `memoize` entry of their server configuration
+    are memoized, which should be side-effect free, e.g. `select`, `get_schema`
+    or plotting tools.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMO_MAX_BYTES, ttl: float = DEFAULT_MEMO_TTL) -> None:
+        """
+        Initialize a ResultMemo instance.
+
+        Parameters:
+        max_bytes (int): Maximum total size of memoized results. Least recently
+            used results are dropped beyond it.
+        ttl (float): Seconds during which a result is reused.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def allows(config: Dict[str, Any], tool: str) -> bool:
+        """
+        Check whether the results of a tool may be memoized.
+
+        Parameters:
+        config (Dict[str, Any]): Configuration of the server providing the tool.
+        tool (str): Name of the tool.
+
+        Returns:
+            bool: True if the tool is listed in the `memoize` entry of the configuration.
+        """
+        return tool in (config.get(MEMOIZE_KEY) or ())
+
+    @staticmethod
+    def key(config: Dict[str, Any], tool: str, args: Dict[str, Any]) -> str:
+        """
+        Compute the key of a tool call.
+
+        Parameters:
+        config (Dict[str, Any]): Configuration of the server providing the tool.
+        tool (str): Name of the tool.
+        args (Dict[str, Any]): Resolved arguments of the call.
+
+        Returns:
+            str: Hex digest of the server configuration, the tool name and the arguments.
+        """
+        canonical = json.dumps([config_key(config), tool, args], sort_keys=True, separators=(",", ":"), default=_canonical)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Get a memoized result.
+
+        Parameters:
+        key (str): Key of the call.
+
+        Returns:
+            Tuple[bool, Any]: Whether the result was found, and the result.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] < time.monotonic():
+            self._drop(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return True, entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Memoize a result, dropping the least recently used results beyond the byte budget.
+
+        Parameters:
+        key (str): Key of the call.
+        value (Any): The result.
+        """
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        self._drop(key)
+        self._entries[key] = (value, size, time.monotonic() + self.ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def hit_rate(self) -> Optional[float]:
+        """Fraction of lookups answered from the memo, None before any lookup."""
+        total = self.hits + self.misses
+        return self.hits / total if total else None
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the typed payload protocol used to pass tool results
+between proxied tools without a str / literal_eval round trip.
+
+A producer returns an `EmbeddedResource` whose blob is msgpack or an Arrow IPC
+stream. The proxy decodes it at most once, and hands it unchanged to
+consumers declaring support for payloads, i.e. whose input schema marks the
+argument with `"x-mpe-payload": true`. Other consumers receive the decoded value.
+"""
+import base64
+import datetime
+import decimal
+import uuid
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+# MIME types of the supported payloads
+MSGPACK_MIME_TYPE = "application/vnd.mpe.msgpack"
+ARROW_MIME_TYPE = "application/vnd.apache.arrow.stream"
+
+# Key of a payload passed as a tool argument
+PAYLOAD_KEY = "__payload__"
+
+# Input schema marker of the arguments accepting payloads
+PAYLOAD_SCHEMA_MARKER = "x-mpe-payload"
+
+# Key of the note of a result resource, e.g. that the result is truncated
+NOTE_KEY = "note"
+
+# msgpack extension types of values that JSON and literal_eval cannot round trip
+_EXT_TUPLE = 1
+_EXT_DECIMAL = 2
+_EXT_DATE = 3
+_EXT_DATETIME = 4
+_EXT_TIME = 5
+_EXT_TIMEDELTA = 6
+_EXT_UUID = 7
+
+
+def _require(module: Any, name: str) -> None:
+    if module is None:
+        raise RuntimeError(f"`{name}` is required for this payload format. Please install it with `pip install {name}`.")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, tuple):
+        return msgpack.ExtType(_EXT_TUPLE, _packb(list(obj)))
+    if isinstance(obj, decimal.Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode())
+    # datetime is a subclass of date
+    if isinstance(obj, datetime.datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, datetime.date):
+        return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+    if isinstance(obj, datetime.time):
+        return msgpack.ExtType(_EXT_TIME, obj.isoformat().encode())
+    if isinstance(obj, datetime.timedelta):
+        return msgpack.ExtType(_EXT_TIMEDELTA, _packb([obj.days, obj.seconds, obj.microseconds]))
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(_EXT_UUID, obj.bytes)
+    # Subclasses, e.g. SQLAlchemy rows and named tuples, are not packed natively with strict types
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, list):
+        return list(obj)
+    if hasattr(obj, "_tuple"):
+        return _default(obj._tuple())
+    raise TypeError(f"Object of type {type(obj).__name__} cannot be encoded as a payload.")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_TUPLE:
+        return tuple(_unpackb(data))
+    if code == _EXT_DECIMAL:
+        return decimal.Decimal(data.decode())
+    if code == _EXT_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return datetime.date.fromisoformat(data.decode())
+    if code == _EXT_TIME:
+        return datetime.time.fromisoformat(data.decode())
+    if code == _EXT_TIMEDELTA:
+        return datetime.timedelta(*_unpackb(data))
+    if code == _EXT_UUID:
+        return uuid.UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+def _packb(value: Any) -> bytes:
+    # Strict types let tuples reach `_default`, so they are not decoded as lists
+    return msgpack.packb(value, default=_default, strict_types=True, use_bin_type=True)
+
+
+def _unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+class Payload:
+    """
+    An encoded tool result. It is decoded lazily and at most once, and keeps
+    its encoded form so that it can be forwarded without re-encoding.
+    """
+
+    _UNSET = object()
+
+    def __init__(self, mime_type: str, data: bytes) -> None:
+        """
+        Initialize a Payload instance.
+
+        Parameters:
+        mime_type (str): `MSGPACK_MIME_TYPE` or `ARROW_MIME_TYPE`.
+        data (bytes): Encoded result.
+        """
+        if mime_type not in (MSGPACK_MIME_TYPE, ARROW_MIME_TYPE):
+            raise RuntimeError(f"Unsupported payload MIME type: {mime_type}")
+        self.mime_type = mime_type
+        self.data = data
+        self._value = Payload._UNSET
+
+    @classmethod
+    def encode(cls, value: Any, format: str = "msgpack") -> "Payload":
+        """
+        Encode a value.
+
+        Args:
+            value (Any): Value to encode. With `format="arrow"`, a `pyarrow.Table`
+                or `pyarrow.RecordBatch`.
+            format (str): "msgpack" or "arrow".
+
+        Returns:
+            Payload: The encoded value.
+        """
+        if format == "msgpack":
+            _require(msgpack, "msgpack")
+            return cls(MSGPACK_MIME_TYPE, _packb(value))
+        if format == "arrow":
+            _require(pyarrow, "pyarrow")
+            sink = pyarrow.BufferOutputStream()
+            with pyarrow.ipc.new_stream(sink, value.schema) as writer:
+                writer.write(value)
+            return cls(ARROW_MIME_TYPE, sink.getvalue().to_pybytes())
+        raise RuntimeError(f"Unsupported payload format: {format}")
+
+    @property
+    def value(self) -> Any:
+        """
+        The decoded value. Arrow tables are decoded as a list of row tuples,
+        like the result of a SELECT.
+        """
+        if self._value is Payload._UNSET:
+            if self.mime_type == MSGPACK_MIME_TYPE:
+                _require(msgpack, "msgpack")
+                self._value = _unpackb(self.data)
+            else:
+                table = self.table()
+                self._value = list(zip(*[column.to_pylist() for column in table.columns]))
+        return self._value
+
+    def table(self) -> Any:
+        """
+        Decode an Arrow payload as a `pyarrow.Table`.
+
+        Returns:
+            pyarrow.Table: The decoded table.
+        """
+        if self.mime_type != ARROW_MIME_TYPE:
+            raise RuntimeError("Only Arrow payloads can be decoded as a table.")
+        _require(pyarrow, "pyarrow")
+        return pyarrow.ipc.open_stream(pyarrow.py_buffer(self.data)).read_all()
+
+    def to_resource(self, uri: str = "mpe://payload", note: Optional[str] = None) -> Any:
+        """
+        Wrap the payload in an `EmbeddedResource`, to be returned by a producer tool.
+
+        Args:
+            uri (str): URI of the resource.
+            note (Optional[str]): Note to the reader of the result, added to the query of the URI.
+
+        Returns:
+            EmbeddedResource: The resource.
+        """
+        from mcp.types import BlobResourceContents, EmbeddedResource
+
+        if note:
+            uri = f"{uri}?{urlencode({NOTE_KEY: note})}"
+
+        return EmbeddedResource(
+            type="resource",
+            resource=BlobResourceContents(uri=uri, mimeType=self.mime_type, blob=base64.b64encode(self.data).decode()),
+        )
+
+    def to_argument(self) -> Dict[str, Any]:
+        """
+        Wrap the payload as a tool argument.
+
+        Returns:
+            Dict[str, Any]: `{"__payload__": {"mimeType": ..., "blob": ...}}`.
+        """
+        return {PAYLOAD_KEY: {"mimeType": self.mime_type, "blob": base64.b64encode(self.data).decode()}}
+
+    @classmethod
+    def from_content(cls, content: Dict[str, Any]) -> Optional["Payload"]:
+        """
+        Get the payload of a tool result content item.
+
+        Args:
+            content (Dict[str, Any]): Dumped content item.
+
+        Returns:
+            Optional[Payload]: The payload, or None if the item is not a payload resource.
+        """
+        if content.get("type") != "resource":
+            return None
+        resource = content.get("resource") or {}
+        if resource.get("mimeType") not in (MSGPACK_MIME_TYPE, ARROW_MIME_TYPE) or "blob" not in resource:
+            return None
+        return cls(resource["mimeType"], base64.b64decode(resource["blob"]))
+
+    @classmethod
+    def from_argument(cls, arg: Any) -> Optional["Payload"]:
+        """
+        Get the payload of a tool argument.
+
+        Args:
+            arg (Any): Tool argument.
+
+        Returns:
+            Optional[Payload]: The payload, or None if the argument is not a payload.
+        """
+        if not isinstance(arg, dict) or set(arg) != {PAYLOAD_KEY}:
+            return None
+        return cls(arg[PAYLOAD_KEY]["mimeType"], base64.b64decode(arg[PAYLOAD_KEY]["blob"]))
+
+
+def load_argument(arg: Any) -> Any:
+    """
+    Decode a tool argument that may be a payload, for use by consumer tools.
+
+    Args:
+        arg (Any): Tool argument.
+
+    Returns:
+        Any: The decoded value of a payload, or the argument itself.
+    """
+    payload = Payload.from_argument(arg)
+    return payload.value if payload is not None else arg
+
+
+def accepts_payload(tool: Any, arg_key: str) -> bool:
+    """
+    Check whether a tool accepts a payload for an argument.
+
+    Args:
+        tool (Tool): The tool.
+        arg_key (str): Name of the argument.
+
+    Returns:
+        bool: True if the argument is marked with `"x-mpe-payload": true` in the input schema.
+    """
+    properties = (tool.inputSchema or {}).get("properties", {})
+    return bool(properties.get(arg_key, {}).get(PAYLOAD_SCHEMA_MARKER))
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+This module turns the nested `tool_args` of a proxy call into an explicit
+dependency graph of tool calls, and executes independent calls concurrently.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from payload import Payload
+from streaming import Stream
+from transforms import compile_transform
+
+# Identifier of the node of the target tool
+TARGET = "__target__"
+
+# Maximum number of concurrent calls of a `__map__` node, unless set by its `concurrency`
+DEFAULT_MAP_CONCURRENCY = 8
+
+
+@dataclass
+class Placeholder:
+    """An argument whose value is the (transformed) result of another node."""
+
+    identifier: str
+    transform: Optional[str] = None
+
+
+@dataclass
+class MapSpec:
+    """Fan-out of a `__map__` node over the elements (or chunks) of a value."""
+
+    over: Any
+    arg: str
+    batch_size: Optional[int] = None
+    chunk_size: Optional[int] = None
+    concurrency: int = DEFAULT_MAP_CONCURRENCY
+
+
+@dataclass
+class StreamSpec:
+    """Streaming of the result of a node to its consumer, in chunks of `chunk_size` rows."""
+
+    chunk_size: Optional[int] = None
+
+
+@dataclass
+class Node:
+    """A tool call of the plan, or a fan-out of calls of one tool for a `__map__` node."""
+
+    identifier: str
+    tool: str
+    args: Dict[str, Any]
+    deps: Set[str] = field(default_factory=set)
+    map: Optional[MapSpec] = None
+    stream: Optional[StreamSpec] = None
+
+    def placeholders(self) -> List[Placeholder]:
+        """Arguments (and the mapped value) coming from other nodes."""
+        values = list(self.args.values())
+        if self.map is not None:
+            values.append(self.map.over)
+        return [value for value in values if isinstance(value, Placeholder)]
+
+
+class Plan:
+    """
+    Dependency graph of the tool calls of a proxy call. Edges come from
+    nested `__tool__` calls and `__map__` constructs, and from `__ref__` references.
+    """
+
+    def __init__(self, target_tool: str, tool_args: Dict[str, Any]) -> None:
+        """
+        Build the plan.
+
+        Parameters:
+        target_tool (str): Name of the target tool.
+        tool_args (Dict[str, Any]): Arguments of the target tool, possibly
+            containing nested `__tool__` calls, `__map__` constructs and `__ref__` references.
+
+        Raises:
+            RuntimeError: If an identifier is missing, duplicated or unknown,
+                if a `__map__` construct or a streamed call is invalid, or if references form a cycle.
+        """
+        self.nodes: Dict[str, Node] = {}
+        self._add(TARGET, target_tool, tool_args)
+
+        for node in self.nodes.values():
+            for dep in node.deps:
+                if dep not in self.nodes:
+                    raise RuntimeError(f"Referenced identifier '{dep}' not found.")
+
+        self._check_cycles()
+        self._check_streams()
+
+    def _add(self, identifier: str, tool: str, tool_args: Dict[str, Any]) -> Node:
+        node = Node(identifier, tool, {})
+        self.nodes[identifier] = node
+
+        for arg_key, arg_value in tool_args.items():
+            node.args[arg_key] = self._parse(node, arg_value)
+        return node
+
+    def _parse(self, node: Node, value: Any) -> Any:
+        if isinstance(value, dict) and ("__tool__" in value or "__map__" in value):
+            # Tool call or fan-out of tool calls
+            nested_identifier = value.get("identifier")
+            if not nested_identifier:
+                raise RuntimeError(f"Missing 'identifier' field in tool call: {value}")
+
+            # Check uniqueness of identifier
+            if nested_identifier in self.nodes or nested_identifier == TARGET:
+                raise RuntimeError(
+                    f"The identifier '{nested_identifier}' already exists. Please ensure each tool call has a unique identifier.")
+
+            if "__tool__" in value:
+                nested = self._add(nested_identifier, value["__tool__"], value.get("args", {}))
+                if value.get("stream"):
+                    nested.stream = StreamSpec(self._size(f"'{nested_identifier}'", value, "chunk_size"))
+            else:
+                self._add_map(nested_identifier, value)
+            node.deps.add(nested_identifier)
+            return Placeholder(nested_identifier, value.get("__transform__"))
+
+        if isinstance(value, dict) and "__ref__" in value:
+            # Reference
+            node.deps.add(value["__ref__"])
+            return Placeholder(value["__ref__"], value.get("__transform__"))
+
+        # Literals and other dictionaries are passed as they are
+        return value
+
+    def _add_map(self, identifier: str, value: Dict[str, Any]) -> None:
+        if "over" not in value or not value.get("as"):
+            raise RuntimeError(f"A `__map__` construct requires 'over' and 'as' fields: {value}")
+
+        sizes = {}
+        for key in ("batch_size", "chunk_size", "concurrency"):
+            if value.get(key) is not None:
+                sizes[key] = self._size(f"`__map__` '{identifier}'", value, key)
+        if "batch_size" in sizes and "chunk_size" in sizes:
+            raise RuntimeError(f"`__map__` '{identifier}' cannot set both 'batch_size' and 'chunk_size'.")
+
+        node = self._add(identifier, value["__map__"], value.get("args", {}))
+        if value["as"] in node.args:
+            raise RuntimeError(f"Argument '{value['as']}' of `__map__` '{identifier}' is also given in 'args'.")
+        node.map = MapSpec(self._parse(node, value["over"]), value["as"], **sizes)
+
+    @staticmethod
+    def _size(name: str, value: Dict[str, Any], key: str) -> Optional[int]:
+        if value.get(key) is None:
+            return None
+        if not isinstance(value[key], int) or isinstance(value[key], bool) or value[key] < 1:
+            raise RuntimeError(f"'{key}' of {name} must be a positive integer.")
+        return value[key]
+
+    def _check_streams(self) -> None:
+        for node in self.nodes.values():
+            # Chunks of different streams cannot be matched
+            if len({p.identifier for p in node.placeholders() if self.nodes[p.identifier].stream is not None}) > 1:
+                raise RuntimeError(f"Tool call '{node.identifier}' can only receive one streamed result.")
+
+            if node.stream is None:
+                continue
+            # All uses of a streamed result must be arguments of a single tool call, which receives it chunk by chunk
+            consumers = [other for other in self.nodes.values()
+                         if any(p.identifier == node.identifier for p in other.placeholders())]
+            if len(consumers) != 1 or consumers[0].map is not None:
+                raise RuntimeError(
+                    f"The result of streamed call '{node.identifier}' must only be used by the arguments of one "
+                    f"`__tool__` call.")
+
+    def _check_cycles(self) -> None:
+        # Iterative depth-first search with three colors
+        visiting, done = set(), set()
+        for start in self.nodes:
+            if start in done:
+                continue
+            stack = [(start, iter(sorted(self.nodes[start].deps)))]
+            visiting.add(start)
+            while stack:
+                identifier, deps = stack[-1]
+                dep = next(deps, None)
+                if dep is None:
+                    stack.pop()
+                    visiting.discard(identifier)
+                    done.add(identifier)
+                elif dep in visiting:
+                    cycle = [i for i, _ in stack[[i for i, _ in stack].index(dep):]] + [dep]
+                    raise RuntimeError(f"Circular references between tool calls: {' -> '.join(cycle)}.")
+                elif dep not in done:
+                    visiting.add(dep)
+                    stack.append((dep, iter(sorted(self.nodes[dep].deps))))
+
+    def tools(self) -> List[str]:
+        """Names of all tools called by the plan."""
+        return [node.tool for node in self.nodes.values()]
+
+    def uses(self) -> Dict[str, int]:
+        """Number of uses of the result of each node, the result of the target being returned once."""
+        uses = {identifier: 0 for identifier in self.nodes}
+        uses[TARGET] = 1
+        for node in self.nodes.values():
+            for placeholder in node.placeholders():
+                uses[placeholder.identifier] += 1
+        return uses
+
+    async def execute(
+            self,
+            run: Callable[[Node, Dict[str, Any]], Awaitable[Any]],
+            on_done: Optional[Callable[[Node], None]] = None,
+            on_ready: Optional[Callable[[Node], None]] = None,
+    ) -> Any:
+        """
+        Execute the plan. Each node starts as soon as its dependencies are
+        done, so independent branches run concurrently and the wall time is
+        the length of the critical path. The calls of a `__map__` node run
+        concurrently too, up to its `concurrency`.
+
+        Parameters:
+        run (Callable[[Node, Dict[str, Any]], Awaitable[Any]]): Coroutine
+            function executing the tool of a node with resolved arguments,
+            once per call of a `__map__` node.
+        on_done (Optional[Callable[[Node], None]]): Called when a node that
+            has started is done, successfully or not.
+        on_ready (Optional[Callable[[Node], None]]): Called when the
+            dependencies of a node are done, before its arguments are resolved.
+
+        Returns:
+            Any: The result of the target tool.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def resolve(value: Any) -> Any:
+            if isinstance(value, Placeholder):
+                return apply_transform(value.transform, tasks[value.identifier].result())
+            return value
+
+        async def execute_node(node: Node) -> Any:
+            if node.deps:
+                await asyncio.gather(*[tasks[dep] for dep in node.deps])
+            if on_ready is not None:
+                on_ready(node)
+
+            try:
+                args = {arg_key: resolve(arg_value) for arg_key, arg_value in node.args.items()}
+                if node.map is None:
+                    return await run(node, args)
+                return await execute_map(node, args, resolve(node.map.over))
+            finally:
+                if on_done is not None:
+                    on_done(node)
+
+        async def execute_map(node: Node, args: Dict[str, Any], over: Any) -> List[Any]:
+            spec = node.map
+            elements = list(over.value if isinstance(over, Payload) else over)
+
+            # One call per element, per batch of elements or per chunk
+            size = spec.batch_size or spec.chunk_size
+            inputs = [elements[i:i + size] for i in range(0, len(elements), size)] if size else elements
+
+            semaphore = asyncio.Semaphore(spec.concurrency)
+
+            async def call(element: Any) -> Any:
+                async with semaphore:
+                    return await run(node, {**args, spec.arg: element})
+
+            calls = [asyncio.create_task(call(element)) for element in inputs]
+            try:
+                results = await asyncio.gather(*calls)
+            finally:
+                for task in calls:
+                    task.cancel()
+
+            if not spec.batch_size:
+                return list(results)
+
+            # Batched calls return one result per element
+            flattened = []
+            for batch, result in zip(inputs, results):
+                if not isinstance(result, (list, tuple)) or len(result) != len(batch):
+                    raise RuntimeError(
+                        f"Batched calls of `{node.tool}` in `__map__` '{node.identifier}' must return a list "
+                        f"with one result per element.")
+                flattened.extend(result)
+            return flattened
+
+        for node in self.nodes.values():
+            tasks[node.identifier] = asyncio.create_task(execute_node(node))
+
+        try:
+            # Surface the first failure of any node
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    # Mark failures of other nodes as retrieved
+                    task.exception()
+
+        return tasks[TARGET].result()
+
+
+def apply_transform(transform_expr: Optional[str], value: Any) -> Any:
+    """
+    Apply a `__transform__` expression to a result. Expressions are compiled
+    once and cached, see `transforms.compile_transform`.
+
+    Parameters:
+    transform_expr (Optional[str]): Lambda expression or named transforms, or None for no transformation.
+    value (Any): The result. Payloads are decoded before being transformed,
+        unless the transform runs on Arrow columns.
+
+    Returns:
+        Any: The transformed result.
+    """
+    if isinstance(value, Stream):
+        # Transforms of a streamed result apply to each chunk
+        return value.view(transform_expr)
+    if not transform_expr:
+        return value
+    try:
+        return compile_transform(transform_expr)(value)
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to execute transformation expression: {transform_expr}. Error: {e}")
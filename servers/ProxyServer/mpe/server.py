@@ -1,11 +1,63 @@
 import ast
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
 
 from mcp.server import FastMCP
 from mcp import Tool
 from mcp.types import TextContent
-from typing import Dict, Any, List, Tuple
-from mcp_client import MCPClient, ServiceResponse, ServiceExecStatus, sync_exec
-mcp = FastMCP()
+from typing import Dict, Any, List, Optional, Tuple
+from loguru import logger
+from mcp_client import ServiceResponse, ServiceExecStatus
+from client_pool import ClientPool, PooledClient, DEFAULT_MAX_SIZE, DEFAULT_IDLE_TIMEOUT, DEFAULT_CHECK_INTERVAL, DEFAULT_MAX_CONCURRENCY
+from plan import Plan, Node, TARGET, apply_transform
+from data_plane import (DataPlane, Handle, RESULT_FORMAT_ARG, CHUNK_SIZE_ARG, STREAM_ARG, STREAM_END_KEY,
+                        result_note, produces_handles, produces_streams, consumes_streams)
+from payload import Payload, accepts_payload
+from tool_directory import ToolDirectory, DEFAULT_DIRECTORY_PATH
+from memo import ResultMemo, DEFAULT_MEMO_MAX_BYTES, DEFAULT_MEMO_TTL
+from tracing import Trace, TRACE_KEY, DEFAULT_TRACE_FILE, payload_size
+from streaming import Stream, StreamView
+
+# Clients are kept alive across proxy calls instead of spawning every server per call
+client_pool = ClientPool(
+    max_size=int(os.environ.get("MPE_POOL_MAX_SIZE", DEFAULT_MAX_SIZE)),
+    idle_timeout=float(os.environ.get("MPE_POOL_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)),
+    check_interval=float(os.environ.get("MPE_POOL_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL)),
+    max_concurrency=int(os.environ.get("MPE_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+)
+
+# Regions of large intermediates shared with local servers
+data_plane = DataPlane()
+
+# Persisted mapping from server configurations to their tools, so that only the servers used by a plan are connected
+tool_directory = ToolDirectory(os.environ.get("MPE_TOOL_DIRECTORY", DEFAULT_DIRECTORY_PATH) or None)
+
+# Results of side-effect free tools, reused across proxy calls
+memo = ResultMemo(
+    max_bytes=int(os.environ.get("MPE_MEMO_MAX_BYTES", DEFAULT_MEMO_MAX_BYTES)),
+    ttl=float(os.environ.get("MPE_MEMO_TTL", DEFAULT_MEMO_TTL)),
+)
+
+# Trace all proxy calls, unless disabled by `__trace__` in their arguments
+TRACE = os.environ.get("MPE_TRACE", "").lower() in ("1", "true", "yes")
+
+# JSONL file receiving the traces of traced calls, none if empty
+TRACE_FILE = os.environ.get("MPE_TRACE_FILE", DEFAULT_TRACE_FILE) or None
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    try:
+        yield {}
+    finally:
+        await client_pool.close()
+        data_plane.close()
+
+
+mcp = FastMCP(lifespan=lifespan)
 
 
 def literal_eval(target):
@@ -31,9 +83,24 @@ async def proxy(target_tool: str, tool_args: Dict[str, Any], server_config: Dict
       - Arguments can also be a dictionary containing the `__tool__` key to specify a tool that must be executed first to obtain the value of this parameter.
         - Each tool call must include an `identifier` field to ensure unique identification.
         - Can include a `__transform__` field specifying a transformation (using a lambda expression) on the tool result.
+        - Can include `"stream": true` to pass the result to its consumer in chunks of `chunk_size` rows (default 10000) as they are produced. The result must be used by a single `__tool__` call.
       - Arguments can also be a dictionary containing the `__ref__` key to reference results from previous tool calls.
         - Can include a `__transform__` field specifying a transformation (using a lambda expression) on the referenced result.
+      - Instead of a lambda expression, a transformation can be named transforms joined with `|`: `col(i)`, `cols(i, j, ...)`, `to_float`, `to_int`, `to_str`, `transpose`, e.g. `"col(0) | to_float"`.
+      - Arguments can also be a dictionary containing the `__map__` key to apply a tool to each element of a list, concurrently. The list of results, in order, is the value of the argument.
+        - `over`: The list, given directly or as a `__tool__` call or `__ref__` reference.
+        - `as`: Name of the argument of the tool receiving each element. Other arguments are given in `args`.
+        - Must include an `identifier` field, and can include a `__transform__` field applied to the list of results.
+        - Can include `batch_size` to pass lists of up to `batch_size` elements to each call when the tool accepts lists and returns one result per element, `chunk_size` to pass lists of up to `chunk_size` elements and collect one result per chunk, and `concurrency` to limit concurrent calls (default 8).
+      - `"__trace__": true` returns the execution trace of the call after its result, as a resource of type `application/vnd.mpe.trace+json`: per node the server, the wall, queueing and transform times and the bytes passed in and out of each call, and whether it was answered from the memo.
     - `server_config` (Dict[str, Any]): Configuration information for the server, such as host address and port, used to initialize client connections.
+      - A server entry can include `max_concurrency` to limit its concurrent tool calls.
+      - A server entry can include `memoize`, a list of its side-effect free tools whose results are reused across calls with the same arguments, e.g. `["select", "get_schema"]`.
+
+    Tool calls that do not depend on each other (directly or through `__ref__`) are executed concurrently.
+    Only the servers providing the tools of the call are started, when first needed, based on a persisted tool directory.
+    Results returned as msgpack or Arrow payload resources are passed to other tools without being re-parsed.
+    Local servers declaring a `result_format` argument return large results as shared-memory handles instead.
 
     **Returns**:
     - Any: The result after executing the target tool.
@@ -123,128 +190,277 @@ async def proxy(target_tool: str, tool_args: Dict[str, Any], server_config: Dict
         }
     )
     """
-    # Create and initialize MCP session clients
-    mcp_clients = []
-    for name, config in server_config["mcpServers"].items():
-        if name != 'proxy':
-            mcp_clients.append(MCPClient(name, config))
-
-    # Define internal helper function with mapping from tools to clients and result cache
-    async def _proxy(
-            target_tool: str,
-            tool_args: Dict[str, Any],
-            tool_to_client: Dict[str, Tuple[Tool, MCPClient]],
-            results_cache: Dict[str, Any],
-    ) -> Any:
-        # Check if the target tool exists
-        if target_tool not in tool_to_client:
-            raise RuntimeError(f"Tool '{target_tool}' was not found in the available tools list.")
-
-        # Get the client providing the target tool
-        mcp_tool: Tool = tool_to_client[target_tool][0]
-        client: MCPClient = tool_to_client[target_tool][1]
-
-        # Process tool arguments, supporting nested tool calls and references
-        processed_args = {}
-        for arg_key, arg_value in tool_args.items():
-            if isinstance(arg_value, dict):
-                if "__tool__" in arg_value:
-                    # Tool call
-                    identifier = arg_value.get("identifier")
-                    if not identifier:
-                        raise RuntimeError(f"Missing 'identifier' field in tool call: {arg_value}")
-
-                    # Check uniqueness of identifier
-                    if identifier in results_cache:
-                        raise RuntimeError(
-                            f"The identifier '{identifier}' already exists. Please ensure each tool call has a unique identifier.")
-
-                    # Get tool name and arguments
-                    nested_tool = arg_value["__tool__"]
-                    nested_args = arg_value.get("args", {})
-                    transform_expr = arg_value.get("__transform__")
-
-                    # Recursively call _proxy to handle nested tool
-                    nested_result = await _proxy(nested_tool, nested_args, tool_to_client, results_cache)
-
-                    # Store raw result in cache
-                    results_cache[identifier] = nested_result
-
-                    # Apply transformation (if any)
-                    if transform_expr:
-                        try:
-                            # Safely evaluate lambda expression
-                            # Note: Executing lambda expressions from untrusted input poses security risks
-                            # Ensure inputs are trusted or use safer parsing methods
-                            transform_func = eval(transform_expr, {"__builtins__": {}})
-                            transformed_result = transform_func(nested_result)
-                        except Exception as e:
-                            raise RuntimeError(
-                                f"Failed to execute transformation expression: {transform_expr}. Error: {e}")
-                    else:
-                        transformed_result = nested_result
-
-                    # Assign processed value
-                    processed_args[arg_key] = transformed_result
-
-                elif "__ref__" in arg_value:
-                    # Reference
-                    ref_identifier = arg_value["__ref__"]
-                    if ref_identifier not in results_cache:
-                        raise RuntimeError(f"Referenced identifier '{ref_identifier}' not found.")
-
-                    ref_result = results_cache[ref_identifier]
-
-                    # Apply transformation (if any)
-                    transform_expr = arg_value.get("__transform__")
-                    if transform_expr:
-                        try:
-                            transform_func = eval(transform_expr, {"__builtins__": {}})
-                            transformed_ref = transform_func(ref_result)
-                        except Exception as e:
-                            raise RuntimeError(
-                                f"Failed to execute transformation expression: {transform_expr}. Error: {e}")
-                    else:
-                        transformed_ref = ref_result
-
-                    # Assign processed value
-                    processed_args[arg_key] = transformed_ref
-
-                else:
-                    # Other dictionaries, assign directly
-                    processed_args[arg_key] = arg_value
-            else:
-                # Direct assignment
-                processed_args[arg_key] = arg_value
+    servers = {name: config for name, config in server_config["mcpServers"].items() if name != 'proxy'}
 
-        # Execute the target tool and get result
-        result: ServiceResponse = await client.execute_tool(target_tool, **processed_args)
-        return _parser_result(result)
+    # `__trace__` is an option of the proxy call, not an argument of the target tool
+    tool_args = dict(tool_args)
+    traced = bool(tool_args.pop(TRACE_KEY, TRACE))
 
-    # Build mapping from tool names to clients
-    tool_2_client = await fetch_all_tools(mcp_clients)
+    # Build the dependency graph of tool calls, from nested calls and references
+    plan = Plan(target_tool, tool_args)
+    tool_names = set(plan.tools())
+    trace = Trace(target_tool, plan) if traced else None
 
-    # Result cache based on identifier
-    results_cache: Dict[str, Any] = {}
+    # Servers are connected on their first call that is not memoized
+    connections: Dict[str, asyncio.Future] = {}
+    memo_hits, memo_lookups = 0, 0
+    error = None
 
-    result = await _proxy(target_tool, tool_args, tool_2_client, results_cache)
+    async def connect(name: str) -> PooledClient:
+        if name not in connections:
+            connections[name] = asyncio.ensure_future(client_pool.acquire(name, servers[name]))
+        return await connections[name]
 
-    for client in mcp_clients:
-        sync_exec(client.cleanup)
+    async def connect_all() -> Dict[str, Tuple[Tool, PooledClient]]:
+        pooled_clients = await asyncio.gather(*[connect(name) for name in servers])
+        tool_directory.update(pooled_clients)
+        return fetch_all_tools(list({pooled.key: pooled for pooled in pooled_clients}.values()))
 
-    return result
+    try:
+        # Find the servers providing the tools of the plan in the tool directory, or connect to all of them on a cache miss
+        tool_2_server = tool_directory.resolve_servers(servers, tool_names)
+        located: Dict[str, Tuple[Tool, PooledClient]] = {}
+        if tool_2_server is None:
+            tool_2_server = {}
+            located = await connect_all()
+
+            # Check that all tools exist before executing any of them
+            for tool_name in plan.tools():
+                if tool_name not in located:
+                    raise RuntimeError(f"Tool '{tool_name}' was not found in the available tools list.")
+
+        async def locate(tool_name: str) -> Tuple[Tool, PooledClient]:
+            if tool_name not in located and tool_name in tool_2_server:
+                pooled = await connect(tool_2_server[tool_name])
+                for tool in pooled.tools:
+                    if tool.name == tool_name:
+                        located[tool_name] = (tool, pooled)
+            if tool_name not in located:
+                # The directory is stale: discover the tools of all servers
+                located.update(await connect_all())
+            if tool_name not in located:
+                raise RuntimeError(f"Tool '{tool_name}' was not found in the available tools list.")
+            return located[tool_name]
+
+        def server_of(tool_name: str) -> Tuple[str, Dict[str, Any]]:
+            if tool_name in tool_2_server:
+                return tool_2_server[tool_name], servers[tool_2_server[tool_name]]
+            pooled = located[tool_name][1]
+            return pooled.name, pooled.client.config
+
+        # Regions of the data plane returned by the tools of this call, by node identifier
+        handles: Dict[str, Handle] = {}
+        uses = plan.uses()
+
+        # Streams of the results of streamed calls, by node identifier
+        streams: Dict[str, Stream] = {}
+
+        # Notes of the results of the tools of this call, e.g. that a result is truncated, by node identifier
+        notes: Dict[str, str] = {}
+
+        async def run(node: Node, args: Dict[str, Any]) -> Any:
+            nonlocal memo_hits, memo_lookups
+            start = time.perf_counter()
+            views = {arg_key: arg_value for arg_key, arg_value in args.items() if isinstance(arg_value, StreamView)}
+            bytes_in = sum(payload_size(args[arg_key]) for arg_key in args if arg_key not in views) if trace else 0
+
+            # Side-effect free tools are answered from the memo without calling their server
+            server_name, config = server_of(node.tool)
+            key = None
+            if not views and memo.allows(config, node.tool):
+                key = memo.key(config, node.tool, args)
+                hit, result = memo.get(key)
+                memo_lookups += 1
+                if hit:
+                    memo_hits += 1
+                    if trace:
+                        now = time.perf_counter()
+                        trace.call(node, server_name, start, now, now, bytes_in, payload_size(result), True)
+                    return result.value if node.map is not None and isinstance(result, Payload) else result
+
+            # Get the client providing the tool
+            tool, pooled = await locate(node.tool)
+
+            if views:
+                return await consume(node, tool, pooled, args, views)
+
+            if node.stream is not None and "command" in pooled.client.config and produces_streams(tool):
+                # The consumer starts on the first chunk, while the producer is still running
+                args[RESULT_FORMAT_ARG] = "stream"
+                if node.stream.chunk_size:
+                    args[CHUNK_SIZE_ARG] = node.stream.chunk_size
+                stream = streams[node.identifier] = Stream(node.identifier)
+                stream.start(produce(node, tool, pooled, args, start, bytes_in, stream))
+                return stream
+
+            # Local producers return large results as handles of the data plane, unless told otherwise
+            if (node.map is None and "command" in pooled.client.config and produces_handles(tool)
+                    and RESULT_FORMAT_ARG not in args):
+                args[RESULT_FORMAT_ARG] = "handle"
+
+            result = await call(node, tool, pooled, args, start, bytes_in, None if key is None else False)
+
+            if key is not None:
+                # Regions of the data plane do not outlive the call, memoize a copy of their bytes unless they
+                # exceed the byte budget anyway
+                if not isinstance(result, Handle):
+                    memo.put(key, result)
+                elif result.size <= memo.max_bytes:
+                    memo.put(key, Payload(result.mime_type, bytes(result.data)))
+
+            if node.map is not None:
+                # Results of `__map__` nodes are collected into a list
+                return result.value if isinstance(result, Payload) else result
+            if isinstance(result, Handle):
+                handles[node.identifier] = result
+                data_plane.retain(result, uses[node.identifier])
+            return result
+
+        async def call(node: Node, tool: Tool, pooled: PooledClient, args: Dict[str, Any], start: float,
+                       bytes_in: int, cache_hit: Optional[bool], stream: Optional[Stream] = None) -> Any:
+            # Forward payloads and handles as they are to arguments accepting them, decode them for the others
+            for arg_key, arg_value in args.items():
+                if isinstance(arg_value, Payload):
+                    args[arg_key] = arg_value.to_argument() if accepts_payload(tool, arg_key) else arg_value.value
+
+            # Execute the tool within the concurrency limit of its server
+            async with pooled.semaphore:
+                called = time.perf_counter()
+                result: ServiceResponse = await pooled.client.execute_tool(
+                    node.tool, stream.on_progress if stream is not None else None, **args)
+                returned = time.perf_counter()
+            note = _result_note(result)
+            result = _parser_result(result)
+            if note:
+                notes[node.identifier] = note
+            if trace:
+                bytes_out = stream.bytes if stream is not None and stream.chunks else payload_size(result)
+                trace.call(node, pooled.name, start, called, returned, bytes_in, bytes_out, cache_hit)
+            return result
+
+        async def produce(node: Node, tool: Tool, pooled: PooledClient, args: Dict[str, Any], start: float,
+                          bytes_in: int, stream: Stream) -> None:
+            result = await call(node, tool, pooled, args, start, bytes_in, None, stream)
+            if isinstance(result, dict) and STREAM_END_KEY in result:
+                if result[STREAM_END_KEY] != stream.chunks:
+                    raise RuntimeError(
+                        f"Received {stream.chunks} of the {result[STREAM_END_KEY]} chunks streamed by '{node.identifier}'.")
+            else:
+                # The producer returned its whole result instead
+                stream.put(result)
+
+        async def consume(node: Node, tool: Tool, pooled: PooledClient, args: Dict[str, Any],
+                          views: Dict[str, StreamView]) -> Any:
+            stream = next(iter(views.values())).stream
+
+            if not consumes_streams(tool):
+                # The consumer needs its whole input: collect the chunks, and transform them together
+                rows = []
+                async for chunk in stream:
+                    rows.extend(chunk.value if isinstance(chunk, Payload) else chunk)
+                    if isinstance(chunk, Handle):
+                        chunk.unlink()
+                return await run(node, {**args, **{arg_key: apply_transform(view.transform, rows)
+                                                   for arg_key, view in views.items()}})
+
+            # Incremental consumers are called once per chunk, in order, then once more for their result
+            position = {"id": uuid.uuid4().hex, "seq": 0, "final": False}
+            try:
+                async for chunk in stream:
+                    start = time.perf_counter()
+                    try:
+                        chunk_args = {arg_key: apply_transform(view.transform, chunk) for arg_key, view in views.items()}
+                        bytes_in = sum(payload_size(arg_value) for arg_value in chunk_args.values()) if trace else 0
+                        await call(node, tool, pooled, {**args, **chunk_args, STREAM_ARG: dict(position)}, start,
+                                   bytes_in, None)
+                    finally:
+                        # The consumer is done with the chunk, which lets the producer go on
+                        if isinstance(chunk, Handle):
+                            chunk.unlink()
+                    position["seq"] += 1
+
+                position["final"] = True
+                return await call(node, tool, pooled, {**args, **{arg_key: [] for arg_key in views},
+                                                       STREAM_ARG: dict(position)}, time.perf_counter(), 0, None)
+            except Exception:
+                if not position["final"]:
+                    # Let the consumer drop the state of the stream
+                    try:
+                        await pooled.client.execute_tool(node.tool, **{**args, **{arg_key: [] for arg_key in views},
+                                                                        STREAM_ARG: {**position, "final": True,
+                                                                                     "abort": True}})
+                    except Exception as e:
+                        logger.warning(f"Could not abort stream of '{node.identifier}': {e}")
+                raise
+
+        def on_ready(node: Node) -> None:
+            if trace:
+                trace.ready(node)
+
+        def on_done(node: Node) -> None:
+            if trace:
+                trace.done(node)
+
+            # Results of dependencies are no longer used by this node
+            for placeholder in node.placeholders():
+                if placeholder.identifier in handles:
+                    data_plane.release(handles[placeholder.identifier])
+
+        try:
+            # Independent tool calls run concurrently
+            if trace:
+                trace.executing()
+            result = await plan.execute(run, on_done, on_ready)
+            result = result.value if isinstance(result, Payload) else result
+        finally:
+            # Remove the regions left by failed or cancelled nodes and the target result, and unconsumed chunks
+            for handle in handles.values():
+                data_plane.discard(handle)
+            for stream in streams.values():
+                stream.close()
+            if memo_lookups:
+                logger.info(f"Memoized {memo_hits}/{memo_lookups} tool calls, "
+                            f"hit rate {memo_hits / memo_lookups:.0%} ({memo.hit_rate():.0%} overall)")
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # Give back the clients acquired by this call
+        pooled_clients = await asyncio.gather(*connections.values(), return_exceptions=True)
+        client_pool.release_many([pooled for pooled in pooled_clients if isinstance(pooled, PooledClient)])
+
+        if trace:
+            trace.finish(error, memo_hits, memo_lookups, memo.hit_rate())
+            if TRACE_FILE:
+                trace.write(TRACE_FILE)
+
+    # Notes of the results, then the trace, follow the content of the result
+    extra = [TextContent(type="text", text=note if identifier == TARGET else f"Result of '{identifier}': {note}")
+             for identifier, note in notes.items()]
+    if trace:
+        extra.append(trace.to_resource())
+    return [result, *extra] if extra else result
+
+
+def _result_note(result: ServiceResponse) -> Optional[str]:
+    """Note of a successful tool result, e.g. that it is truncated, see `data_plane.format_result`."""
+    if result.status == ServiceExecStatus.ERROR or not isinstance(result.content, list) or len(result.content) != 1:
+        return None
+    content = result.content[0]
+    return result_note(content if isinstance(content, dict) else content.model_dump())
 
 
 def _parser_result(result: ServiceResponse) -> Any:
     """
     Parse the content of ServiceResponse to extract actual data.
     Raise an exception if the response status indicates failure.
+    Payload resources (msgpack or Arrow) are returned undecoded as a `Payload`, handles as a `Handle`.
 
     **Parameters**:
     - `result` (ServiceResponse): The response result from tool execution.
 
     **Returns**:
-    - Any: Parsed actual data.
+    - Any: Parsed actual data, or a `Payload`.
 
     **Exceptions**:
     - `RuntimeError`: If tool execution fails or the content format is incorrect.
@@ -255,6 +471,9 @@ def _parser_result(result: ServiceResponse) -> Any:
     assert isinstance(result.content, list) and len(
         result.content) == 1, "The content of the tool execution result should be a list."
     if isinstance(result.content[0], dict):
+        payload = Handle.from_content(result.content[0]) or Payload.from_content(result.content[0])
+        if payload is not None:
+            return payload
         return literal_eval(result.content[0]["text"])
     elif isinstance(result.content[0], TextContent):
         return literal_eval(result.content[0].text)
@@ -265,35 +484,30 @@ def _parser_result(result: ServiceResponse) -> Any:
         )
 
 
-async def fetch_all_tools(mcp_clients: List[MCPClient]) -> Dict[str, Tuple[Tool, MCPClient]]:
+def fetch_all_tools(pooled_clients: List[PooledClient]) -> Dict[str, Tuple[Tool, PooledClient]]:
     """
-    Fetch available tools from all MCP clients and build a mapping from tool names to (tool, client).
+    Build a mapping from tool names to (tool, client) from the tool lists cached by pooled clients.
 
     **Parameters**:
-    - `mcp_clients` (List[MCPClient]): List of MCP session handlers.
+    - `pooled_clients` (List[PooledClient]): List of pooled MCP session handlers.
 
     **Returns**:
-    - Dict[str, Tuple[Tool, MCPClient]]: Mapping from tool names to (tool, client).
+    - Dict[str, Tuple[Tool, PooledClient]]: Mapping from tool names to (tool, client).
 
     **Exceptions**:
     - `RuntimeError`: If the same tool is available in multiple clients.
     """
-    tool_2_client: Dict[str, Tuple[Tool, MCPClient]] = {}
-
-    # Get tool lists from all clients
-    all_tools_lists: List[List[Tool]] = [
-        sync_exec(client.list_tools) for client in mcp_clients
-    ]
+    tool_2_client: Dict[str, Tuple[Tool, PooledClient]] = {}
 
     # Build mapping from tool names to clients
-    for client, tools in zip(mcp_clients, all_tools_lists):
-        for tool in tools:
+    for pooled in pooled_clients:
+        for tool in pooled.tools:
             if tool.name in tool_2_client:
                 raise RuntimeError(
                     f"Tool '{tool.name}' is available in multiple clients: "
-                    f"'{tool_2_client[tool.name][0].name}' and '{client.name}'."
+                    f"'{tool_2_client[tool.name][1].name}' and '{pooled.name}'."
                 )
-            tool_2_client[tool.name] = (tool, client)
+            tool_2_client[tool.name] = (tool, pooled)
 
     return tool_2_client
 
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+This module receives the chunks of streamed tool results. A producer called
+with `result_format="stream"` sends each chunk as a handle of the data
+plane in a progress notification; the proxy hands the chunks to the
+consumer as they arrive and removes each region once it is processed, so
+the memory of a stream is bounded by a few chunks.
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+from loguru import logger
+
+from data_plane import Handle, STREAM_ACK_KEY
+
+
+class Stream:
+    """Chunks of a streamed tool result, in order."""
+
+    def __init__(self, identifier: str) -> None:
+        """
+        Initialize a Stream instance.
+
+        Parameters:
+        identifier (str): Identifier of the producer node.
+        """
+        self.identifier = identifier
+        self.chunks = 0
+        self.bytes = 0
+        self.closed = False
+        self.producer: Optional[asyncio.Future] = None
+        # Chunks are small handles, the end of the stream is None
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_progress(self, progress: float, total: Optional[float], message: Optional[str]) -> None:
+        """Progress callback of the producer call, receiving the handle of a chunk and the channel to acknowledge it."""
+        argument = json.loads(message) if message else None
+        ack = argument.pop(STREAM_ACK_KEY, None) if isinstance(argument, dict) else None
+        handle = Handle.from_argument(argument)
+        if handle is None:
+            return
+        # Removing the region tells the producer that the chunk was taken
+        handle.ack = ack
+        if self.closed:
+            handle.unlink()
+            return
+        self.chunks += 1
+        self.bytes += handle.size
+        self._queue.put_nowait(handle)
+
+    def put(self, value: Any) -> None:
+        """Add a chunk, e.g. the whole result of a producer that did not stream it."""
+        if self.closed:
+            if isinstance(value, Handle):
+                value.unlink()
+            return
+        self._queue.put_nowait(value)
+
+    def start(self, producer: Awaitable[Any]) -> None:
+        """
+        Run the producer call in the background.
+
+        Parameters:
+        producer (Awaitable[Any]): The call, done when all chunks were received.
+        """
+        self.producer = asyncio.ensure_future(producer)
+        self.producer.add_done_callback(lambda _: self._queue.put_nowait(None))
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        # Surface the failure of the producer
+        self.producer.result()
+
+    def view(self, transform: Optional[str]) -> "StreamView":
+        """The stream as an argument, with a transform applied to each chunk."""
+        return StreamView(self, transform)
+
+    def close(self) -> None:
+        """
+        Remove the chunks that were not processed, and those still to come.
+        MCP calls cannot be cancelled on the server, so a running producer
+        is left to finish, which it does without waiting for its consumer.
+        """
+        self.closed = True
+        while not self._queue.empty():
+            chunk = self._queue.get_nowait()
+            if isinstance(chunk, Handle):
+                chunk.unlink()
+
+        if self.producer is None:
+            return
+        if self.producer.done():
+            # Failures were surfaced to the consumer, if any
+            if not self.producer.cancelled():
+                self.producer.exception()
+        else:
+            self.producer.add_done_callback(self._log_failure)
+
+    def _log_failure(self, producer: asyncio.Future) -> None:
+        if not producer.cancelled() and producer.exception() is not None:
+            logger.warning(f"Stream of '{self.identifier}' failed: {producer.exception()}")
+
+
+@dataclass
+class StreamView:
+    """An argument receiving the chunks of a stream, transformed by `transform`."""
+
+    stream: Stream
+    transform: Optional[str] = None
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+This module persists which tools each MCP server provides, so that a proxy
+call only connects to the servers its plan actually uses.
+"""
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+from loguru import logger
+
+from client_pool import PooledClient, config_key
+
+# Version of the directory file format; other versions are ignored
+FORMAT_VERSION = 1
+
+# Default location of the directory file
+DEFAULT_DIRECTORY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "mcp-proxy-exec", "tool_directory.json")
+
+
+class ToolDirectory:
+    """
+    Persisted directory from server configurations to the names of their
+    tools. Entries are keyed by the canonical hash of the server config, so
+    a changed config is a cache miss, and are replaced whenever the live
+    tool list or the server version of a connected server differs.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_DIRECTORY_PATH) -> None:
+        """
+        Initialize a ToolDirectory instance.
+
+        Parameters:
+        path (Optional[str]): Path of the directory file, None to keep it in memory only.
+        """
+        self.path = path
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def resolve_servers(self, servers: Dict[str, Dict[str, Any]], tools: Iterable[str]) -> Optional[Dict[str, str]]:
+        """
+        Find the servers providing the given tools.
+
+        Parameters:
+        servers (Dict[str, Dict[str, Any]]): Mapping from server names to configurations.
+        tools (Iterable[str]): Names of the tools used by the plan.
+
+        Returns:
+            Optional[Dict[str, str]]: Mapping from tool names to server names,
+            or None if some tool is not known to come from any of the servers.
+        """
+        tool_2_server = {}
+        for name, config in servers.items():
+            entry = self.entries.get(config_key(config))
+            if entry is not None:
+                for tool in entry["tools"]:
+                    tool_2_server.setdefault(tool, name)
+
+        resolved = {}
+        for tool in tools:
+            if tool not in tool_2_server:
+                return None
+            resolved[tool] = tool_2_server[tool]
+        return resolved
+
+    def update(self, pooled_clients: Iterable[PooledClient]) -> None:
+        """
+        Record the live tool lists of connected servers, persisting the directory if it changed.
+
+        Parameters:
+        pooled_clients (Iterable[PooledClient]): Connected clients.
+        """
+        changed = False
+        for pooled in pooled_clients:
+            server_info = pooled.client.server_info
+            entry = {
+                "name": pooled.name,
+                "version": server_info.version if server_info is not None else None,
+                "tools": sorted(tool.name for tool in pooled.tools),
+            }
+            previous = self.entries.get(pooled.key)
+            if previous is None or previous["version"] != entry["version"] or previous["tools"] != entry["tools"]:
+                self.entries[pooled.key] = entry
+                changed = True
+
+        if changed:
+            self._save()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignore unreadable tool directory {self.path}: {e}")
+            return {}
+        if data.get("format") != FORMAT_VERSION:
+            return {}
+        return data.get("servers", {})
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # Write atomically, as several proxy processes may share the file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tool_directory-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"format": FORMAT_VERSION, "servers": self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist tool directory {self.path}: {e}")
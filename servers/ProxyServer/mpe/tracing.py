@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+This module records the execution trace of a proxy call: when each node of
+the plan became ready and finished, and for each tool call its queueing,
+call and parsing time, the bytes passed in and out, whether it was answered
+from the memo, and the server that ran it. Traces are returned with the
+result and appended to a JSONL file for offline critical-path analysis.
+"""
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from mcp.types import EmbeddedResource, TextResourceContents
+
+from payload import Payload
+from plan import Node, Plan, TARGET
+
+# Key of the target arguments enabling the trace of a proxy call
+TRACE_KEY = "__trace__"
+
+# MIME type of trace resources
+TRACE_MIME_TYPE = "application/vnd.mpe.trace+json"
+
+# Default location of the trace file
+DEFAULT_TRACE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "mcp-proxy-exec", "traces.jsonl")
+
+
+def payload_size(value: Any) -> int:
+    """
+    Get the size of a value passed between tools.
+
+    Args:
+        value (Any): Argument or result.
+
+    Returns:
+        int: Bytes of a payload or handle, of a string, or of the JSON of other values.
+    """
+    if isinstance(value, Payload):
+        # Handles know their size without mapping their region
+        return getattr(value, "size", None) or len(value.data)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+@dataclass
+class CallSpan:
+    """A tool call of a node, in milliseconds since the start of the proxy call."""
+
+    start_ms: float
+    queue_ms: float
+    call_ms: float
+    parse_ms: float
+    bytes_in: int
+    bytes_out: int
+    cache_hit: Optional[bool] = None
+
+
+@dataclass
+class NodeSpan:
+    """A node of the plan, with its calls: one, or one per element, batch or chunk of a `__map__` node."""
+
+    identifier: str
+    tool: str
+    deps: List[str]
+    map: bool = False
+    server: Optional[str] = None
+    ready_ms: Optional[float] = None
+    transform_ms: Optional[float] = None
+    done_ms: Optional[float] = None
+    calls: List[CallSpan] = field(default_factory=list)
+
+
+class Trace:
+    """Execution trace of a proxy call."""
+
+    def __init__(self, target_tool: str, plan: Plan) -> None:
+        """
+        Initialize a Trace instance when the execution of the plan starts.
+
+        Parameters:
+        target_tool (str): Name of the target tool.
+        plan (Plan): The plan of the call.
+        """
+        self.call_id = uuid.uuid4().hex
+        self.target_tool = target_tool
+        self.started_at = time.time()
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.memo: Dict[str, Any] = {}
+        self.nodes = {
+            identifier: NodeSpan(identifier, node.tool, sorted(node.deps), node.map is not None)
+            for identifier, node in plan.nodes.items()
+        }
+        self._start = time.perf_counter()
+        self._setup_ms: Optional[float] = None
+        self._wall_ms: Optional[float] = None
+
+    def ms(self, t: float) -> float:
+        """Milliseconds from the start of the call to a `time.perf_counter()` value."""
+        return round((t - self._start) * 1000, 3)
+
+    def executing(self) -> None:
+        """Record that the plan starts executing, after the servers of the plan were located."""
+        self._setup_ms = self.ms(time.perf_counter())
+
+    def ready(self, node: Node) -> None:
+        """Record that the dependencies of a node are done."""
+        self.nodes[node.identifier].ready_ms = self.ms(time.perf_counter())
+
+    def done(self, node: Node) -> None:
+        """Record that a node is done, successfully or not."""
+        self.nodes[node.identifier].done_ms = self.ms(time.perf_counter())
+
+    def call(self, node: Node, server: str, start: float, called: float, returned: float,
+             bytes_in: int, bytes_out: int, cache_hit: Optional[bool]) -> None:
+        """
+        Record a tool call of a node.
+
+        Parameters:
+        node (Node): The node.
+        server (str): Name of the server providing the tool.
+        start (float): `time.perf_counter()` when the arguments were resolved.
+        called (float): `time.perf_counter()` when the request was sent, after
+            connecting to the server and waiting for its concurrency limit.
+        returned (float): `time.perf_counter()` when the response was received.
+        bytes_in (int): Size of the arguments.
+        bytes_out (int): Size of the result.
+        cache_hit (Optional[bool]): Whether the result came from the memo, None if the tool is not memoized.
+        """
+        span = self.nodes[node.identifier]
+        span.server = server
+        if span.transform_ms is None and span.ready_ms is not None:
+            # Transforms of the results of dependencies run before the first call
+            span.transform_ms = round(self.ms(start) - span.ready_ms, 3)
+        now = time.perf_counter()
+        span.calls.append(CallSpan(
+            start_ms=self.ms(start),
+            queue_ms=round((called - start) * 1000, 3),
+            call_ms=round((returned - called) * 1000, 3),
+            parse_ms=round((now - returned) * 1000, 3),
+            bytes_in=bytes_in,
+            bytes_out=bytes_out,
+            cache_hit=cache_hit,
+        ))
+
+    def finish(self, error: Optional[BaseException] = None, memo_hits: int = 0, memo_lookups: int = 0,
+               memo_hit_rate: Optional[float] = None) -> None:
+        """
+        Record the end of the call.
+
+        Parameters:
+        error (Optional[BaseException]): The exception of a failed call.
+        memo_hits (int): Number of calls of this proxy call answered from the memo.
+        memo_lookups (int): Number of calls of this proxy call looked up in the memo.
+        memo_hit_rate (Optional[float]): Hit rate of the memo since the proxy started.
+        """
+        self._wall_ms = self.ms(time.perf_counter())
+        if error is not None:
+            self.status = "error"
+            self.error = str(error)
+        self.memo = {
+            "hits": memo_hits,
+            "lookups": memo_lookups,
+            "hit_rate": memo_hits / memo_lookups if memo_lookups else None,
+            "process_hit_rate": memo_hit_rate,
+        }
+
+    def critical_path(self) -> List[str]:
+        """
+        Get the critical path of the call: from the target, the dependency
+        that finished last, recursively.
+
+        Returns:
+            List[str]: Identifiers of the nodes of the path, from the first to the target.
+        """
+        path = [TARGET]
+        deps = self.nodes[TARGET].deps
+        while deps:
+            last = max(deps, key=lambda identifier: self.nodes[identifier].done_ms or 0.0)
+            path.append(last)
+            deps = self.nodes[last].deps
+        return path[::-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The trace as a JSON-serializable dictionary."""
+        return {
+            "call_id": self.call_id,
+            "target_tool": self.target_tool,
+            "started_at": self.started_at,
+            "wall_ms": self._wall_ms,
+            "setup_ms": self._setup_ms,
+            "status": self.status,
+            "error": self.error,
+            "memo": self.memo,
+            "critical_path": self.critical_path(),
+            "nodes": [asdict(span) for span in self.nodes.values()],
+        }
+
+    def to_resource(self) -> EmbeddedResource:
+        """
+        Wrap the trace in an `EmbeddedResource`, returned after the result of the proxy call.
+
+        Returns:
+            EmbeddedResource: The resource.
+        """
+        return EmbeddedResource(
+            type="resource",
+            resource=TextResourceContents(
+                uri=f"trace://{self.call_id}",
+                mimeType=TRACE_MIME_TYPE,
+                text=json.dumps(self.to_dict()),
+            ),
+        )
+
+    def write(self, path: str) -> None:
+        """
+        Append the trace to a JSONL file.
+
+        Parameters:
+        path (str): Path of the trace file.
+        """
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.to_dict()) + "\n")
+        except OSError as e:
+            # The trace is a diagnostic, it never fails the call
+            logger.warning(f"Could not write trace to {path}: {e}")
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+This module compiles `__transform__` expressions into cached callables.
+
+Lambda expressions are evaluated once and reused. Common projection and
+filter idioms, e.g. `lambda data: [row[0] for row in data]`, and named
+transforms, e.g. `col(0) | to_float`, are also compiled into pipelines of
+steps, which run as column operations of `pyarrow.compute` on Arrow payloads
+instead of decoding them into rows, and with `operator.itemgetter` and
+`itertools.compress` on lists of rows for named transforms.
+"""
+import ast
+import builtins
+import functools
+import operator
+from abc import ABC, abstractmethod
+from itertools import compress, repeat
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from payload import Payload, ARROW_MIME_TYPE, pyarrow
+
+if pyarrow is not None:
+    import pyarrow.compute
+
+# Builtins available to lambda expressions
+SAFE_BUILTINS = {
+    name: getattr(builtins, name)
+    for name in ("abs", "bool", "dict", "enumerate", "float", "int", "len", "list", "map", "max", "min",
+                 "range", "round", "sorted", "str", "sum", "tuple", "zip")
+}
+
+# Comparison operators of filter idioms, with their `pyarrow.compute` counterparts
+_COMPARISONS = {
+    ast.Gt: (operator.gt, "greater"),
+    ast.GtE: (operator.ge, "greater_equal"),
+    ast.Lt: (operator.lt, "less"),
+    ast.LtE: (operator.le, "less_equal"),
+    ast.Eq: (operator.eq, "equal"),
+    ast.NotEq: (operator.ne, "not_equal"),
+}
+
+# Casts of projection idioms and named transforms
+_CASTS = {"float": float, "int": int, "str": str}
+
+
+class Step(ABC):
+    """A step of a compiled transform."""
+
+    @abstractmethod
+    def rows(self, data: Any) -> Any:
+        """Apply the step to Python values, e.g. a list of rows."""
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        """Apply the step to an Arrow table or column, or return None if the step cannot be vectorized on it."""
+        return None
+
+
+class Column(Step):
+    """Project one column: `[row[i] for row in data]`, optionally cast: `[float(row[i]) for row in data]`."""
+
+    def __init__(self, index: Any, cast: Optional[str] = None) -> None:
+        self.index = index
+        self.cast = cast
+
+    def rows(self, data: Any) -> Any:
+        values = map(operator.itemgetter(self.index), data)
+        if self.cast:
+            values = map(_CASTS[self.cast], values)
+        return list(values)
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        if not isinstance(data, pyarrow.Table) or not isinstance(self.index, int):
+            return None
+        if not -data.num_columns <= self.index < data.num_columns:
+            return None
+        column = data.column(self.index % data.num_columns)
+        return Cast(self.cast).arrow(column) if self.cast else column
+
+
+class Columns(Step):
+    """Project several columns: `[(row[i], row[j]) for row in data]` or `[[row[i], row[j]] for row in data]`."""
+
+    def __init__(self, indices: Sequence[Any], as_list: bool = False) -> None:
+        self.indices = list(indices)
+        self.as_list = as_list
+
+    def rows(self, data: Any) -> Any:
+        if len(self.indices) == 1:
+            # `itemgetter` with a single index does not return a tuple
+            values = ((value,) for value in map(operator.itemgetter(self.indices[0]), data))
+        else:
+            values = map(operator.itemgetter(*self.indices), data)
+        return list(map(list, values)) if self.as_list else list(values)
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        if not isinstance(data, pyarrow.Table) or not all(isinstance(i, int) for i in self.indices):
+            return None
+        if not all(-data.num_columns <= i < data.num_columns for i in self.indices):
+            return None
+        columns = [data.column(i % data.num_columns).to_pylist() for i in self.indices]
+        return list(map(list, zip(*columns))) if self.as_list else list(zip(*columns))
+
+
+class Slice(Step):
+    """Slice rows: `[row[i:j] for row in data]`."""
+
+    def __init__(self, start: Optional[int], stop: Optional[int], step: Optional[int]) -> None:
+        self.slice = slice(start, stop, step)
+
+    def rows(self, data: Any) -> Any:
+        return list(map(operator.itemgetter(self.slice), data))
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        if not isinstance(data, pyarrow.Table):
+            return None
+        # Rows of Arrow payloads are decoded as tuples, as are their slices
+        return data.select(list(range(data.num_columns))[self.slice])
+
+
+class Filter(Step):
+    """Filter rows: `[row for row in data if row[i] > value]`."""
+
+    def __init__(self, index: Any, comparison: type, value: Any) -> None:
+        self.index = index
+        self.op, self.arrow_op = _COMPARISONS[comparison]
+        self.value = value
+
+    def rows(self, data: Any) -> Any:
+        keys = map(operator.itemgetter(self.index), data)
+        return list(compress(data, map(self.op, keys, repeat(self.value))))
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        if not isinstance(data, pyarrow.Table) or not isinstance(self.index, int):
+            return None
+        if not -data.num_columns <= self.index < data.num_columns:
+            return None
+        column = data.column(self.index % data.num_columns)
+        if column.null_count:
+            # Comparing None raises in Python, leave it to the row path
+            return None
+        try:
+            mask = getattr(pyarrow.compute, self.arrow_op)(column, self.value)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError, pyarrow.ArrowTypeError):
+            return None
+        return data.filter(mask)
+
+
+class Transpose(Step):
+    """Transpose rows into columns: `list(zip(*data))` or `[list(c) for c in zip(*data)]`."""
+
+    def __init__(self, as_list: bool = False) -> None:
+        self.as_list = as_list
+
+    def rows(self, data: Any) -> Any:
+        return list(map(list, zip(*data))) if self.as_list else list(zip(*data))
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        if not isinstance(data, pyarrow.Table) or data.num_rows == 0:
+            return None
+        columns = [column.to_pylist() for column in data.columns]
+        return columns if self.as_list else list(map(tuple, columns))
+
+
+class Cast(Step):
+    """Cast a list of values: `to_float`, `to_int`, `to_str`."""
+
+    def __init__(self, cast: str) -> None:
+        self.cast = cast
+
+    def rows(self, data: Any) -> Any:
+        return list(map(_CASTS[self.cast], data))
+
+    def arrow(self, data: Any) -> Optional[Any]:
+        if not isinstance(data, (pyarrow.ChunkedArray, pyarrow.Array)):
+            return None
+        kind = data.type
+        numeric = pyarrow.types.is_integer(kind) or pyarrow.types.is_floating(kind) or pyarrow.types.is_decimal(kind)
+        if data.null_count or not numeric:
+            # Arrow and Python disagree on casts of strings and None
+            return None
+        if self.cast == "float":
+            return data.cast(pyarrow.float64())
+        if self.cast == "int" and pyarrow.types.is_integer(kind):
+            return data
+        return None
+
+
+class Transform:
+    """A compiled `__transform__` expression."""
+
+    def __init__(self, expr: str, steps: Optional[List[Step]] = None, func: Optional[Callable] = None) -> None:
+        """
+        Initialize a Transform instance.
+
+        Parameters:
+        expr (str): The expression.
+        steps (Optional[List[Step]]): Steps of a recognized idiom or named transform.
+        func (Optional[Callable]): The evaluated lambda expression, applied to Python values
+            instead of the steps if given.
+        """
+        self.expr = expr
+        self.steps = steps
+        self.func = func
+
+    @property
+    def vectorized(self) -> bool:
+        return self.steps is not None
+
+    def __call__(self, value: Any) -> Any:
+        """
+        Apply the transform to a result.
+
+        Args:
+            value (Any): The result, possibly a `Payload`.
+
+        Returns:
+            Any: The transformed result.
+        """
+        if isinstance(value, Payload):
+            if self.steps is not None and pyarrow is not None and value.mime_type == ARROW_MIME_TYPE:
+                result = self._apply_arrow(value.table())
+                if result is not None:
+                    return result
+            value = value.value
+
+        if self.func is not None:
+            return self.func(value)
+        for step in self.steps:
+            value = step.rows(value)
+        return value
+
+    def _apply_arrow(self, table: Any) -> Optional[Any]:
+        data = table
+        for i, step in enumerate(self.steps):
+            if not isinstance(data, (pyarrow.Table, pyarrow.ChunkedArray, pyarrow.Array)):
+                # Finish on the Python values
+                for rest in self.steps[i:]:
+                    data = rest.rows(data)
+                return data
+            data = step.arrow(data)
+            if data is None:
+                return None
+
+        if isinstance(data, pyarrow.Table):
+            return list(zip(*[column.to_pylist() for column in data.columns]))
+        if isinstance(data, (pyarrow.ChunkedArray, pyarrow.Array)):
+            return data.to_pylist()
+        return data
+
+
+# Named transforms, composed with `|`, e.g. `col(0) | to_float`
+NAMED_TRANSFORMS: Dict[str, Callable[..., Step]] = {
+    "col": lambda index: Column(index),
+    "cols": lambda *indices: Columns(indices),
+    "to_float": lambda: Cast("float"),
+    "to_int": lambda: Cast("int"),
+    "to_str": lambda: Cast("str"),
+    "transpose": lambda: Transpose(),
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_transform(expr: str) -> Transform:
+    """
+    Compile a `__transform__` expression, caching the result by expression string.
+
+    Args:
+        expr (str): A lambda expression, or named transforms composed with `|`.
+
+    Returns:
+        Transform: The compiled transform.
+
+    Raises:
+        SyntaxError: If the expression cannot be parsed.
+        RuntimeError: If the arguments of a named transform are invalid.
+    """
+    tree = ast.parse(expr.strip(), mode="eval").body
+
+    steps = _named_steps(tree)
+    if steps is not None:
+        return Transform(expr, steps=steps)
+
+    # Note: Executing lambda expressions from untrusted input poses security risks
+    # Ensure inputs are trusted or use safer parsing methods
+    func = eval(expr, {"__builtins__": SAFE_BUILTINS})
+
+    # Comprehensions are as fast as the row steps, recognized idioms only take the columnar path
+    steps = _idiom_steps(tree) if isinstance(tree, ast.Lambda) else None
+    return Transform(expr, steps=steps, func=func)
+
+
+def _named_steps(node: ast.expr) -> Optional[List[Step]]:
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        left, right = _named_steps(node.left), _named_steps(node.right)
+        if left is None or right is None:
+            return None
+        return left + right
+
+    if isinstance(node, ast.Name) and node.id in NAMED_TRANSFORMS:
+        return [NAMED_TRANSFORMS[node.id]()]
+
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in NAMED_TRANSFORMS
+            and not node.keywords):
+        args = [_constant(arg) for arg in node.args]
+        if any(arg is _NOT_CONSTANT for arg in args):
+            return None
+        try:
+            return [NAMED_TRANSFORMS[node.func.id](*args)]
+        except TypeError as e:
+            raise RuntimeError(f"Invalid arguments of transform `{node.func.id}`: {e}")
+
+    return None
+
+
+def _idiom_steps(node: ast.Lambda) -> Optional[List[Step]]:
+    args = node.args
+    if len(args.args) != 1 or args.vararg or args.kwarg or args.kwonlyargs or args.defaults or args.posonlyargs:
+        return None
+    data = args.args[0].arg
+    body = node.body
+
+    # list(zip(*data))
+    if _is_call(body, "list", 1) and _is_zip_star(body.args[0], data):
+        return [Transpose()]
+
+    if not isinstance(body, ast.ListComp) or len(body.generators) != 1:
+        return None
+    generator = body.generators[0]
+    if (generator.is_async or not isinstance(generator.target, ast.Name)
+            or len(generator.ifs) > 1):
+        return None
+    row = generator.target.id
+
+    # [list(c) for c in zip(*data)]
+    if _is_zip_star(generator.iter, data) and not generator.ifs:
+        if _is_call(body.elt, "list", 1) and _is_name(body.elt.args[0], row):
+            return [Transpose(as_list=True)]
+        return None
+
+    if not _is_name(generator.iter, data):
+        return None
+
+    steps = []
+    if generator.ifs:
+        # [... for row in data if row[i] > value]
+        condition = generator.ifs[0]
+        if not (isinstance(condition, ast.Compare) and len(condition.ops) == 1
+                and type(condition.ops[0]) in _COMPARISONS):
+            return None
+        index = _row_index(condition.left, row)
+        value = _constant(condition.comparators[0])
+        if index is _NOT_CONSTANT or value is _NOT_CONSTANT:
+            return None
+        steps.append(Filter(index, type(condition.ops[0]), value))
+
+    projection = _projection(body.elt, row)
+    if projection is None:
+        return None
+    if projection is not _IDENTITY:
+        steps.append(projection)
+    return steps or None
+
+
+_NOT_CONSTANT = object()
+_IDENTITY = object()
+
+
+def _projection(elt: ast.expr, row: str) -> Any:
+    # row
+    if _is_name(elt, row):
+        return _IDENTITY
+
+    # row[i]
+    index = _row_index(elt, row)
+    if index is not _NOT_CONSTANT:
+        return Column(index)
+
+    # float(row[i])
+    if isinstance(elt, ast.Call) and isinstance(elt.func, ast.Name) and elt.func.id in _CASTS:
+        if len(elt.args) == 1 and not elt.keywords:
+            index = _row_index(elt.args[0], row)
+            if index is not _NOT_CONSTANT:
+                return Column(index, cast=elt.func.id)
+        return None
+
+    # (row[i], row[j]) or [row[i], row[j]]
+    if isinstance(elt, (ast.Tuple, ast.List)) and elt.elts:
+        indices = [_row_index(e, row) for e in elt.elts]
+        if any(i is _NOT_CONSTANT for i in indices):
+            return None
+        return Columns(indices, as_list=isinstance(elt, ast.List))
+
+    # row[i:j]
+    if (isinstance(elt, ast.Subscript) and _is_name(elt.value, row) and isinstance(elt.slice, ast.Slice)):
+        bounds = [_constant(b) if b is not None else None for b in (elt.slice.lower, elt.slice.upper, elt.slice.step)]
+        if any(b is _NOT_CONSTANT or not (b is None or isinstance(b, int)) for b in bounds):
+            return None
+        return Slice(*bounds)
+
+    return None
+
+
+def _row_index(node: ast.expr, row: str) -> Any:
+    if isinstance(node, ast.Subscript) and _is_name(node.value, row) and not isinstance(node.slice, ast.Slice):
+        index = _constant(node.slice)
+        if isinstance(index, (int, str)) and not isinstance(index, bool):
+            return index
+    return _NOT_CONSTANT
+
+
+def _constant(node: ast.expr) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return _NOT_CONSTANT
+
+
+def _is_name(node: ast.expr, name: str) -> bool:
+    return isinstance(node, ast.Name) and node.id == name
+
+
+def _is_call(node: ast.expr, name: str, n_args: int) -> bool:
+    return (isinstance(node, ast.Call) and _is_name(node.func, name)
+            and len(node.args) == n_args and not node.keywords)
+
+
+def _is_zip_star(node: ast.expr, data: str) -> bool:
+    return (isinstance(node, ast.Call) and _is_name(node.func, "zip") and len(node.args) == 1
+            and isinstance(node.args[0], ast.Starred) and _is_name(node.args[0].value, data))
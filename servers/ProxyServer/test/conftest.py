@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+The modules of the proxy import each other by their flat names, as when the
+server runs as a script, so the tests import them from the `mpe` directory.
+"""
+import os
+import sys
+
+import pytest
+
+MPE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mpe"))
+sys.path.insert(0, MPE)
+
+
+
+@pytest.fixture
+def regions(tmp_path, monkeypatch):
+    """Shared memory and spill directories of the data plane for a test, with memory pressure under control."""
+    import data_plane
+
+    shm, spill = tmp_path / "shm", tmp_path / "spill"
+    shm.mkdir()
+    monkeypatch.setattr(data_plane, "SHM_DIR", str(shm))
+    monkeypatch.setattr(data_plane, "SPILL_DIR", str(spill))
+    pressure = {"on": False}
+    monkeypatch.setattr(data_plane, "under_pressure", lambda size=0: pressure["on"])
+    return shm, spill, pressure
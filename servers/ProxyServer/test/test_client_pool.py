@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the client pool against real stdio MCP servers: reuse, and replacement of dead servers.
+"""
+import asyncio
+import os
+import signal
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip("mcp")
+
+from client_pool import ClientPool
+
+SERVER = textwrap.dedent('''
+    import os
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("pid")
+
+    @mcp.tool()
+    def pid() -> int:
+        return os.getpid()
+
+    mcp.run()
+''')
+
+
+@pytest.fixture
+def config(tmp_path):
+    script = tmp_path / "server.py"
+    script.write_text(SERVER)
+    return {"command": sys.executable, "args": [str(script)]}
+
+
+async def server_pid(entry):
+    response = await entry.client.execute_tool("pid")
+    return int(response.content[0]["text"])
+
+
+class TestClientPool:
+    """Pooling of stdio MCP servers."""
+
+    def test_reuse(self, config):
+        async def run():
+            pool = ClientPool()
+            try:
+                entry = await pool.acquire("pid", config)
+                pid = await server_pid(entry)
+                pool.release(entry)
+
+                again = await pool.acquire("pid", dict(reversed(list(config.items()))))
+                assert again is entry and await server_pid(again) == pid
+                pool.release(again)
+            finally:
+                await pool.close()
+
+        asyncio.run(run())
+
+    def test_killed_server_is_replaced(self, config):
+        async def run():
+            pool = ClientPool()
+            try:
+                entry = await pool.acquire("pid", config)
+                pid = await server_pid(entry)
+                pool.release(entry)
+
+                os.kill(pid, signal.SIGKILL)
+                # The owner task stops once the transport ends, without waiting for a health check
+                await asyncio.wait_for(entry._task, 10)
+                assert not entry.alive
+
+                replacement = await pool.acquire("pid", config)
+                assert replacement is not entry
+                assert await server_pid(replacement) != pid
+                pool.release(replacement)
+            finally:
+                await pool.close()
+
+        asyncio.run(run())
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the regions of the data plane: handles, their lifetime and spilling.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+import data_plane
+from data_plane import DataPlane, Handle, sweep_regions
+from payload import MSGPACK_MIME_TYPE, Payload
+
+pytest.importorskip("msgpack")
+
+
+def put(size):
+    return Handle.put(Payload.encode(b"x" * size))
+
+
+class TestHandle:
+    """Regions and their handles."""
+
+    def test_put(self, regions):
+        shm, _, _ = regions
+        payload = Payload.encode([(1, "a"), (2, None)])
+        handle = Handle.put(payload)
+        assert os.path.dirname(handle.path) == os.path.realpath(shm)
+        assert os.path.basename(handle.path).startswith(data_plane.FILE_PREFIX)
+        assert handle.size == len(payload.data) and not handle.spilled
+        assert bytes(handle.data) == payload.data
+        assert handle.value == [(1, "a"), (2, None)]
+
+    def test_put_under_pressure(self, regions):
+        _, spill, pressure = regions
+        pressure["on"] = True
+        handle = put(10)
+        assert handle.spilled and os.path.dirname(handle.path) == os.path.realpath(spill)
+
+    def test_round_trip(self, regions):
+        handle = put(10)
+        assert Handle.from_argument(handle.to_argument()).path == handle.path
+        content = handle.to_resource().model_dump()
+        assert Handle.from_content(content).size == handle.size
+        assert Handle.from_argument({"data": 1}) is None
+        assert Handle.from_content({"type": "text", "text": "1"}) is None
+
+    def test_outside_data_plane(self, regions, tmp_path):
+        other = tmp_path / f"{data_plane.FILE_PREFIX}other"
+        other.write_bytes(b"x")
+        with pytest.raises(RuntimeError, match="not a region of the data plane"):
+            Handle(str(other), MSGPACK_MIME_TYPE, 1)
+        shm, _, _ = regions
+        with pytest.raises(RuntimeError, match="not a region of the data plane"):
+            Handle(str(shm / "no-prefix"), MSGPACK_MIME_TYPE, 1)
+        with pytest.raises(RuntimeError, match="not a region of the data plane"):
+            Handle(str(shm / ".." / other.name), MSGPACK_MIME_TYPE, 1)
+
+    def test_spill_keeps_maps(self, regions):
+        handle = put(10)
+        data = handle.data
+        handle.spill()
+        assert handle.spilled and os.path.exists(handle.path)
+        assert bytes(data) == bytes(handle.data)
+
+    def test_unlink(self, regions):
+        handle = put(10)
+        value = handle.data
+        handle.unlink()
+        assert not os.path.exists(handle.path)
+        # Views of the region stay readable until they are released
+        assert len(value) == handle.size
+        handle.unlink()
+
+
+class TestDataPlane:
+    """Lifetime of retained regions."""
+
+    def test_release(self, regions):
+        plane = DataPlane()
+        handle = put(10)
+        plane.retain(handle, 2)
+        plane.release(handle)
+        assert os.path.exists(handle.path)
+        plane.release(handle)
+        assert not os.path.exists(handle.path)
+        # Releasing a removed region is a no-op
+        plane.release(handle)
+
+    def test_retain_unused(self, regions):
+        handle = put(10)
+        DataPlane().retain(handle, 0)
+        assert not os.path.exists(handle.path)
+
+    def test_retain_again(self, regions):
+        plane = DataPlane()
+        handle = put(10)
+        plane.retain(handle, 1)
+        plane.retain(handle, 1)
+        plane.release(handle)
+        assert os.path.exists(handle.path)
+        plane.release(handle)
+        assert not os.path.exists(handle.path)
+
+    def test_discard(self, regions):
+        plane = DataPlane()
+        handle = put(10)
+        plane.retain(handle, 3)
+        plane.discard(handle)
+        assert not os.path.exists(handle.path)
+        plane.release(handle)
+
+    def test_spill_largest_first(self, regions, monkeypatch):
+        plane = DataPlane()
+        small, large = put(10), put(1000)
+        plane.retain(small, 1)
+        plane.retain(large, 1)
+
+        # Pressure is relieved once the largest region is spilled
+        checks = iter([True, False])
+        monkeypatch.setattr(data_plane, "under_pressure", lambda size=0: next(checks))
+        plane.spill()
+        assert large.spilled and not small.spilled
+
+        # Spilled regions keep their pending uses
+        plane.release(large)
+        assert not os.path.exists(large.path)
+
+    def test_retain_spills_under_pressure(self, regions):
+        _, _, pressure = regions
+        plane = DataPlane()
+        handle = put(10)
+        pressure["on"] = True
+        plane.retain(handle, 2)
+        assert handle.spilled
+        plane.release(handle)
+        assert os.path.exists(handle.path)
+        plane.release(handle)
+        assert not os.path.exists(handle.path)
+
+    def test_close(self, regions):
+        shm, spill, pressure = regions
+        plane = DataPlane()
+        plane.retain(put(10), 1)
+        pressure["on"] = True
+        plane.retain(put(10), 2)
+        plane.close()
+        assert not os.listdir(shm) and not os.listdir(spill)
+
+
+def age(handle, seconds):
+    """Make a region look as if it was last modified `seconds` ago."""
+    mtime = time.time() - seconds
+    os.utime(handle.path, (mtime, mtime))
+
+
+class TestExpiry:
+    """Removal of regions that no proxy retains."""
+
+    def test_sweep(self, regions, monkeypatch):
+        shm, spill, _ = regions
+        monkeypatch.setattr(data_plane, "REGION_TTL", 10)
+        old, fresh = put(10), put(10)
+        age(old, 20)
+        spilled = put(10)
+        spilled.spill()
+        age(spilled, 20)
+        other = shm / "other"
+        other.write_bytes(b"x")
+        os.utime(other, (0, 0))
+
+        assert sweep_regions() == 2
+        # Only expired files of the data plane are removed
+        assert sorted(os.listdir(shm)) == sorted([os.path.basename(fresh.path), "other"])
+        assert not os.listdir(spill)
+
+    def test_put_sweeps(self, regions, monkeypatch):
+        shm, _, _ = regions
+        monkeypatch.setattr(data_plane, "REGION_TTL", 10)
+        monkeypatch.setattr(data_plane, "_last_sweep", 0.0)
+        old = put(10)
+        age(old, 20)
+        monkeypatch.setattr(data_plane, "_last_sweep", 0.0)
+        new = put(10)
+        assert os.listdir(shm) == [os.path.basename(new.path)]
+
+    def test_retained_regions_refreshed(self, regions, monkeypatch):
+        shm, _, _ = regions
+        monkeypatch.setattr(data_plane, "REGION_TTL", 0.3)
+
+        async def run():
+            plane = DataPlane()
+            retained, unclaimed = put(10), put(10)
+            plane.retain(retained, 1)
+            # Both would have expired without the refresh of retained regions
+            age(retained, 0.25)
+            age(unclaimed, 0.25)
+            await asyncio.sleep(0.2)
+            assert os.listdir(shm) == [os.path.basename(retained.path)]
+            plane.close()
+
+        asyncio.run(run())
+        assert not os.listdir(shm)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the memoization of tool results: keys, time to live and byte budget.
+"""
+import time
+
+import pytest
+
+from memo import ResultMemo
+from payload import MSGPACK_MIME_TYPE, Payload
+
+pytest.importorskip("msgpack")
+
+CONFIG = {"command": "python", "args": ["server.py"], "env": {"A": "1", "B": "2"}, "memoize": ["select"]}
+
+
+class TestMemoKeys:
+    """Canonicalization of the keys of tool calls."""
+
+    def test_argument_order(self):
+        assert (ResultMemo.key(CONFIG, "select", {"sql": "SELECT 1", "limit": 10})
+                == ResultMemo.key(CONFIG, "select", {"limit": 10, "sql": "SELECT 1"}))
+
+    def test_config_order(self):
+        reordered = {"memoize": ["select"], "env": {"B": "2", "A": "1"}, "args": ["server.py"], "command": "python"}
+        assert ResultMemo.key(CONFIG, "select", {}) == ResultMemo.key(reordered, "select", {})
+
+    def test_distinct_calls(self):
+        key = ResultMemo.key(CONFIG, "select", {"sql": "SELECT 1"})
+        assert key != ResultMemo.key(CONFIG, "select", {"sql": "SELECT 2"})
+        assert key != ResultMemo.key(CONFIG, "get_schema", {"sql": "SELECT 1"})
+        assert key != ResultMemo.key({**CONFIG, "env": {"A": "2"}}, "select", {"sql": "SELECT 1"})
+        # Values of different types with the same JSON are different calls
+        assert ResultMemo.key(CONFIG, "scale", {"data": [1]}) != ResultMemo.key(CONFIG, "scale", {"data": "[1]"})
+
+    def test_payloads_by_content(self):
+        payload = Payload.encode([(1, "a")])
+        same = Payload(MSGPACK_MIME_TYPE, bytes(payload.data))
+        other = Payload.encode([(2, "a")])
+        assert ResultMemo.key(CONFIG, "scale", {"data": payload}) == ResultMemo.key(CONFIG, "scale", {"data": same})
+        assert ResultMemo.key(CONFIG, "scale", {"data": payload}) != ResultMemo.key(CONFIG, "scale", {"data": other})
+
+    def test_allows(self):
+        assert ResultMemo.allows(CONFIG, "select")
+        assert not ResultMemo.allows(CONFIG, "insert")
+        assert not ResultMemo.allows({"command": "python"}, "select")
+
+
+class TestResultMemo:
+    """Lookups, time to live and byte budget."""
+
+    def test_get_put(self):
+        memo = ResultMemo()
+        assert memo.hit_rate() is None
+        assert memo.get("k") == (False, None)
+        memo.put("k", "result")
+        assert memo.get("k") == (True, "result")
+        assert memo.hit_rate() == 0.5
+
+    def test_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        memo = ResultMemo(ttl=10)
+        memo.put("k", "result")
+
+        now[0] += 10
+        assert memo.get("k") == (True, "result")
+        now[0] += 0.1
+        assert memo.get("k") == (False, None)
+        assert memo._bytes == 0
+
+        # Putting a result again renews it
+        memo.put("k", "result")
+        now[0] += 5
+        memo.put("k", "result")
+        now[0] += 8
+        assert memo.get("k") == (True, "result")
+
+    def test_byte_budget(self):
+        memo = ResultMemo(max_bytes=10)
+        memo.put("a", "aaaa")
+        memo.put("b", "bbbb")
+        # Recently used results are kept
+        memo.get("a")
+        memo.put("c", "cccc")
+        assert memo.get("b") == (False, None)
+        assert memo.get("a") == (True, "aaaa") and memo.get("c") == (True, "cccc")
+        assert memo._bytes == 8
+
+    def test_oversized(self):
+        memo = ResultMemo(max_bytes=10)
+        memo.put("a", "aaaa")
+        memo.put("b", "b" * 11)
+        assert memo.get("b") == (False, None)
+        # Results do not make room for an oversized one
+        assert memo.get("a") == (True, "aaaa")
+
+    def test_replace(self):
+        memo = ResultMemo(max_bytes=10)
+        memo.put("a", "aaaa")
+        memo.put("a", "aaaaaa")
+        assert memo.get("a") == (True, "aaaaaa")
+        assert memo._bytes == 6
+
+    def test_payload_size(self):
+        payload = Payload.encode(list(range(100)))
+        memo = ResultMemo(max_bytes=len(payload.data))
+        memo.put("p", payload)
+        assert memo.get("p") == (True, payload)
+        memo.put("q", "q")
+        assert memo.get("p") == (False, None)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the dependency graph of proxy calls: building, validation and concurrent execution.
+"""
+import asyncio
+
+import pytest
+
+from plan import TARGET, Plan
+
+
+def tool(name, identifier, **args):
+    return {"__tool__": name, "identifier": identifier, "args": args}
+
+
+class TestPlanBuilding:
+    """Building and validation of plans."""
+
+    def test_nested_calls(self):
+        plan = Plan("plot", {"x": tool("scale", "s", data=tool("select", "q", sql="SELECT 1")), "title": "t"})
+        assert set(plan.nodes) == {TARGET, "s", "q"}
+        assert plan.nodes[TARGET].deps == {"s"}
+        assert plan.nodes["s"].deps == {"q"}
+        assert plan.nodes[TARGET].args["title"] == "t"
+        assert sorted(plan.tools()) == ["plot", "scale", "select"]
+
+    def test_missing_identifier(self):
+        with pytest.raises(RuntimeError, match="Missing 'identifier'"):
+            Plan("plot", {"x": {"__tool__": "select", "args": {}}})
+
+    def test_duplicate_identifier(self):
+        with pytest.raises(RuntimeError, match="already exists"):
+            Plan("plot", {"x": tool("select", "q"), "y": tool("select", "q")})
+        with pytest.raises(RuntimeError, match="already exists"):
+            Plan("plot", {"x": tool("select", TARGET)})
+
+    def test_unknown_reference(self):
+        with pytest.raises(RuntimeError, match="'missing' not found"):
+            Plan("plot", {"x": {"__ref__": "missing"}})
+
+    def test_cycles(self):
+        # Nested calls referencing each other
+        with pytest.raises(RuntimeError, match="Circular references"):
+            Plan("plot", {"x": tool("a", "a", data={"__ref__": "b"}), "y": tool("b", "b", data={"__ref__": "a"})})
+        # A nested call referencing the target
+        with pytest.raises(RuntimeError, match="Circular references"):
+            Plan("plot", {"x": tool("a", "a", data={"__ref__": TARGET})})
+        # A call referencing itself
+        with pytest.raises(RuntimeError, match="a -> a"):
+            Plan("plot", {"x": tool("a", "a", data={"__ref__": "a"})})
+
+    def test_diamond(self):
+        # Shared results are not cycles
+        plan = Plan("plot", {
+            "x": tool("scale", "s", data=tool("select", "q")),
+            "y": tool("norm", "n", data={"__ref__": "q"}),
+        })
+        assert plan.nodes["n"].deps == {"q"}
+
+    def test_uses(self):
+        plan = Plan("plot", {
+            "x": tool("scale", "s", data=tool("select", "q")),
+            "y": {"__ref__": "q", "__transform__": "col(1)"},
+            "z": tool("norm", "n", data={"__ref__": "s"}),
+        })
+        assert plan.uses() == {TARGET: 1, "s": 2, "q": 2, "n": 1}
+
+    def test_map(self):
+        plan = Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "over": tool("select", "q"), "as": "data",
+                                   "args": {"factor": 2}, "batch_size": 10, "concurrency": 2}})
+        node = plan.nodes["m"]
+        assert node.tool == "scale" and node.deps == {"q"}
+        assert node.map.arg == "data" and node.map.batch_size == 10 and node.map.concurrency == 2
+        assert node.map.over.identifier == "q"
+
+    def test_map_validation(self):
+        over = [1, 2, 3]
+        with pytest.raises(RuntimeError, match="requires 'over' and 'as'"):
+            Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "over": over}})
+        with pytest.raises(RuntimeError, match="requires 'over' and 'as'"):
+            Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "as": "data"}})
+        with pytest.raises(RuntimeError, match="cannot set both"):
+            Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "over": over, "as": "data",
+                                "batch_size": 2, "chunk_size": 2}})
+        with pytest.raises(RuntimeError, match="also given in 'args'"):
+            Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "over": over, "as": "data",
+                                "args": {"data": []}}})
+        for size in (0, -1, 1.5, True, "2"):
+            with pytest.raises(RuntimeError, match="must be a positive integer"):
+                Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "over": over, "as": "data",
+                                    "concurrency": size}})
+
+    def test_map_uses(self):
+        plan = Plan("plot", {
+            "x": tool("scale", "s", data=tool("select", "q")),
+            "z": {"__map__": "norm", "identifier": "m", "over": {"__ref__": "s"}, "as": "data",
+                  "args": {"other": {"__ref__": "q"}}},
+        })
+        assert plan.uses() == {TARGET: 1, "s": 2, "q": 2, "m": 1}
+
+    def test_stream_validation(self):
+        stream = {**tool("select", "q"), "stream": True, "chunk_size": 100}
+        plan = Plan("plot", {"x": stream})
+        assert plan.nodes["q"].stream.chunk_size == 100
+
+        with pytest.raises(RuntimeError, match="must only be used by the arguments of one"):
+            Plan("plot", {"x": stream, "y": tool("scale", "s", data={"__ref__": "q"})})
+        with pytest.raises(RuntimeError, match="must only be used by the arguments of one"):
+            Plan("plot", {"x": {"__map__": "scale", "identifier": "m", "over": stream, "as": "data"}})
+        with pytest.raises(RuntimeError, match="only receive one streamed result"):
+            Plan("plot", {"x": stream, "y": {**tool("select", "r"), "stream": True}})
+        with pytest.raises(RuntimeError, match="must be a positive integer"):
+            Plan("plot", {"x": {**stream, "chunk_size": 0}})
+
+
+class TestPlanExecution:
+    """Concurrent execution of plans."""
+
+    def test_execute(self):
+        plan = Plan("add", {
+            "a": tool("double", "d", x=tool("one", "o")),
+            "b": {"__ref__": "o", "__transform__": "lambda x: x + 10"},
+        })
+        order = []
+
+        async def run(node, args):
+            order.append(node.identifier)
+            if node.tool == "one":
+                return 1
+            if node.tool == "double":
+                return 2 * args["x"]
+            return args["a"] + args["b"]
+
+        assert asyncio.run(plan.execute(run)) == 13
+        assert order[0] == "o" and order[-1] == TARGET
+
+    def test_independent_branches_run_concurrently(self):
+        plan = Plan("join", {"a": tool("slow", "a"), "b": tool("slow", "b")})
+        running, peak = [0], [0]
+
+        async def run(node, args):
+            if node.tool == "join":
+                return peak[0]
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+
+        assert asyncio.run(plan.execute(run)) == 2
+
+    def test_map(self):
+        plan = Plan("collect", {"values": {"__map__": "square", "identifier": "m", "over": [1, 2, 3, 4, 5],
+                                           "as": "x", "concurrency": 2}})
+        running, peak = [0], [0]
+
+        async def run(node, args):
+            if node.tool == "collect":
+                return args["values"]
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return args["x"] ** 2
+
+        assert asyncio.run(plan.execute(run)) == [1, 4, 9, 16, 25]
+        assert peak[0] == 2
+
+    def test_map_batches(self):
+        plan = Plan("collect", {"values": {"__map__": "square", "identifier": "m", "over": [1, 2, 3],
+                                           "as": "x", "batch_size": 2}})
+
+        def run(square):
+            async def run(node, args):
+                if node.tool == "collect":
+                    return args["values"]
+                return square(args["x"])
+            return run
+
+        assert asyncio.run(plan.execute(run(lambda batch: [x ** 2 for x in batch]))) == [1, 4, 9]
+        with pytest.raises(RuntimeError, match="one result per element"):
+            asyncio.run(plan.execute(run(sum)))
+
+    def test_failure(self):
+        plan = Plan("plot", {"x": tool("fail", "f"), "y": tool("slow", "s")})
+        done = []
+
+        async def run(node, args):
+            if node.tool == "fail":
+                raise ValueError("failed")
+            await asyncio.sleep(10)
+
+        with pytest.raises(ValueError, match="failed"):
+            asyncio.run(plan.execute(run, on_done=lambda node: done.append(node.identifier)))
+        # Running nodes are cancelled, dependents of the failure never start
+        assert sorted(done) == ["f", "s"]
+
+    def test_transform_failure(self):
+        plan = Plan("plot", {"x": {**tool("one", "o"), "__transform__": "lambda x: x[0]"}})
+
+        async def run(node, args):
+            return 1
+
+        with pytest.raises(RuntimeError, match="Failed to execute transformation expression"):
+            asyncio.run(plan.execute(run))
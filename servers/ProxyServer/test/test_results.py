@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the parsing of tool results by the proxy, including results with a
+note, e.g. the truncated results of BridgeScope.
+"""
+import json
+import os
+
+import pytest
+
+import data_plane
+from data_plane import Handle, format_result
+from mcp_client import ServiceExecStatus, ServiceResponse
+from payload import Payload
+from server import _parser_result, _result_note
+
+ROWS = [(1, "Fresno"), (2, "O'Neill # 1"), (3, None)]
+NOTE = "Truncated: only the first 3 rows are returned. Add filters, aggregations or an explicit LIMIT clause to see more."
+
+
+def response(content):
+    """Tool result as received by the proxy, after a JSON round trip."""
+    return ServiceResponse(status=ServiceExecStatus.SUCCESS,
+                           content=json.loads(json.dumps([c.model_dump() for c in content], default=str)))
+
+
+class TestResults:
+    """Round trips of formatted results through the proxy."""
+
+    def test_text(self):
+        result = response(format_result(ROWS, "text"))
+        assert _parser_result(result) == ROWS
+        assert _result_note(result) is None
+
+    def test_truncated_text(self):
+        content = format_result(ROWS, "text", NOTE)
+        assert len(content) == 1 and content[0].text.endswith(NOTE)
+        result = response(content)
+        assert _parser_result(result) == ROWS
+        assert _result_note(result) == NOTE
+
+    def test_truncated_payload(self):
+        pytest.importorskip("msgpack")
+        result = response(format_result(ROWS, "payload", NOTE))
+        payload = _parser_result(result)
+        assert isinstance(payload, Payload) and payload.value == ROWS
+        assert _result_note(result) == NOTE
+        assert _result_note(response(format_result(ROWS, "payload"))) is None
+
+    def test_truncated_handle(self, regions, monkeypatch):
+        pytest.importorskip("msgpack")
+        monkeypatch.setattr(data_plane, "HANDLE_MIN_SIZE", 0)
+        result = response(format_result(ROWS, "handle", NOTE))
+        handle = _parser_result(result)
+        assert isinstance(handle, Handle) and handle.value == ROWS
+        assert _result_note(result) == NOTE
+        handle.unlink()
+
+    def test_small_handle_inline(self, regions):
+        pytest.importorskip("msgpack")
+        shm, _, _ = regions
+        # Small results do not get a region that would need to be removed
+        result = response(format_result(ROWS, "handle", NOTE))
+        payload = _parser_result(result)
+        assert not isinstance(payload, Handle) and payload.value == ROWS
+        assert _result_note(result) == NOTE
+        assert not os.listdir(shm)
+
+    def test_error(self):
+        result = ServiceResponse(status=ServiceExecStatus.ERROR, content=[{"type": "text", "text": "failed"}])
+        assert _result_note(result) is None
+        with pytest.raises(RuntimeError, match="Tool execution failed"):
+            _parser_result(result)
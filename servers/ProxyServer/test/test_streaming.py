@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of streamed results: chunks are received in order, the producer stays
+within its window, and aborted streams leave no region behind.
+"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import data_plane
+from data_plane import chunked, stream_result
+from streaming import Stream
+
+pytest.importorskip("msgpack")
+
+
+def producer_context(stream):
+    """Context of a producer call whose progress notifications reach the stream."""
+    return SimpleNamespace(
+        request_context=SimpleNamespace(meta=SimpleNamespace(progressToken=1)),
+        report_progress=stream.on_progress,
+    )
+
+
+async def consume(stream, n_chunks=None):
+    """Take chunks as the proxy does, removing each region once it is processed."""
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk.value)
+        chunk.unlink()
+        if len(chunks) == n_chunks:
+            break
+    return chunks
+
+
+class TestChunked:
+    """Splitting rows into chunks."""
+
+    def test_chunked(self):
+        assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(chunked(range(4), 2)) == [[0, 1], [2, 3]]
+        assert list(chunked([], 2)) == []
+
+
+class TestStream:
+    """Streams between a producer and its consumer."""
+
+    def test_order(self, regions):
+        shm, _, _ = regions
+
+        async def run():
+            stream = Stream("rows")
+            stream.start(stream_result(producer_context(stream), chunked(range(10), 3)))
+            chunks = await consume(stream)
+            return chunks, stream.producer.result()
+
+        chunks, result = asyncio.run(run())
+        assert chunks == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+        assert '"__stream_end__": 4' in result[0].text
+        assert not os.listdir(shm)
+
+    def test_window(self, regions, monkeypatch):
+        monkeypatch.setattr(data_plane, "STREAM_WINDOW", 2)
+        shm, _, _ = regions
+
+        async def run():
+            stream = Stream("rows")
+            stream.start(stream_result(producer_context(stream), chunked(range(10), 1)))
+            # The producer waits for the consumer once two chunks are pending
+            await asyncio.sleep(0.05)
+            regions = [name for name in os.listdir(shm) if name.startswith(data_plane.FILE_PREFIX)]
+            assert stream.chunks == 2 and len(regions) == 2
+            return await consume(stream)
+
+        assert asyncio.run(run()) == [[i] for i in range(10)]
+        assert not os.listdir(shm)
+
+    def test_window_polling(self, regions, monkeypatch):
+        monkeypatch.setattr(data_plane, "STREAM_WINDOW", 2)
+        # Without FIFOs, the producer checks for taken chunks
+        monkeypatch.delattr(os, "mkfifo")
+        shm, _, _ = regions
+
+        async def run():
+            stream = Stream("rows")
+            stream.start(stream_result(producer_context(stream), chunked(range(5), 1)))
+            await asyncio.sleep(0.05)
+            assert stream.chunks == 2
+            return await consume(stream)
+
+        assert asyncio.run(run()) == [[i] for i in range(5)]
+        assert not os.listdir(shm)
+
+    def test_ack_outside_data_plane(self, regions, tmp_path):
+        path = tmp_path / "mpeack-file"
+        path.write_bytes(b"data")
+        # Only channels of the data plane are signalled
+        data_plane.StreamAck.signal(str(path))
+        assert path.read_bytes() == b"data"
+
+    def test_producer_failure(self, regions):
+        shm, _, _ = regions
+
+        def rows():
+            yield 1
+            yield 2
+            raise ValueError("failed")
+
+        async def run():
+            stream = Stream("rows")
+            stream.start(stream_result(producer_context(stream), chunked(rows(), 1)))
+            chunks = []
+            # Chunks received before the failure are consumed, then it is surfaced
+            with pytest.raises(ValueError, match="failed"):
+                async for chunk in stream:
+                    chunks.append(chunk.value)
+                    chunk.unlink()
+            return chunks
+
+        assert asyncio.run(run()) == [[1], [2]]
+        assert not os.listdir(shm)
+
+    def test_abort(self, regions, monkeypatch):
+        monkeypatch.setattr(data_plane, "STREAM_WINDOW", 2)
+        shm, _, _ = regions
+
+        async def run():
+            stream = Stream("rows")
+            stream.start(stream_result(producer_context(stream), chunked(range(10), 1)))
+            # The consumer fails after its first chunk
+            assert await consume(stream, 1) == [[0]]
+            await asyncio.sleep(0.01)
+            stream.close()
+
+            # Chunks sent after the abort are removed on arrival, so the producer finishes without waiting
+            result = await asyncio.wait_for(stream.producer, 1)
+            assert '"__stream_end__": 10' in result[0].text
+
+        asyncio.run(run())
+        assert not os.listdir(shm)
+
+    def test_abort_timeout(self, regions, monkeypatch):
+        monkeypatch.setattr(data_plane, "STREAM_WINDOW", 2)
+        monkeypatch.setattr(data_plane, "STREAM_TIMEOUT", 0.05)
+        shm, _, _ = regions
+
+        async def run():
+            stream = Stream("rows")
+            # A consumer that stopped taking chunks without closing the stream
+            with pytest.raises(RuntimeError, match="did not take a chunk"):
+                await stream_result(producer_context(stream), chunked(range(10), 1))
+            stream.close()
+
+        asyncio.run(run())
+        assert not os.listdir(shm)
+
+    def test_abort_timeout_closes_source(self, regions, monkeypatch):
+        monkeypatch.setattr(data_plane, "STREAM_WINDOW", 1)
+        monkeypatch.setattr(data_plane, "STREAM_TIMEOUT", 0.05)
+        state = {"open": False}
+
+        async def rows():
+            state["open"] = True
+            try:
+                for i in range(10):
+                    yield [i]
+            finally:
+                state["open"] = False
+
+        async def run():
+            stream = Stream("rows")
+            with pytest.raises(RuntimeError, match="did not take a chunk"):
+                await stream_result(producer_context(stream), rows())
+            assert not state["open"]
+            stream.close()
+
+        asyncio.run(run())
+
+    def test_chunks_after_close(self, regions):
+        shm, _, _ = regions
+
+        async def run():
+            stream = Stream("rows")
+            stream.close()
+            await stream_result(producer_context(stream), chunked(range(3), 1))
+            stream.put(data_plane.Handle.put(data_plane.Payload.encode([1])))
+
+        asyncio.run(run())
+        assert not os.listdir(shm)
+
+    def test_put(self):
+        async def run():
+            stream = Stream("rows")
+
+            async def producer():
+                # A producer that did not stream its result
+                stream.put([1, 2, 3])
+
+            stream.start(producer())
+            return [chunk async for chunk in stream]
+
+        assert asyncio.run(run()) == [[1, 2, 3]]
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of compiled `__transform__` expressions. Recognized idioms and named
+transforms must give the same results on the row path and on the Arrow path.
+"""
+import pytest
+
+from payload import Payload
+from transforms import compile_transform
+
+pyarrow = pytest.importorskip("pyarrow")
+
+# Idioms and named transforms with steps, and whether they run on Arrow columns of a table without nulls
+VECTORIZED = [
+    ("lambda data: [row[0] for row in data]", True),
+    ("lambda data: [row[-1] for row in data]", True),
+    ("lambda data: [float(row[0]) for row in data]", True),
+    ("lambda data: [int(row[0]) for row in data]", True),
+    ("lambda data: [str(row[0]) for row in data]", False),
+    ("lambda data: [(row[0], row[2]) for row in data]", True),
+    ("lambda data: [[row[1], row[0]] for row in data]", True),
+    ("lambda data: [(row[1],) for row in data]", True),
+    ("lambda data: [row[1:] for row in data]", True),
+    ("lambda data: [row[::2] for row in data]", True),
+    ("lambda data: [row for row in data if row[0] > 1]", True),
+    ("lambda data: [row[2] for row in data if row[1] <= 2.5]", True),
+    ("lambda data: [row for row in data if row[2] == 'b']", True),
+    ("lambda data: [row for row in data if row[2] != 'b']", True),
+    ("lambda data: list(zip(*data))", True),
+    ("lambda data: [list(c) for c in zip(*data)]", True),
+    ("col(0)", True),
+    ("col(1) | to_float", True),
+    ("col(0) | to_int", True),
+    ("col(0) | to_str", False),
+    ("cols(2, 0)", True),
+    ("transpose", True),
+    ("col(0) | to_float | to_int", False),
+]
+
+
+def table(**columns):
+    return pyarrow.table(columns)
+
+
+TABLES = {
+    "numbers": table(a=[1, 2, 3], b=[1.5, 2.5, 3.5], c=["a", "b", "c"]),
+    "nulls": table(a=[1, None, 3], b=[None, 2.5, 3.5], c=["a", "b", None]),
+    "empty": pyarrow.table({"a": pyarrow.array([], pyarrow.int64()), "b": pyarrow.array([], pyarrow.float64()),
+                            "c": pyarrow.array([], pyarrow.string())}),
+    "decimals": table(a=pyarrow.array([1, 2, 3], pyarrow.int32()), b=pyarrow.array([1, 2, 3], pyarrow.decimal128(5, 2)),
+                      c=["a", "b", "c"]),
+}
+
+
+def outcome(func, value):
+    """Result of a call, or the type of the exception it raised."""
+    try:
+        return func(value)
+    except Exception as e:
+        return type(e)
+
+
+class TestTransforms:
+    """Compilation and application of transforms."""
+
+    def test_idioms_are_vectorized(self):
+        for expr, _ in VECTORIZED:
+            assert compile_transform(expr).vectorized, expr
+
+    def test_other_lambdas_are_not_vectorized(self):
+        for expr in [
+            "lambda data: [row[0] + 1 for row in data]",
+            "lambda data: [row[0] for row in data if row[0] > row[1]]",
+            "lambda data: [row[i] for i, row in enumerate(data)]",
+            "lambda data: sum(data)",
+            "lambda x, y: x",
+        ]:
+            transform = compile_transform(expr)
+            assert not transform.vectorized and transform.func is not None, expr
+
+    def test_lambda_results(self):
+        rows = [(1, "a"), (2, "b")]
+        assert compile_transform("lambda data: [row[1] for row in data]")(rows) == ["a", "b"]
+        assert compile_transform("lambda data: [row[0] + 1 for row in data]")(rows) == [2, 3]
+        assert compile_transform("lambda data: len(data)")(rows) == 2
+        assert compile_transform("col(1)")(rows) == ["a", "b"]
+
+    def test_row_path(self):
+        # Steps on rows give the same results as the lambdas they were recognized from
+        rows = [(1, 1.5, "a"), (2, 2.5, "b"), (3, 3.5, "c")]
+        for expr, _ in VECTORIZED:
+            if expr.startswith("lambda"):
+                transform = compile_transform(expr)
+                steps = rows
+                for step in transform.steps:
+                    steps = step.rows(steps)
+                assert steps == transform.func(rows), expr
+
+    def test_arrow_path(self):
+        for name, data in TABLES.items():
+            payload = Payload.encode(data, "arrow")
+            for expr, vectorized in VECTORIZED:
+                transform = compile_transform(expr)
+                expected = outcome(transform, payload.value)
+                assert outcome(transform, payload) == expected, (name, expr)
+
+                arrow = outcome(transform._apply_arrow, payload.table())
+                if arrow is not None:
+                    assert arrow == expected, (name, expr)
+                if name == "numbers":
+                    assert (arrow is not None) == vectorized, expr
+
+    def test_arrow_path_falls_back(self):
+        # Comparisons with None and between mixed types raise on rows, the Arrow path must not hide it
+        nulls = Payload.encode(TABLES["nulls"], "arrow")
+        for expr in ["lambda data: [row for row in data if row[0] > 1]", "col(1) | to_float"]:
+            assert outcome(compile_transform(expr), nulls) is TypeError, expr
+
+        numbers = Payload.encode(TABLES["numbers"], "arrow")
+        assert outcome(compile_transform("lambda data: [row for row in data if row[2] > 1]"), numbers) is TypeError
+
+    def test_out_of_range(self):
+        payload = Payload.encode(TABLES["numbers"], "arrow")
+        assert outcome(compile_transform("col(5)"), payload) is IndexError
+        assert outcome(compile_transform("lambda data: [row for row in data if row[5] > 1]"), payload) is IndexError
+
+    def test_msgpack_payload(self):
+        pytest.importorskip("msgpack")
+        payload = Payload.encode([(1, None), (2, "b")])
+        assert compile_transform("col(1)")(payload) == [None, "b"]
+        assert compile_transform("lambda data: [row for row in data if row[0] >= 2]")(payload) == [(2, "b")]
+
+    def test_compile_is_cached(self):
+        assert compile_transform("col(0) | to_float") is compile_transform("col(0) | to_float")
+
+    def test_invalid(self):
+        with pytest.raises(SyntaxError):
+            compile_transform("lambda data: [")
+        with pytest.raises(RuntimeError, match="Invalid arguments of transform `col`"):
+            compile_transform("col(0, 1)")
+        with pytest.raises(NameError):
+            compile_transform("lambda data: open(data)")(["/etc/passwd"])
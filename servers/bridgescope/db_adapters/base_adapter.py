@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
 
 from db_adapters.db_config import DBConfig
 
@@ -47,6 +48,49 @@ class BaseAdapter(ABC):
         """
         pass
 
+    @abstractmethod
+    async def execute_script(self, sqls: List[str]) -> List[Any]:
+        """
+        Executes multiple SQL statements in order on one connection.
+
+        :param sqls: The SQL statements to execute.
+        :return: A list with the rows returned or #rows affected by each statement.
+        """
+        pass
+
+    async def stream_query(self, sql: str, chunk_size: int) -> AsyncIterator[List[Any]]:
+        """
+        Executes an SQL query and yields its rows in chunks.
+        Adapters fetch the chunks through a server-side cursor where supported.
+
+        :param sql: The SQL query string to execute.
+        :param chunk_size: Number of rows per chunk.
+        :return: An async iterator over lists of up to chunk_size rows.
+        """
+        rows = await self.execute_query(sql)
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
+    async def gather(self, *aws: Awaitable) -> List[Any]:
+        """
+        Runs independent queries concurrently.
+
+        :param aws: Awaitables issuing queries through this adapter.
+        :return: Results in the order of the awaitables.
+        """
+        return list(await asyncio.gather(*aws))
+
+    @abstractmethod
+    async def explain(self, sql: str) -> Dict[str, Any]:
+        """
+        Retrieves the planner estimates of an SQL query without executing it.
+
+        :param sql: The SQL query string to explain.
+        :return: A dictionary with the estimated number of rows ('rows'), the estimated total cost ('cost')
+                 and the raw query plan ('plan').
+        """
+        pass
+
     @abstractmethod
     async def get_user_privileges(self) -> Dict[Any, Dict[Any, List]]:
         """
@@ -114,3 +158,23 @@ class BaseAdapter(ABC):
         Roll back the current transaction.
         """
         pass
+
+    async def listen(self, channel: str, callback: Callable[[], None]) -> None:
+        """
+        Subscribe to database notifications on a channel.
+
+        :param channel: Name of the notification channel.
+        :param callback: Function invoked whenever a notification arrives.
+        :raises NotImplementedError: If the database does not support notifications.
+        """
+        raise NotImplementedError(f"Notifications are not supported for {self.config.db_type}")
+
+    async def get_modification_counters(self, tables: List[str]) -> Dict[str, int]:
+        """
+        Retrieves cumulative counters of rows inserted or updated in tables, used to cheaply detect writes.
+
+        :param tables: Table names.
+        :return: Mapping from table names to their counters. Tables without statistics are omitted.
+        :raises NotImplementedError: If the database does not expose modification counters.
+        """
+        raise NotImplementedError(f"Modification counters are not supported for {self.config.db_type}")
@@ -1,5 +1,6 @@
+import json
 from collections import defaultdict
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
@@ -28,11 +29,104 @@ class PostgresAdapter(SqlAlchemyAdapter):
         :param args: Additional engine arguments
         """
         super().__init__(config, args)
+        self._listen_conn = None
+
+    async def close(self) -> None:
+        """
+        Closes the notification listener and all database connections.
+        """
+        if self._listen_conn:
+            try:
+                await self._listen_conn.close()
+            finally:
+                self._listen_conn = None
+        await super().close()
+
+    async def listen(self, channel: str, callback: Callable[[], None]) -> None:
+        """
+        Subscribe to PostgreSQL notifications (LISTEN/NOTIFY) on a channel.
+
+        A dedicated connection is held open for receiving notifications.
+
+        :param channel: Name of the notification channel.
+        :param callback: Function invoked whenever a notification arrives.
+        :raises DatabaseConnectionError: If database is not connected
+        :raises DatabaseError: If subscribing to the channel fails
+        """
+        if not self.engine:
+            raise DatabaseConnectionError()
+
+        try:
+            if not self._listen_conn:
+                self._listen_conn = await self.engine.connect()
+
+            raw_conn = await self._listen_conn.get_raw_connection()
+            await raw_conn.driver_connection.add_listener(
+                channel, lambda *_: callback()
+            )
+        except Exception as e:
+            raise DatabaseError(f"Failed to listen on channel '{channel}': {e}") from e
+
+    async def explain(self, sql: str) -> Dict[str, Any]:
+        """
+        Retrieve the planner estimates of a query via EXPLAIN (FORMAT JSON).
+
+        :param sql: SQL query string.
+        :return: Dict with estimated rows ('rows'), total cost ('cost') and the top plan node ('plan').
+        :raises DatabaseConnectionError: If database is not connected
+        """
+        if not self.session_factory:
+            raise DatabaseConnectionError()
+
+        async with self.session_context() as session:
+            result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = result.scalar()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        top_node = plan[0]["Plan"]
+        return {
+            "rows": top_node.get("Plan Rows", 0),
+            "cost": top_node.get("Total Cost", 0),
+            "plan": top_node,
+        }
+
+    async def get_modification_counters(self, tables: List[str]) -> Dict[str, int]:
+        """
+        Read the number of inserted and updated rows of tables from the statistics collector.
+
+        :param tables: Table names, optionally qualified or quoted, resolved as in a query (search_path).
+        :return: Mapping from the given table names to their counters.
+        :raises DatabaseConnectionError: If database is not connected
+        :raises DatabaseError: If the statistics cannot be read
+        """
+        if not self.session_factory:
+            raise DatabaseConnectionError()
+
+        try:
+            async with self.session_context() as session:
+                # Match on the oid, so that tables of the same name in other schemas are not counted
+                result = await session.execute(
+                    text(
+                        "SELECT t.name, s.n_tup_ins + s.n_tup_upd "
+                        "FROM unnest(CAST(:names AS text[])) AS t(name) "
+                        "JOIN pg_stat_user_tables s ON s.relid = to_regclass(t.name)"
+                    ),
+                    {"names": list(tables)},
+                )
+                return {name: int(n) for name, n in result.fetchall()}
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Failed to read table statistics: {e}") from e
 
     async def get_user_privileges(self) -> Dict[str, Dict[str, List[str]]]:
         """
         Query the current user's privileges in the PostgreSQL database.
 
+        Privileges are read from the ACL arrays in pg_catalog, including those inherited
+        through role membership and granted to PUBLIC. If the catalog query fails (e.g.,
+        restricted catalog access), the information_schema views are used instead.
+
         :return: Dict mapping privilege types to object types and their object lists.
                 Structure: {
                     'SELECT': {
@@ -50,80 +144,162 @@ class PostgresAdapter(SqlAlchemyAdapter):
 
         try:
             async with self.session_factory() as session:
+                try:
+                    privilege_rows = await self._fetch_catalog_privileges(session)
+                except SQLAlchemyError:
+                    await session.rollback()
+                    privilege_rows = await self._fetch_info_schema_privileges(session)
 
-                # Get the current user from the session
-                result = await session.execute(text("SELECT current_user;"))
-                user_result = result.fetchone()
-
-                if not user_result or not user_result[0]:
-                    raise DatabaseError("Failed to retrieve current user.")
-                current_user = user_result[0]
-
-                # Query all table/column privileges in one query for efficiency
-                privilege_query = text("""
-                                SELECT 
-                                    grantee,
-                                    object_type,
-                                    privilege_type,
-                                    table_schema || '.' || table_name AS table_with_schema,
-                                    column_name
-                                FROM (
-                                    -- Table privileges
-                                    SELECT grantee, 'TABLE'::text AS object_type, privilege_type, table_schema, table_name, NULL AS column_name
-                                    FROM information_schema.role_table_grants
-                                    WHERE grantee = :user
-
-                                    UNION ALL
-
-                                    -- Column privileges 
-                                    SELECT grantee, 'COLUMN'::text AS object_type, privilege_type, table_schema, table_name, column_name
-                                    FROM information_schema.column_privileges
-                                    WHERE grantee = :user
-                                ) AS all_perms
-                                WHERE grantee IS NOT NULL;
-                            """)
-
-                results = await session.execute(privilege_query, {"user": current_user})
-                privilege_rows = results.fetchall()
-
-                # Organize results by privilege type and object type
-                privileges_dict = defaultdict(lambda: defaultdict(list))
-
-                for row in privilege_rows:
-                    grantee, object_type, privilege_type, table_with_schema, column_name = row
-                    if not grantee or not privilege_type:
-                        continue
-
-                    # Handle table-level privileges
-                    if object_type == DB_OBJ_TYPE_ENUM.TABLE:
-                        if table_with_schema not in privileges_dict[privilege_type][object_type]:
-                            privileges_dict[privilege_type][object_type].append(table_with_schema)
-
-                    # Handle column-level privileges
-                    elif object_type == DB_OBJ_TYPE_ENUM.COL:
-                        # Skip column privilege if table-level privilege already exists
-                        if privilege_type in privileges_dict and DB_OBJ_TYPE_ENUM.TABLE in privileges_dict[privilege_type] and \
-                            table_with_schema in privileges_dict[privilege_type][DB_OBJ_TYPE_ENUM.TABLE]:
-                            continue
-
-                        column_identifier = f"{table_with_schema}.{column_name}"
-                        if column_identifier not in privileges_dict[privilege_type][object_type]:
-                            privileges_dict[privilege_type][object_type].append(column_identifier)
-
-                # Clean up empty privilege categories
-                cleaned_privileges = {}
-                for privilege_type, objects in privileges_dict.items():
-                    cleaned_objects = {
-                        object_type: object_list
-                        for object_type, object_list in objects.items()
-                        if object_list
-                    }
-                    if cleaned_objects:
-                        cleaned_privileges[privilege_type] = cleaned_objects
-
-                return cleaned_privileges
+                return self._organize_privileges(privilege_rows)
 
         except SQLAlchemyError as e:
             raise DatabaseError(f"Failed to fetch PostgreSQL user privileges: {e}") from e
         except Exception as e:
-            raise DatabaseError(f"Unexpected error while fetching user privileges: {e}") from e
\ No newline at end of file
+            if isinstance(e, DatabaseError):
+                raise
+            raise DatabaseError(f"Unexpected error while fetching user privileges: {e}") from e
+
+    async def _fetch_catalog_privileges(self, session) -> List[Tuple]:
+        """
+        Fetch table/column privileges of the current user by exploding the ACL arrays of
+        pg_class and pg_attribute. Role inheritance is resolved via pg_auth_members.
+
+        :param session: Active database session
+        :return: Rows of (grantee, object_type, privilege_type, table_with_schema, column_name)
+        """
+        privilege_query = text("""
+                        WITH RECURSIVE member_of AS (
+                            -- Current user and all roles whose privileges it inherits
+                            SELECT oid AS roleid FROM pg_roles WHERE rolname = current_user
+                            UNION
+                            SELECT m.roleid
+                            FROM pg_auth_members m
+                            JOIN member_of r ON m.member = r.roleid
+                            JOIN pg_roles mr ON mr.oid = m.member
+                            WHERE mr.rolinherit
+                        ),
+                        grantees AS (
+                            SELECT roleid FROM member_of
+                            UNION ALL
+                            -- PUBLIC
+                            SELECT 0::oid
+                        ),
+                        relations AS (
+                            SELECT c.oid, c.relowner, c.relacl, n.nspname || '.' || c.relname AS table_with_schema
+                            FROM pg_class c
+                            JOIN pg_namespace n ON n.oid = c.relnamespace
+                            WHERE c.relkind IN ('r', 'v', 'm', 'f', 'p')
+                              AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+                              AND n.nspname NOT LIKE 'pg_toast%'
+                        )
+                        SELECT grantee, object_type, privilege_type, table_with_schema, column_name
+                        FROM (
+                            -- Table privileges (NULL ACL means owner-only default privileges)
+                            SELECT current_user::text AS grantee, 'TABLE'::text AS object_type, acl.privilege_type,
+                                   r.table_with_schema, NULL::text AS column_name
+                            FROM relations r
+                            CROSS JOIN LATERAL aclexplode(COALESCE(r.relacl, acldefault('r', r.relowner))) acl
+                            WHERE acl.grantee IN (SELECT roleid FROM grantees)
+
+                            UNION ALL
+
+                            -- Column privileges
+                            SELECT current_user::text, 'COLUMN'::text, acl.privilege_type,
+                                   r.table_with_schema, a.attname::text
+                            FROM relations r
+                            JOIN pg_attribute a ON a.attrelid = r.oid
+                            CROSS JOIN LATERAL aclexplode(a.attacl) acl
+                            WHERE a.attnum > 0 AND NOT a.attisdropped AND a.attacl IS NOT NULL
+                              AND acl.grantee IN (SELECT roleid FROM grantees)
+                        ) AS all_perms
+                        -- Table privileges first
+                        ORDER BY object_type DESC;
+                    """)
+
+        results = await session.execute(privilege_query)
+        return results.fetchall()
+
+    async def _fetch_info_schema_privileges(self, session) -> List[Tuple]:
+        """
+        Fetch table/column privileges directly granted to the current user from information_schema.
+
+        :param session: Active database session
+        :return: Rows of (grantee, object_type, privilege_type, table_with_schema, column_name)
+        """
+        # Get the current user from the session
+        result = await session.execute(text("SELECT current_user;"))
+        user_result = result.fetchone()
+
+        if not user_result or not user_result[0]:
+            raise DatabaseError("Failed to retrieve current user.")
+        current_user = user_result[0]
+
+        # Query all table/column privileges in one query for efficiency
+        privilege_query = text("""
+                        SELECT 
+                            grantee,
+                            object_type,
+                            privilege_type,
+                            table_schema || '.' || table_name AS table_with_schema,
+                            column_name
+                        FROM (
+                            -- Table privileges
+                            SELECT grantee, 'TABLE'::text AS object_type, privilege_type, table_schema, table_name, NULL AS column_name
+                            FROM information_schema.role_table_grants
+                            WHERE grantee = :user
+
+                            UNION ALL
+
+                            -- Column privileges 
+                            SELECT grantee, 'COLUMN'::text AS object_type, privilege_type, table_schema, table_name, column_name
+                            FROM information_schema.column_privileges
+                            WHERE grantee = :user
+                        ) AS all_perms
+                        WHERE grantee IS NOT NULL;
+                    """)
+
+        results = await session.execute(privilege_query, {"user": current_user})
+        return results.fetchall()
+
+    @staticmethod
+    def _organize_privileges(privilege_rows) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Organize privilege rows by privilege type and object type.
+
+        :param privilege_rows: Rows of (grantee, object_type, privilege_type, table_with_schema, column_name)
+        :return: Dict mapping privilege types to object types and their (deduplicated) object lists
+        """
+        # Dicts are used as insertion-ordered sets to keep deduplication linear
+        privileges_dict = defaultdict(lambda: defaultdict(dict))
+
+        for row in privilege_rows:
+            grantee, object_type, privilege_type, table_with_schema, column_name = row
+            if not grantee or not privilege_type:
+                continue
+
+            # Handle table-level privileges
+            if object_type == DB_OBJ_TYPE_ENUM.TABLE:
+                privileges_dict[privilege_type][object_type][table_with_schema] = None
+
+            # Handle column-level privileges
+            elif object_type == DB_OBJ_TYPE_ENUM.COL:
+                # Skip column privilege if table-level privilege already exists
+                if privilege_type in privileges_dict and DB_OBJ_TYPE_ENUM.TABLE in privileges_dict[privilege_type] and \
+                    table_with_schema in privileges_dict[privilege_type][DB_OBJ_TYPE_ENUM.TABLE]:
+                    continue
+
+                column_identifier = f"{table_with_schema}.{column_name}"
+                privileges_dict[privilege_type][object_type][column_identifier] = None
+
+        # Clean up empty privilege categories
+        cleaned_privileges = {}
+        for privilege_type, objects in privileges_dict.items():
+            cleaned_objects = {
+                object_type: list(object_set)
+                for object_type, object_set in objects.items()
+                if object_set
+            }
+            if cleaned_objects:
+                cleaned_privileges[privilege_type] = cleaned_objects
+
+        return cleaned_privileges
@@ -1,6 +1,6 @@
 from abc import ABC
 from contextlib import asynccontextmanager
-from typing import Any, Optional, Dict
+from typing import Any, AsyncIterator, Optional, Dict, List
 
 from sqlalchemy import text, inspect
 from sqlalchemy.exc import SQLAlchemyError
@@ -141,34 +141,48 @@ class SqlAlchemyAdapter(BaseAdapter, ABC):
         Async context manager for session.
         If a session exists, reuse it; otherwise, create a new one and close it on exit.
         Nested transactions are supported if n_isolation_level == 2.
+        Whether the session is owned is decided on entry, so a transaction that begins meanwhile
+        does not take over a session created here.
         """
-        session = self._session
+        nested = self.in_nested
+        session = self._session if nested else None
         if not session:
             session = self.session_factory()
             await session.begin()
 
         try:
-            if self.in_nested:
+            if nested:
                 async with session.begin_nested():
                     yield session
             else:
                 yield session
 
-            if not self.in_nested:
+            if not nested:
                 if self.config.readonly:
                     await session.rollback()
                 else:
                     await session.commit()
 
         except SQLAlchemyError as e:
-            if not self.in_nested:
+            if not nested:
                 await session.rollback()
             raise e
 
         finally:
-            if not self.in_nested:
+            if not nested:
                 await session.close()
-                self._session = None
+
+    async def gather(self, *aws) -> List[Any]:
+        """
+        Runs independent queries concurrently, each on its own pooled connection.
+        Inside an explicit transaction, they share one session and thus run sequentially.
+
+        :param aws: Awaitables issuing queries through this adapter.
+        :return: Results in the order of the awaitables.
+        """
+        if self.in_nested:
+            return [await aw for aw in aws]
+        return await super().gather(*aws)
 
     async def execute_query(self, sql: str) -> Any:
         """
@@ -188,6 +202,47 @@ class SqlAlchemyAdapter(BaseAdapter, ABC):
             else:
                 return result.rowcount
 
+    async def stream_query(self, sql: str, chunk_size: int) -> AsyncIterator[List[Any]]:
+        """
+        Executes a raw SQL query and yields its rows in chunks fetched through a server-side cursor.
+
+        :param sql: SQL query string.
+        :param chunk_size: Number of rows per chunk.
+        :return: An async iterator over lists of up to chunk_size rows.
+        """
+        if not self.session_factory:
+            raise DatabaseConnectionError()
+
+        async with self.session_context() as session:
+            result = await session.stream(text(sql), execution_options={"yield_per": chunk_size})
+            async for partition in result.partitions(chunk_size):
+                yield list(partition)
+
+    async def execute_script(self, sqls: List[str]) -> List[Any]:
+        """
+        Executes multiple raw SQL statements in order within one session.
+
+        All statements share the same connection and transaction, so a failing
+        statement rolls back the whole script unless inside an explicit transaction.
+
+        :param sqls: SQL statements.
+        :return: Query results or #rows affected of each statement.
+        """
+        if not self.session_factory:
+            raise DatabaseConnectionError()
+
+        results = []
+        async with self.session_context() as session:
+            for sql in sqls:
+                result = await session.execute(text(sql))
+
+                if getattr(result, "returns_rows", False):
+                    results.append(result.fetchall())
+                else:
+                    results.append(result.rowcount)
+
+        return results
+
     async def get_database_schema(self) -> Dict[str, Dict]:
         """
         Retrieve the database schema.
@@ -0,0 +1,53 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+
+class EmbeddingBackend(ABC):
+    """
+    Abstract base class for semantic models that encode texts into embeddings.
+    """
+
+    def __init__(self, model_path: str):
+        """
+        Initialize backend.
+
+        :param model_path: Directory of the sentence-transformers model.
+        """
+        self.model_path = model_path
+
+    @property
+    def model_id(self) -> str:
+        """
+        Identifier of the model. Embeddings of different model ids are not comparable.
+        """
+        return os.path.basename(os.path.normpath(self.model_path))
+
+    @property
+    @abstractmethod
+    def dim(self) -> int:
+        """
+        Dimension of the embeddings.
+        """
+        pass
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes texts into embeddings.
+
+        :param texts: Texts to encode.
+        :return: A 2-D float32 array with one embedding per text.
+        """
+        pass
+
+    def encode_uncached(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes texts bypassing any embedding cache, for bulk encoding of values persisted elsewhere.
+
+        :param texts: Texts to encode.
+        :return: A 2-D float32 array with one embedding per text.
+        """
+        return self.encode(texts)
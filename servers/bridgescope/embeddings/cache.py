@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from embeddings.base import EmbeddingBackend
+
+# Number of lookups between two hit-rate log lines
+_log_interval = 1000
+
+# Maximum number of SQL variables per statement
+_sqlite_batch = 500
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by (model id, text): an in-memory LRU, and an optional
+    SQLite tier on disk that persists across server restarts.
+    """
+
+    def __init__(self, capacity: int, path: Optional[str] = None):
+        """
+        Initialize cache.
+
+        :param capacity: Maximum number of embeddings kept in memory.
+        :param path: Path of the SQLite database of the disk tier, None to disable it.
+        """
+        self.capacity = capacity
+        self.path = path
+
+        self._memory: OrderedDict[Tuple[str, str], np.ndarray] = OrderedDict()
+        # Encoding and index builds run in worker threads
+        self._lock = threading.Lock()
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model_id TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model_id, text))"
+            )
+            self._db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_many(self, model_id: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up the embeddings of texts.
+
+        :param model_id: Identifier of the model
+        :param texts: Distinct texts
+        :return: Mapping from cached texts to their embeddings
+        """
+        found = {}
+        with self._lock:
+            n_lookups = self.lookups
+            for text in texts:
+                vector = self._memory.get((model_id, text))
+                if vector is not None:
+                    self._memory.move_to_end((model_id, text))
+                    found[text] = vector
+            self.memory_hits += len(found)
+
+            missing = [t for t in texts if t not in found]
+            if self._db is not None and missing:
+                for start in range(0, len(missing), _sqlite_batch):
+                    batch = missing[start:start + _sqlite_batch]
+                    rows = self._db.execute(
+                        f"SELECT text, vector FROM embeddings WHERE model_id = ? AND text IN ({','.join('?' * len(batch))})",
+                        [model_id, *batch],
+                    ).fetchall()
+                    for text, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[text] = vector
+                        self._remember(model_id, text, vector)
+                        self.disk_hits += 1
+
+            self.misses += len(texts) - len(found)
+
+        if n_lookups // _log_interval != self.lookups // _log_interval:
+            logger.info(f"Embedding cache: {self.stats()}")
+
+        return found
+
+    def put_many(self, model_id: str, texts: Sequence[str], vectors: np.ndarray):
+        """
+        Store the embeddings of texts.
+
+        :param model_id: Identifier of the model
+        :param texts: Texts
+        :param vectors: Embeddings, one row per text
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._remember(model_id, text, vector)
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model_id, text, vector) VALUES (?, ?, ?)",
+                    [(model_id, text, vector.tobytes()) for text, vector in zip(texts, vectors)],
+                )
+                self._db.commit()
+
+    @property
+    def lookups(self) -> int:
+        return self.memory_hits + self.disk_hits + self.misses
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get hit-rate metrics.
+
+        :return: Dictionary of lookup counts and hit rates
+        """
+        lookups = self.lookups
+        return {
+            "lookups": lookups,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._memory),
+        }
+
+    def close(self):
+        """
+        Close the disk tier.
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, model_id: str, text: str, vector: np.ndarray):
+        self._memory[(model_id, text)] = vector
+        self._memory.move_to_end((model_id, text))
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+
+class CachedBackend(EmbeddingBackend):
+    """
+    Embedding backend that serves embeddings from an EmbeddingCache and only encodes the misses.
+    """
+
+    def __init__(self, backend: EmbeddingBackend, cache: EmbeddingCache):
+        """
+        Initialize backend.
+
+        :param backend: Backend used to encode cache misses.
+        :param cache: Embedding cache.
+        """
+        super().__init__(backend.model_path)
+        self.backend = backend
+        self.cache = cache
+
+    @property
+    def model_id(self) -> str:
+        return self.backend.model_id
+
+    @property
+    def dim(self) -> int:
+        return self.backend.dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        distinct = list(dict.fromkeys(texts))
+        found = self.cache.get_many(self.model_id, distinct)
+
+        # Encode all misses in one call
+        missing = [t for t in distinct if t not in found]
+        if missing:
+            vectors = np.asarray(self.backend.encode(missing), dtype=np.float32)
+            self.cache.put_many(self.model_id, missing, vectors)
+            found.update(zip(missing, vectors))
+
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([found[t] for t in texts])
+
+    def encode_uncached(self, texts: List[str]) -> np.ndarray:
+        return self.backend.encode_uncached(texts)
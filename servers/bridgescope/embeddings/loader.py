@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from loguru import logger
+
+from embeddings.base import EmbeddingBackend
+
+
+class ModelLoader:
+    """
+    Loads the semantic model in a background thread, so that importing the model runtime
+    does not delay server startup. Users await readiness on first use.
+    """
+
+    def __init__(self, load: Callable[[], EmbeddingBackend], on_ready: Optional[Callable[[EmbeddingBackend], None]] = None):
+        """
+        Initialize loader.
+
+        :param load: Function that loads and returns the model.
+        :param on_ready: Optional callback invoked with the model once it is loaded.
+        """
+        self._load = load
+        self._on_ready = on_ready
+        self._future: Optional[asyncio.Future] = None
+        self.model: Optional[EmbeddingBackend] = None
+
+    def start(self):
+        """
+        Start loading the model. Calling it again has no effect.
+        """
+        if self._future is not None:
+            return
+
+        logger.info("Loading the semantic model in the background")
+        self._future = asyncio.get_running_loop().run_in_executor(None, self._load)
+        self._future.add_done_callback(self._done)
+
+    async def wait(self) -> EmbeddingBackend:
+        """
+        Wait until the model is loaded, starting to load it if needed.
+
+        :return: The loaded model
+        :raises RuntimeError: If the model could not be loaded
+        """
+        if self.model is not None:
+            return self.model
+
+        self.start()
+        try:
+            return await asyncio.shield(self._future)
+        except Exception as e:
+            raise RuntimeError(f"Semantic model is unavailable: {str(e)}") from e
+
+    def _done(self, future: asyncio.Future):
+        if future.cancelled():
+            return
+
+        if future.exception() is not None:
+            logger.warning(
+                f"Could not initialize the semantic model for value retrieval: {str(future.exception())}.",
+            )
+            return
+
+        self.model = future.result()
+        logger.info("Semantic model loaded")
+        if self._on_ready:
+            self._on_ready(self.model)
+
+
+def load_on_startup(server, loader: ModelLoader):
+    """
+    Start loading the model once the MCP transport is up, i.e., when the server enters its lifespan.
+
+    :param server: Low-level MCP server
+    :param loader: Model loader
+    """
+    lifespan = server.lifespan
+
+    @asynccontextmanager
+    async def lifespan_with_loading(app):
+        loader.start()
+        async with lifespan(app) as context:
+            yield context
+
+    server.lifespan = lifespan_with_loading
@@ -0,0 +1,160 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import List
+
+import numpy as np
+from loguru import logger
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:
+    onnxruntime = None
+    Tokenizer = None
+
+from embeddings.base import EmbeddingBackend
+from embeddings.registry import register
+from mcp_constants import default_onnx_model_dir
+
+# Location of a quantized model shipped with the model, relative to the model directory
+ONNX_MODEL_FILE = os.path.join("onnx", "model_int8.onnx")
+
+
+@register("onnx")
+class ONNXBackend(EmbeddingBackend):
+    """
+    Embedding backend running a dynamically int8-quantized ONNX export of the sentence-transformers model
+    on ONNX Runtime. Neither torch nor transformers is imported at runtime; they are only needed once to
+    export the model if no quantized model exists yet.
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 32):
+        """
+        Initialize backend.
+
+        :param model_path: Directory of the sentence-transformers model.
+        :param batch_size: Number of texts per inference call.
+        """
+        if onnxruntime is None:
+            raise ImportError("onnxruntime and tokenizers are required by the ONNX embedding backend")
+
+        super().__init__(model_path)
+        self.batch_size = batch_size
+
+        onnx_path = os.path.join(model_path, ONNX_MODEL_FILE)
+        if not os.path.exists(onnx_path):
+            onnx_path = _export_path(model_path)
+            if not os.path.exists(onnx_path):
+                export_quantized_model(model_path, onnx_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self._dim = self.session.get_outputs()[0].shape[-1]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=_max_seq_length(model_path))
+        self.tokenizer.enable_padding()
+
+    @property
+    def model_id(self) -> str:
+        # Quantized embeddings differ slightly from the original ones
+        return f"{super().model_id}-onnx-int8"
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        # Batch texts of similar length to reduce padding
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), self.batch_size):
+            ids = order[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in ids])
+
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+
+            # Mean pooling over non-padding tokens, as configured in 1_Pooling
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            embeddings[ids] = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        return embeddings
+
+
+def export_quantized_model(model_path: str, output_path: str):
+    """
+    Export the transformer of a sentence-transformers model to ONNX and quantize its weights to int8.
+    The model is written to a temporary file and moved into place, so that servers starting concurrently
+    never load a partial model.
+
+    :param model_path: Directory of the sentence-transformers model.
+    :param output_path: Path of the quantized ONNX model.
+    """
+    import torch
+    from transformers import AutoModel
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info(f"Exporting int8 ONNX model of {model_path} to {output_path}")
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = AutoModel.from_pretrained(model_path).eval()
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.transformer(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dummy = tuple(torch.ones((1, 8), dtype=torch.long) for _ in input_names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]}
+
+    output_dir = os.path.dirname(output_path)
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=".export-") as tmp_dir:
+        fp32_path = os.path.join(tmp_dir, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                TokenEmbeddings().eval(),
+                dummy,
+                fp32_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                dynamo=False,
+            )
+        int8_path = os.path.join(tmp_dir, "model_int8.onnx")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        os.replace(int8_path, output_path)
+
+
+def _export_path(model_path: str) -> str:
+    """
+    Get the path of the int8 export of a model in the user cache, keyed by the model directory.
+
+    :param model_path: Directory of the sentence-transformers model.
+    :return: Path of the quantized ONNX model.
+    """
+    model_path = os.path.abspath(model_path)
+    key = hashlib.sha1(model_path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(default_onnx_model_dir, f"{os.path.basename(model_path)}-{key}", "model_int8.onnx")
+
+
+def _max_seq_length(model_path: str) -> int:
+    try:
+        with open(os.path.join(model_path, "sentence_bert_config.json"), "r") as f:
+            return json.load(f).get("max_seq_length", 128)
+    except OSError:
+        return 128
@@ -0,0 +1,45 @@
+from typing import Dict, List, Type
+
+from embeddings.base import EmbeddingBackend
+
+
+# A global registry that maps backend names to corresponding embedding backend classes.
+_BACKEND_REGISTRY: Dict[str, Type[EmbeddingBackend]] = {}
+
+
+def register(name: str):
+    """
+    Decorator function to register a new embedding backend class.
+
+    :param name: Name of the backend, as used by `--embedding_backend`
+    :return: A decorator that registers the class in the _BACKEND_REGISTRY.
+    """
+
+    def decorator(cls):
+        _BACKEND_REGISTRY[name] = cls
+        return cls
+
+    return decorator
+
+
+def get_backend_instance(name: str, model_path: str) -> EmbeddingBackend:
+    """
+    Returns an instance of the embedding backend with the given name.
+
+    :param name: Name of the backend.
+    :param model_path: Directory of the sentence-transformers model.
+    :return: An instance of the registered backend class.
+    """
+    if name not in _BACKEND_REGISTRY:
+        raise ValueError(f"No embedding backend found for {name}. Supported backends are: {list_backends()}")
+
+    return _BACKEND_REGISTRY[name](model_path)
+
+
+def list_backends() -> List[str]:
+    """
+    Lists all registered embedding backends.
+
+    :return: A list of backend names.
+    """
+    return list(_BACKEND_REGISTRY.keys())
@@ -0,0 +1,28 @@
+from typing import List
+
+import numpy as np
+
+from embeddings.base import EmbeddingBackend
+from embeddings.registry import register
+
+
+@register("torch")
+class TorchBackend(EmbeddingBackend):
+    """
+    Embedding backend running the sentence-transformers model on PyTorch.
+    """
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+
+        # Imported here, so that other backends do not pay for importing torch
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_path)
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, convert_to_numpy=True), dtype=np.float32)
@@ -1,3 +1,4 @@
+import os
 import mcp.types as types
 from typing import List
 
@@ -17,4 +18,55 @@ top_level_obj_types = [DB_OBJ_TYPE_ENUM.TABLE, DB_OBJ_TYPE_ENUM.VIEW]
 # processing logic in the database-side.
 obj_type_mapping = {
     DB_OBJ_TYPE_ENUM.VIEW: DB_OBJ_TYPE_ENUM.TABLE
-}
\ No newline at end of file
+}
+# Policies of admission control for expensive queries
+admission_policies = ["limit", "reject", "queue"]
+
+# LIMIT injected into expensive queries if no row threshold is configured
+default_admission_limit = 1000
+
+# Capacity and TTL (in seconds) of the cache for query plans
+plan_cache_size = 1024
+plan_cache_ttl = 600
+
+# Seconds between two privilege refresh rounds if the notification channel cannot be listened on
+default_priv_refresh_interval = 60
+
+# Default root directory of persistent column value indexes
+default_value_index_dir = os.path.join(os.path.expanduser("~"), ".cache", "bridgescope", "value_index")
+
+# Maximum number of distinct values indexed per column
+value_index_max_values = 5000000
+
+# Maximum number of values of a column encoded in one batched call along with other columns and queries
+value_index_batch_limit = 100000
+
+# Number of distinct values from which a column value index also gets an ANN index
+default_ann_threshold = 200000
+
+# Modes of similar value retrieval
+value_search_modes = ["index", "hybrid", "mcv"]
+
+# Number of lexical candidates per column re-ranked in hybrid value retrieval
+hybrid_candidates = 200
+
+# Directory of the int8 ONNX exports of semantic models
+default_onnx_model_dir = os.path.join(os.path.expanduser("~"), ".cache", "bridgescope", "onnx")
+
+# Capacity of the in-memory embedding cache, and default path of its disk tier
+embedding_cache_size = 10000
+default_embedding_cache_path = os.path.join(os.path.expanduser("~"), ".cache", "bridgescope", "embeddings.sqlite")
+
+# Seconds between two reconciliations of loaded value indexes with writes by other clients
+default_index_reconcile_interval = 60
+
+# Target number of rows read by the TABLESAMPLE of the long tail, and maximum number of tail values,
+# in frequency-aware value retrieval
+mcv_sample_rows = 10000
+mcv_tail_values = 1000
+
+# Weight of the frequency prior added to the semantic similarity in frequency-aware value retrieval
+mcv_frequency_weight = 0.1
+
+# Target false positive rate of the per-column Bloom filters of value existence probes
+bloom_fp_rate = 0.01
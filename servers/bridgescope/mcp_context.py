@@ -1,23 +1,54 @@
 from typing import Optional, Dict, List, Any
 from mcp.server.fastmcp import FastMCP
-from sentence_transformers import SentenceTransformer
 
 from db_adapters.base_adapter import BaseAdapter
 from db_adapters.db_constants import DB_PRIV_ENUM
+from embeddings.base import EmbeddingBackend
 
 # Initialize FastMCP
 mcp = FastMCP("MCP-DB-Universal")
 
+
+def has_tool(name: str) -> bool:
+    """
+    Check whether a tool is registered with the MCP server.
+
+    :param name: Tool name
+    :return: True if the tool is registered, False otherwise
+    """
+    return mcp._tool_manager.get_tool(name) is not None
+
+
+def remove_tool(name: str) -> bool:
+    """
+    Unregister a tool from the MCP server.
+
+    FastMCP only offers a public `remove_tool` in later releases, so older ones fall back to its tool registry.
+    This is the only place accessing it.
+
+    :param name: Tool name
+    :return: True if the tool was registered, False otherwise
+    """
+    if not has_tool(name):
+        return False
+
+    if hasattr(mcp, "remove_tool"):
+        mcp.remove_tool(name)
+    else:
+        mcp._tool_manager._tools.pop(name, None)
+    return True
+
+
 class MCPContext:
     """
         Context for MCP server runtime state.
     """
-    def __init__(self, db_adapter, semantic_model, adaptive_schema_threshold, user_privilege, disable_privilege_annotation, disable_fine_gran_tool, white_object_dict, black_object_dict, white_tool_list, black_tool_list):
+    def __init__(self, db_adapter, semantic_model, adaptive_schema_threshold, user_privilege, disable_privilege_annotation, disable_fine_gran_tool, white_object_dict, black_object_dict, white_tool_list, black_tool_list, admission_controller=None, row_limit=0, value_index_manager=None):
         """
         Initialize context
 
         :param db_adapter: Database adapter instance for executing queries.
-        :param semantic_model: Semantic model for similar value retrieval.
+        :param semantic_model: Semantic model for similar value retrieval, set once it is loaded in the background.
         :param user_privilege: User privilege dictionary fetched from the database.
         :param disable_privilege_annotation: Disable privilege annotation in database schema.
         :param disable_fine_gran_tool: Disable tool modularization for SQL execution.
@@ -25,15 +56,21 @@ class MCPContext:
         :param black_object_dict: Dictionary of blacklisted database objects.
         :param white_tool_list: Whitelisted tool names.
         :param black_tool_list: Blacklisted tool names.
+        :param admission_controller: Optional admission controller for expensive queries.
+        :param row_limit: Default maximum number of rows returned by a SELECT query, 0 for unlimited.
+        :param value_index_manager: Manager of persistent column value indexes for similar value retrieval.
         """
         # Database-related
         self.db_adapter: BaseAdapter = db_adapter
         
         # Server-related
-        self.semantic_model: Optional[SentenceTransformer] = semantic_model
+        self.semantic_model: Optional[EmbeddingBackend] = semantic_model
+        self.value_index_manager = value_index_manager
         self.adaptive_schema_threshold = adaptive_schema_threshold
         self.disable_privilege_annotation = disable_privilege_annotation
         self.disable_fine_gran_tool = disable_fine_gran_tool
+        self.admission_controller = admission_controller
+        self.row_limit = row_limit
         
         # Security-related
         self.user_privilege = user_privilege
@@ -0,0 +1,185 @@
+import os
+import asyncio
+import weakref
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from mcp.server.lowlevel import NotificationOptions
+
+import mcp_context
+from mcp_context import mcp
+from mcp_constants import default_priv_refresh_interval
+from acl_parser import ACLParser, ACLType, ACLParseError
+from db_adapters.db_exception import DatabaseError
+from tools.execution_tools import refresh_sql_exec_tools
+from tools.utils import get_db_adapter, get_context_attribute
+
+# Sessions that have listed tools and thus should be told when the tool set changes
+_sessions = weakref.WeakSet()
+
+
+def track_sessions():
+    """
+    Track client sessions and advertise `tools/list_changed` support to clients.
+    """
+    server = mcp._mcp_server
+
+    # Announce the listChanged capability during initialization
+    server.create_initialization_options = partial(
+        server.create_initialization_options,
+        NotificationOptions(tools_changed=True),
+    )
+
+    @server.list_tools()
+    async def list_tools():
+        _sessions.add(server.request_context.session)
+        return await mcp.list_tools()
+
+
+async def notify_tools_changed():
+    """
+    Send a `tools/list_changed` notification to every tracked client session.
+    """
+    for session in list(_sessions):
+        try:
+            await session.send_tool_list_changed()
+        except Exception as e:
+            # The client has gone away
+            logger.debug(f"Failed to notify session of tool changes: {e}.")
+            _sessions.discard(session)
+
+
+class PrivilegeRefresher:
+    """
+    Keeps user privileges and file-based ACLs in sync with their sources without restarting the server.
+    """
+
+    def __init__(self, interval: float, acl_sources: Dict[str, Tuple[Optional[str], ACLType]], channel: Optional[str] = None):
+        """
+        Initialize refresher.
+
+        :param interval: Seconds between two refresh rounds, or None to only refresh on notifications.
+        :param acl_sources: Mapping from context attribute names to the ACL argument (raw str or file path) and ACL type.
+        :param channel: Optional PostgreSQL notification channel that triggers an immediate refresh.
+        """
+        self.interval = interval
+        self.channel = channel
+
+        # Only file-based ACLs can change at runtime
+        self.acl_files = {
+            attr: (path, acl_type)
+            for attr, (path, acl_type) in acl_sources.items()
+            if path and os.path.isfile(path)
+        }
+        self._mtimes = {attr: self._get_mtime(path) for attr, (path, _) in self.acl_files.items()}
+
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Start the background refresh loop.
+        """
+        if self.channel:
+            try:
+                await get_db_adapter().listen(self.channel, self._wakeup.set)
+                logger.info(f"Listening on channel '{self.channel}' for privilege changes")
+            except (DatabaseError, NotImplementedError) as e:
+                self.interval = self.interval or default_priv_refresh_interval
+                logger.warning(
+                    f"Could not listen on channel '{self.channel}': {str(e)}. "
+                    f"Fall back to periodic refresh every {self.interval} seconds."
+                )
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background refresh loop.
+        """
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh privileges: {str(e)}.")
+
+    async def refresh(self) -> bool:
+        """
+        Reload privileges and changed ACL files, then re-align the exposed tools.
+
+        :return: True if the tool set was changed, False otherwise
+        """
+        async with self._lock:
+            changed = await self._refresh_privileges()
+            changed = self._refresh_acls() or changed
+
+            if not changed:
+                return False
+
+            if refresh_sql_exec_tools():
+                logger.info("SQL execution tools changed, notifying clients")
+                await notify_tools_changed()
+                return True
+
+            return False
+
+    async def _refresh_privileges(self) -> bool:
+        try:
+            user_privilege = await get_db_adapter().get_user_privileges()
+        except DatabaseError as e:
+            logger.warning(f"Could not refresh user privilege: {str(e)}.")
+            return False
+
+        if user_privilege == get_context_attribute("user_privilege"):
+            return False
+
+        # Swap in the new privileges as a whole
+        mcp_context.context.user_privilege = user_privilege
+        logger.info("User privileges changed")
+        return True
+
+    def _refresh_acls(self) -> bool:
+        changed = False
+        for attr, (path, acl_type) in self.acl_files.items():
+            mtime = self._get_mtime(path)
+            if mtime == self._mtimes[attr]:
+                continue
+            self._mtimes[attr] = mtime
+
+            if mtime is None:
+                logger.warning(f"ACL file '{path}' is missing, keep the current ACL")
+                continue
+
+            try:
+                acl = ACLParser.parse(path, acl_type)
+            except ACLParseError as e:
+                # Keep the previous ACL if the new one is malformed
+                logger.warning(f"Ignore invalid ACL update in '{path}': {str(e)}")
+                continue
+
+            if acl != get_context_attribute(attr):
+                setattr(mcp_context.context, attr, acl)
+                logger.info(f"ACL '{attr}' reloaded from '{path}'")
+                changed = True
+
+        return changed
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
@@ -4,8 +4,6 @@ import sys
 import argparse
 import asyncio
 
-from sentence_transformers import SentenceTransformer
-
 from loguru import logger
 
 # Database adapters
@@ -14,16 +12,26 @@ from db_adapters.db_config import DBConfig
 from db_adapters.db_exception import DatabaseError
 from db_adapters.registry import get_adapter_instance
 
+# Embedding backends
+import embeddings.torch_backend
+import embeddings.onnx_backend
+from embeddings.cache import CachedBackend, EmbeddingCache
+from embeddings.loader import ModelLoader, load_on_startup
+from embeddings.registry import get_backend_instance, list_backends
+
 # MCP constants and modules
 from acl_parser import ACLParser, ACLType, ACLParseError
 from mcp_context import mcp, MCPContext
-from mcp_constants import schema_scale_threshold
+from mcp_constants import schema_scale_threshold, admission_policies, default_value_index_dir, default_ann_threshold, value_search_modes, embedding_cache_size, default_embedding_cache_path, default_index_reconcile_interval
+from privilege_refresher import PrivilegeRefresher, track_sessions
 import mcp_context
 
 # Tools and prompt templates
 from tools.context_tools.schema import build_context_retrieval_tool
 from tools.execution_tools import build_sql_exec_tools
+from tools.admission_control import AdmissionController
 from tools.utils import get_context_attribute
+from value_index.manager import ValueIndexManager
 
 
 def parse_args() -> argparse.Namespace:
@@ -85,6 +93,50 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--mp", type=str, help="Path of the semantic model for similar value retrieval."
     )
+    parser.add_argument(
+        "--embedding_backend",
+        type=str,
+        choices=list_backends(),
+        help="Runtime of the semantic model: PyTorch (default) or int8-quantized ONNX Runtime.",
+        default="torch",
+    )
+    parser.add_argument(
+        "--embedding_cache_size",
+        type=int,
+        help=f"Number of embeddings cached in memory. Default is {embedding_cache_size}.",
+        default=embedding_cache_size,
+    )
+    parser.add_argument(
+        "--embedding_cache_path",
+        type=str,
+        help=f"SQLite file persisting cached embeddings across restarts. An empty string disables the disk tier. Default is {default_embedding_cache_path}.",
+        default=default_embedding_cache_path,
+    )
+    parser.add_argument(
+        "--value_index_dir",
+        type=str,
+        help=f"Directory of persistent column value indexes for similar value retrieval. Default is {default_value_index_dir}.",
+        default=default_value_index_dir,
+    )
+    parser.add_argument(
+        "--ann_threshold",
+        type=int,
+        help=f"Number of distinct values from which column value search switches from exact to approximate (ANN) search. 0 disables ANN. Default is {default_ann_threshold}.",
+        default=default_ann_threshold,
+    )
+    parser.add_argument(
+        "--index_reconcile_interval",
+        type=float,
+        help=f"Interval (in seconds) for catching up value indexes with writes by other clients. 0 disables it. Default is {default_index_reconcile_interval}.",
+        default=default_index_reconcile_interval,
+    )
+    parser.add_argument(
+        "--value_search",
+        type=str,
+        choices=value_search_modes,
+        help="Similar value retrieval mode: semantic search over the full column index (default), hybrid pg_trgm candidates re-ranked semantically, or mcv frequent values from pg_stats plus a TABLESAMPLE of the long tail ranked by similarity and frequency.",
+        default="index",
+    )
 
     ##### Database settings #####
     # for db connection
@@ -120,6 +172,35 @@ def parse_args() -> argparse.Namespace:
         default=schema_scale_threshold,
     )
 
+    # Row budget for SELECT queries
+    parser.add_argument(
+        "--row_limit",
+        type=int,
+        help="Default maximum number of rows returned by a SELECT query without LIMIT or aggregation. 0 (default) disables the rewrite.",
+        default=0,
+    )
+
+    # Admission control for expensive queries
+    parser.add_argument(
+        "--max_est_rows",
+        type=int,
+        help="Threshold of planner-estimated rows for SELECT queries. 0 (default) disables the check.",
+        default=0,
+    )
+    parser.add_argument(
+        "--max_est_cost",
+        type=float,
+        help="Threshold of planner-estimated cost for SELECT queries. 0 (default) disables the check.",
+        default=0,
+    )
+    parser.add_argument(
+        "--admission_policy",
+        type=str,
+        choices=admission_policies,
+        help="Action for queries exceeding the thresholds: inject a LIMIT (default), reject with the query plan, or queue in a low-priority lane.",
+        default="limit",
+    )
+
     # user security policy
     parser.add_argument(
         "--wo", type=str, help="Whitelist of accessible database objects."
@@ -130,6 +211,19 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--bt", type=str, help="Blacklist of forbidden tools.")
 
+    # Hot reload of privileges and ACL files
+    parser.add_argument(
+        "--refresh_interval",
+        type=float,
+        help="Interval (in seconds) for reloading user privileges and ACL files without restart. Disabled by default.",
+        default=0,
+    )
+    parser.add_argument(
+        "--priv_channel",
+        type=str,
+        help="PostgreSQL LISTEN/NOTIFY channel that triggers an immediate reload of user privileges.",
+    )
+
     args = parser.parse_args()
     if not args.dsn:
         required_fields = ["usr", "pwd", "host", "port", "type", "db"]
@@ -170,22 +264,35 @@ async def init_global_server_context(args):
         )
         sys.exit(1)
 
-    # prepare semantic model
+    # prepare semantic model, which is loaded in the background after the server is up
     semantic_model_path = getattr(args, "mp")
-    semantic_model = None
-    try:
-        if not semantic_model_path or not os.path.exists(semantic_model_path):
-            logger.info(
-                f"Invalid path for the semantic model. Use `paraphrase-MiniLM-L3-v2` by default.",
-            )
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            semantic_model_path = os.path.join(current_dir,"resources/paraphrase-MiniLM-L3-v2")
-
-        semantic_model = SentenceTransformer(semantic_model_path)
-    except Exception as e:
-        logger.warning(
-            f"Could not initialize the semantic model for value retrieval: {str(e)}. The search_relative_column_values tool is disabled.",
+    if not semantic_model_path or not os.path.exists(semantic_model_path):
+        logger.info(
+            f"Invalid path for the semantic model. Use `paraphrase-MiniLM-L3-v2` by default.",
         )
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        semantic_model_path = os.path.join(current_dir,"resources/paraphrase-MiniLM-L3-v2")
+
+    def set_semantic_model(model):
+        mcp_context.context.semantic_model = model
+
+    # Embeddings are cached by (model id, text) in front of the backend
+    embedding_cache = EmbeddingCache(
+        getattr(args, "embedding_cache_size", embedding_cache_size),
+        getattr(args, "embedding_cache_path", default_embedding_cache_path) or None,
+    )
+
+    def load_semantic_model():
+        backend = get_backend_instance(getattr(args, "embedding_backend", "torch"), semantic_model_path)
+        return CachedBackend(backend, embedding_cache)
+
+    model_loader = ModelLoader(load_semantic_model, set_semantic_model)
+    value_index_manager = ValueIndexManager(
+        getattr(args, "value_index_dir", default_value_index_dir),
+        model_loader,
+        getattr(args, "ann_threshold", default_ann_threshold),
+        getattr(args, "value_search", "index"),
+    )
 
     schema_threshold = getattr(args, "n")
 
@@ -210,9 +317,18 @@ async def init_global_server_context(args):
         logger.error(f"Failed to parse ACL configuration: {str(e)}")
         sys.exit(1)
 
+    # Admission control for expensive queries
+    admission_controller = None
+    max_est_rows = getattr(args, "max_est_rows", 0)
+    max_est_cost = getattr(args, "max_est_cost", 0)
+    if max_est_rows or max_est_cost:
+        admission_controller = AdmissionController(
+            max_est_rows, max_est_cost, getattr(args, "admission_policy", "limit")
+        )
+
     ctx = MCPContext(
         db_adapter,
-        semantic_model,
+        None,
         schema_threshold,
         user_privilege,
         disable_privilege_annotation,
@@ -221,6 +337,9 @@ async def init_global_server_context(args):
         black_object_dict,
         white_tool_list,
         black_tool_list,
+        admission_controller,
+        getattr(args, "row_limit", 0),
+        value_index_manager,
     )
 
     return ctx
@@ -244,8 +363,14 @@ async def run_server():
         logger.error(f"Could not initialize schema retrieval tool: {error}.")
         sys.exit(1)
 
-    if cxt.semantic_model:
-        import tools.context_tools.column_value
+    # The value search tool is registered right away and awaits the semantic model on first use
+    import tools.context_tools.column_value
+    load_on_startup(mcp._mcp_server, cxt.value_index_manager.model_loader)
+
+    # Catch up loaded value indexes with writes by other clients
+    index_reconcile_interval = getattr(args, "index_reconcile_interval")
+    if index_reconcile_interval > 0:
+        await cxt.value_index_manager.maintainer.start(cxt.db_adapter, index_reconcile_interval)
 
     # SQL execution tools
     build_sql_exec_tools()
@@ -257,6 +382,23 @@ async def run_server():
         import tools.transaction_tools
         import prompts.nl2trans
 
+    ## Hot reload of privileges and ACL files
+    refresh_interval = getattr(args, "refresh_interval")
+    priv_channel = getattr(args, "priv_channel")
+    if refresh_interval > 0 or priv_channel:
+        track_sessions()
+        refresher = PrivilegeRefresher(
+            refresh_interval or None,
+            {
+                "white_object_dict": (getattr(args, "wo"), ACLType.OBJECT),
+                "black_object_dict": (getattr(args, "bo"), ACLType.OBJECT),
+                "white_tool_list": (getattr(args, "wt"), ACLType.TOOL),
+                "black_tool_list": (getattr(args, "bt"), ACLType.TOOL),
+            },
+            priv_channel,
+        )
+        await refresher.start()
+
     ## Shutdown handling
     shutdown_initiated = False
 
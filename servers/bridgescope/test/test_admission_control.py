@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import ProgrammingError
+
+from tools.admission_control import AdmissionController
+from tools.execution_tools import _admit
+from tools.sql_checker import SQLChecker
+
+
+class FakeAdapter:
+    """Database adapter planning queries on existing tables only."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    async def explain(self, sql):
+        table = sql.split("FROM")[1].split()[0]
+        if table not in self.tables:
+            raise ProgrammingError(f"EXPLAIN {sql}", {}, Exception(f'relation "{table}" does not exist'))
+        rows = self.tables[table]
+        if "LIMIT" in sql:
+            rows = min(rows, int(sql.split("LIMIT")[1].split()[0]))
+        return {"rows": rows, "cost": 1.0, "plan": {}}
+
+
+def admit(adapter, controller, sql, row_limits=None):
+    statements = SQLChecker.split_statements(sql)
+    row_limits = {} if row_limits is None else row_limits
+    low_priority = asyncio.run(
+        _admit(adapter, controller, statements, [SQLChecker(s) for s in statements], row_limits)
+    )
+    return statements, low_priority
+
+
+class TestAdmissionControl:
+    """Unit tests of the admission of the SELECT statements of a script."""
+
+    def test_admit_expensive(self):
+        controller = AdmissionController(max_rows=100, policy="queue")
+        assert admit(FakeAdapter({"schools": 1000}), controller, "SELECT * FROM schools") == (
+            ["SELECT * FROM schools"], True
+        )
+
+    def test_admit_after_ddl(self):
+        controller = AdmissionController(max_rows=100, policy="reject")
+        sql = "CREATE TABLE x (id int); SELECT * FROM x"
+        assert admit(FakeAdapter({}), controller, sql) == (["CREATE TABLE x (id int)", "SELECT * FROM x"], False)
+
+        # Statements before the DDL are still admitted
+        with pytest.raises(RuntimeError):
+            admit(FakeAdapter({"schools": 1000}), controller, "SELECT * FROM schools; CREATE TABLE x (id int)")
+
+    def test_admit_limit(self):
+        controller = AdmissionController(max_rows=100, policy="limit")
+        row_limits = {}
+        assert admit(FakeAdapter({"schools": 1000}), controller, "SELECT * FROM schools", row_limits) == (
+            ["SELECT * FROM schools LIMIT 101"], False
+        )
+        # The extra row makes the truncation detectable, so it is reported like the row limit
+        assert row_limits == {0: 100}
+
+        # A tighter row limit of the tool is kept
+        row_limits = {0: 10}
+        assert admit(FakeAdapter({"schools": 1000}), controller, "SELECT * FROM schools LIMIT 11", row_limits) == (
+            ["SELECT * FROM schools LIMIT 11"], False
+        )
+        assert row_limits == {0: 10}
+
+    def test_decision_cache_keyed_by_text(self):
+        controller = AdmissionController(max_rows=100, policy="limit")
+        adapter = FakeAdapter({"schools": 1000})
+        first, _ = admit(adapter, controller, "SELECT * FROM schools WHERE name = 'a  b'")
+        second, _ = admit(adapter, controller, "SELECT * FROM schools WHERE name = 'a b'")
+        assert first == ["SELECT * FROM schools WHERE name = 'a  b' LIMIT 101"]
+        assert second == ["SELECT * FROM schools WHERE name = 'a b' LIMIT 101"]
+
+        # Whitespace inside literals changes the fingerprint, whitespace between tokens does not
+        assert AdmissionController.fingerprint("SELECT 'a  b'") != AdmissionController.fingerprint("SELECT 'a b'")
+        assert AdmissionController.fingerprint("SELECT  1") == AdmissionController.fingerprint("SELECT 1")
+
+    def test_admit_missing_table(self):
+        controller = AdmissionController(max_rows=100)
+        with pytest.raises(ProgrammingError):
+            admit(FakeAdapter({}), controller, "SELECT * FROM x")
+        with pytest.raises(ProgrammingError):
+            admit(FakeAdapter({}), controller, "INSERT INTO x VALUES (1); SELECT * FROM x")
+
+
+if __name__ == "__main__":
+    test_instance = TestAdmissionControl()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
@@ -0,0 +1,69 @@
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from value_index.column_index import ColumnValueIndex, normalize
+from value_index.hnsw import HNSWIndex
+
+
+class TestANN:
+    """Benchmark recall@5 and latency of ANN column value search against exact search."""
+
+    def __init__(self):
+        self.n_values = 1000000
+        self.dim = 384
+        self.n_clusters = 2000
+        self.n_queries = 200
+        self.k = 5
+        self.rng = np.random.default_rng(0)
+        self.centers = normalize(self.rng.standard_normal((self.n_clusters, self.dim)).astype(np.float32))
+
+    def encode(self, texts):
+        """Synthetic clustered embeddings, standing in for the semantic model."""
+        ids = np.array([int(t[1:]) for t in texts])
+        noise = self.rng.standard_normal((len(texts), self.dim)).astype(np.float32) * 0.05
+        return self.centers[ids % self.n_clusters] + noise
+
+    def queries(self):
+        ids = self.rng.integers(0, self.n_values, size=self.n_queries)
+        return normalize(self.encode([f"v{i}" for i in ids]))
+
+    def evaluate(self, index, queries, exact_results, exact):
+        latencies, hits = [], 0
+        for query, truth in zip(queries, exact_results):
+            start = time.perf_counter()
+            result = index.search(query, self.k, exact=exact)
+            latencies.append(time.perf_counter() - start)
+            hits += len({v for v, _ in result} & truth)
+
+        latencies = np.array(latencies) * 1000
+        return hits / (self.k * len(queries)), np.median(latencies), np.percentile(latencies, 99)
+
+    def test(self):
+        path = os.path.join(tempfile.mkdtemp(), "column")
+        values = [f"v{i}" for i in range(self.n_values)]
+
+        start = time.perf_counter()
+        index = ColumnValueIndex(path).build(values, self.encode, "synthetic")
+        print(f"index build: {time.perf_counter() - start:.1f}s for {self.n_values} values")
+
+        queries = self.queries()
+        exact_results = [{v for v, _ in index.search(q, self.k, exact=True)} for q in queries]
+        recall, p50, p99 = self.evaluate(index, queries, exact_results, exact=True)
+        print(f"exact: recall@{self.k}={recall:.3f}, p50={p50:.2f}ms, p99={p99:.2f}ms")
+
+        backends = ["ivf"] + (["hnsw"] if HNSWIndex.available() else [])
+        for backend in backends:
+            start = time.perf_counter()
+            index.build_ann(backend)
+            print(f"{backend} build: {time.perf_counter() - start:.1f}s")
+
+            recall, p50, p99 = self.evaluate(index, queries, exact_results, exact=False)
+            print(f"{backend}: recall@{self.k}={recall:.3f}, p50={p50:.2f}ms, p99={p99:.2f}ms")
+
+
+if __name__ == "__main__":
+    test_instance = TestANN()
+    test_instance.test()
@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import subprocess
+
+import numpy as np
+
+from server import *
+from tools.utils import get_db_adapter
+
+
+# Loads a backend in a fresh process and reports its startup time, RSS and encode throughput
+_probe = """
+import sys, time, json, resource
+start = time.perf_counter()
+import embeddings.torch_backend, embeddings.onnx_backend
+from embeddings.registry import get_backend_instance
+model = get_backend_instance(sys.argv[1], sys.argv[2])
+startup = time.perf_counter() - start
+
+texts = json.load(sys.stdin)
+model.encode(texts[:32])
+start = time.perf_counter()
+model.encode(texts)
+throughput = len(texts) / (time.perf_counter() - start)
+
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({"startup": startup, "rss": rss, "throughput": throughput}))
+"""
+
+
+class mock_args:
+    def __init__(self):
+        self.dsn = ""
+        self.mp = ""
+        self.n = None
+        self.disable_tool_priv = False
+        self.disable_fine_gran_tool = False
+        self.wo = ''
+        self.bo = ''
+        self.wt = ''
+        self.bt = ''
+        self.persist = False
+
+
+class TestEmbedding:
+    """Compare the torch and int8 ONNX embedding backends."""
+
+    def __init__(self):
+        self.db = "california_schools"
+        self.user = "postgres"
+        self.columns = [
+            ('frpm', '"Educational Option Type"'),
+            ('frpm', '"School Name"'),
+            ('schools', 'City'),
+        ]
+        self.queries = ["Trad.", "elementary", "los angeles", "Continuation School", "charter academy"]
+        self.model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources/paraphrase-MiniLM-L3-v2")
+        self.args = mock_args()
+
+    async def fetch_values(self):
+        self.args.dsn = "postgresql://{}:{}@localhost:5432/{}".format(self.user, self.user, self.db)
+        mcp_context.context = await init_global_server_context(self.args)
+
+        db_adapter = get_db_adapter()
+        values = {}
+        for table, column in self.columns:
+            rows = await db_adapter.execute_query(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")
+            values[(table, column)] = [str(row[0]) for row in rows]
+        await db_adapter.close()
+        return values
+
+    def probe(self, backend, texts):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(
+            [sys.executable, "-c", _probe, backend, self.model_path],
+            input=json.dumps(texts), capture_output=True, text=True, cwd=root,
+            env={**os.environ, "PYTHONPATH": root},
+        )
+        return json.loads(output.stdout.strip().splitlines()[-1])
+
+    async def test(self):
+        values = await self.fetch_values()
+        texts = [v for vs in values.values() for v in vs]
+
+        print("=== startup, RSS and throughput ===")
+        for backend in ["torch", "onnx"]:
+            stats = self.probe(backend, texts)
+            print(f"{backend}: startup={stats['startup']:.2f}s, rss={stats['rss']:.0f}MB, "
+                  f"throughput={stats['throughput']:.0f} texts/s")
+
+        print("=== agreement on value search ===")
+        torch_model = get_backend_instance("torch", self.model_path)
+        onnx_model = get_backend_instance("onnx", self.model_path)
+
+        def normalized(model, items):
+            embeddings = model.encode(items)
+            return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+        for key, column_values in values.items():
+            torch_values, onnx_values = normalized(torch_model, column_values), normalized(onnx_model, column_values)
+            torch_queries, onnx_queries = normalized(torch_model, self.queries), normalized(onnx_model, self.queries)
+
+            cosine = (torch_values * onnx_values).sum(axis=1)
+            overlap = np.mean([
+                len(set(np.argsort(-(torch_values @ tq))[:5]) & set(np.argsort(-(onnx_values @ oq))[:5])) / 5
+                for tq, oq in zip(torch_queries, onnx_queries)
+            ])
+            print(f"{key[0]}.{key[1]}: {len(column_values)} values, cosine mean={cosine.mean():.4f} "
+                  f"min={cosine.min():.4f}, top-5 overlap={overlap:.2f}")
+
+
+if __name__ == "__main__":
+    test_instance = TestEmbedding()
+    asyncio.run(test_instance.test())
@@ -96,9 +96,40 @@ class TestExecute:
             await db_adapter.rollback()
             await db_adapter.close()
 
+    async def test_script(self, user_type):
+        for task in self.bench:
+            user = self.task_2_user[task["question_id"]][user_type]
+            if isinstance(user, list):
+                user = user[0]
+
+            await self.prepare_mcp_context(user)
+
+            db_adapter = get_db_adapter()
+
+            # The task SQL twice plus a statement of another type in one script
+            sql = task["pg_sql"].rstrip().rstrip(";")
+            scripts = [
+                f"{sql}; {sql};",
+                f"{sql}; SELECT 1;" if self.type != "SELECT" else f"{sql}; DELETE FROM frpm WHERE 1 = 0;",
+                f"BEGIN; {sql}; COMMIT;",
+            ]
+
+            for script in scripts:
+                print("=== script ===")
+                print(script)
+                try:
+                    print(await execute_sql_by_action(script, self.type))
+                except Exception as e:
+                    print(e)
+
+            print("============\n")
+
+            await db_adapter.close()
+
 if __name__ == "__main__":
     test_instance = TestExecute()
     user_type = "other_table_only_user"
     # user_type = "read_only_user"
     asyncio.run(test_instance.test(user_type))
     # asyncio.run(test_instance.test_single(user_type))
+    # asyncio.run(test_instance.test_script(user_type))
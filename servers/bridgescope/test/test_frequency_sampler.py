@@ -0,0 +1,40 @@
+import asyncio
+
+from value_index.sampling import FrequencySampler
+
+
+class FakeAdapter:
+    """Database adapter returning canned results."""
+
+    def __init__(self, results):
+        self.results = results
+        self.executed = []
+
+    async def execute_query(self, sql):
+        self.executed.append(sql)
+        return self.results.pop(0)
+
+
+class TestFrequencySampler:
+    """Unit tests of the frequency estimates of sampled tail values."""
+
+    def test_sample_tail_frequencies(self):
+        # 2 of the 1000 non-null sampled rows are returned within the tail limit
+        adapter = FakeAdapter([[(500.0,)], [("Fresno", 1, 1000), ("Oakland", 1, 1000)]])
+        sampler = FrequencySampler(sample_rows=1000, tail_values=2)
+        tail = asyncio.run(sampler.sample_tail(adapter, "schools", "City", null_frac=0.5))
+
+        assert "sum(count(*)) OVER ()" in adapter.executed[1]
+        assert tail == {"Fresno": 0.0005, "Oakland": 0.0005}
+
+    def test_sample_tail_empty(self):
+        adapter = FakeAdapter([[(0.0,)], []])
+        assert asyncio.run(FrequencySampler().sample_tail(adapter, "schools", "City")) == {}
+
+
+if __name__ == "__main__":
+    test_instance = TestFrequencySampler()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
@@ -0,0 +1,201 @@
+import asyncio
+from types import SimpleNamespace
+
+import mcp_context
+from db_adapters.db_constants import DB_OBJ_TYPE_ENUM
+from mcp_context import MCPContext
+from tools.execution_tools import _capture_written_values, _execute
+from tools.sql_checker import SQLChecker
+from value_index.bloom import BloomFilter, BloomFilterManager
+from value_index.maintenance import IndexMaintainer
+
+KEY = ("schools", "City")
+
+
+class FakeAdapter:
+    """Database adapter returning canned results and modification counters."""
+
+    def __init__(self, results=None, readonly=False):
+        self.config = SimpleNamespace(readonly=readonly)
+        self.in_nested = False
+        self.results = results or []
+        self.counters = {"schools": 0}
+        self.executed = []
+
+    async def execute_query(self, sql):
+        self.executed.append(sql)
+        return self.results.pop(0)
+
+    async def get_modification_counters(self, tables):
+        return {table: self.counters[table] for table in tables if table in self.counters}
+
+    async def gather(self, *coros):
+        return await asyncio.gather(*coros)
+
+
+class FakeManager:
+    """Value index manager with a Bloom filter on schools.City and no loaded embedding index."""
+
+    def __init__(self, column_values):
+        self._indexes = {}
+        self.blooms = BloomFilterManager()
+        self.blooms.filters[KEY] = BloomFilter(100)
+        self.column_values = column_values
+        self.fetches = 0
+        self.maintainer = IndexMaintainer(self)
+
+    async def fetch_values(self, db_adapter, table, column):
+        self.fetches += 1
+        return self.column_values
+
+
+def init_context(manager, privileges):
+    mcp_context.context = MCPContext(
+        None, None, None, privileges, False, False, {}, {}, [], [], value_index_manager=manager
+    )
+
+
+def privileges(*perms):
+    return {perm: {DB_OBJ_TYPE_ENUM.TABLE: ["public.schools"]} for perm in perms}
+
+
+class TestIndexMaintenance:
+    """Unit tests of the incremental maintenance of value indexes."""
+
+    def test_record_and_flush(self):
+        async def run():
+            manager = FakeManager([])
+            adapter = FakeAdapter()
+            manager.maintainer.record(adapter, {KEY: ["Fresno"]}, {"schools": 1})
+            await manager.maintainer._flush_task
+            assert "Fresno" in manager.blooms.filters[KEY]
+
+        asyncio.run(run())
+
+    def test_record_transaction(self):
+        async def run():
+            manager = FakeManager([])
+            adapter = FakeAdapter()
+            adapter.in_nested = True
+            manager.maintainer.record(adapter, {KEY: ["Fresno"]})
+            manager.maintainer.rollback()
+            manager.maintainer.record(adapter, {KEY: ["Oakland"]})
+            manager.maintainer.commit()
+            await manager.maintainer._flush_task
+            assert "Oakland" in manager.blooms.filters[KEY]
+            assert "Fresno" not in manager.blooms.filters[KEY]
+
+        asyncio.run(run())
+
+    def test_record_readonly(self):
+        manager = FakeManager([])
+        manager.maintainer.record(FakeAdapter(readonly=True), {KEY: ["Fresno"]}, {"schools": 1})
+        assert not manager.maintainer._pending and manager.maintainer._flush_task is None
+
+    def test_reconcile_other_clients(self):
+        async def run():
+            manager = FakeManager(["Fresno", "Oakland"])
+            adapter = FakeAdapter()
+            assert await manager.maintainer.reconcile(adapter) == 0
+
+            # Written by another client
+            adapter.counters["schools"] = 2
+            await manager.maintainer.reconcile(adapter)
+            assert manager.fetches == 1
+            assert "Oakland" in manager.blooms.filters[KEY]
+
+            # Unchanged
+            await manager.maintainer.reconcile(adapter)
+            assert manager.fetches == 1
+
+        asyncio.run(run())
+
+    def test_reconcile_captured_writes(self):
+        async def run():
+            manager = FakeManager(["Fresno"])
+            adapter = FakeAdapter()
+            await manager.maintainer.reconcile(adapter)
+
+            # Captured writes do not trigger a re-fetch, even if the statistics are late
+            manager.maintainer.record(adapter, {KEY: ["Fresno"]}, {"schools": 3})
+            await manager.maintainer._flush_task
+            await manager.maintainer.reconcile(adapter)
+            adapter.counters["schools"] = 2
+            await manager.maintainer.reconcile(adapter)
+            adapter.counters["schools"] = 3
+            await manager.maintainer.reconcile(adapter)
+            assert manager.fetches == 0
+
+            # Writes beyond the captured ones do
+            adapter.counters["schools"] = 5
+            await manager.maintainer.reconcile(adapter)
+            assert manager.fetches == 1
+
+        asyncio.run(run())
+
+    def test_capture_requires_select_privilege(self):
+        manager = FakeManager([])
+        sql = "INSERT INTO schools (City) VALUES ('Fresno')"
+
+        init_context(manager, privileges("INSERT"))
+        statements = [sql]
+        assert _capture_written_values(FakeAdapter(), statements, [SQLChecker(sql)]) == {}
+        assert statements == [sql]
+
+        init_context(manager, privileges("INSERT", "SELECT"))
+        assert _capture_written_values(FakeAdapter(), statements, [SQLChecker(sql)]) == {0: [KEY]}
+        assert statements == [sql + " RETURNING City"]
+
+    def test_affected_row_count(self):
+        async def run():
+            manager = FakeManager([])
+            init_context(manager, privileges("INSERT", "SELECT"))
+            adapter = FakeAdapter(results=[[("Fresno",), ("Fresno",), (None,)]])
+
+            response = await _execute(adapter, ["INSERT ... RETURNING City"], {}, {0: [KEY]})
+            assert response[0].text == "3 rows affected."
+            await manager.maintainer._flush_task
+            assert "Fresno" in manager.blooms.filters[KEY]
+
+        asyncio.run(run())
+
+    def test_bloom_build_outside_transaction(self):
+        async def run():
+            blooms = BloomFilterManager()
+            adapter = FakeAdapter(results=[[("Fresno",), ("Oakland",)]])
+
+            # Builds do not share the session of an explicit transaction
+            adapter.in_nested = True
+            assert blooms.get(adapter, *KEY) is None
+            assert blooms.keys() == []
+
+            adapter.in_nested = False
+            assert blooms.get(adapter, *KEY) is None
+            await blooms._builds[KEY]
+            assert "Fresno" in blooms.get(adapter, *KEY)
+
+        asyncio.run(run())
+
+    def test_bloom_build_transaction_begins(self):
+        async def run():
+            adapter = FakeAdapter(results=[[("Fresno",)]])
+
+            async def track(db_adapter, keys):
+                db_adapter.in_nested = True
+
+            blooms = BloomFilterManager(track)
+            blooms.get(adapter, *KEY)
+            await blooms._builds[KEY]
+            # The build stops before querying and is retried on a later probe
+            assert adapter.executed == []
+            assert blooms.keys() == []
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_instance = TestIndexMaintenance()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
@@ -0,0 +1,69 @@
+import asyncio
+
+import mcp_context
+from db_adapters.db_exception import DatabaseError
+from mcp_constants import default_priv_refresh_interval
+from mcp_context import MCPContext, has_tool, mcp, remove_tool
+from privilege_refresher import PrivilegeRefresher
+
+
+class FakeAdapter:
+    """Database adapter that cannot listen on notification channels."""
+
+    def __init__(self):
+        self.privilege_requests = 0
+
+    async def listen(self, channel, callback):
+        raise DatabaseError(f"Cannot listen on {channel}")
+
+    async def get_user_privileges(self):
+        self.privilege_requests += 1
+        return {}
+
+
+def set_context(db_adapter):
+    mcp_context.context = MCPContext(
+        db_adapter, None, 0, {}, False, False, None, None, None, None
+    )
+
+
+class TestPrivilegeRefresher:
+    """Unit tests of the privilege refresh loop and tool registration."""
+
+    def test_listen_fallback(self):
+        set_context(FakeAdapter())
+        refresher = PrivilegeRefresher(None, {}, channel="privileges")
+
+        async def start():
+            await refresher.start()
+            await refresher.stop()
+
+        asyncio.run(start())
+        # Without notifications, privileges are refreshed periodically
+        assert refresher.interval == default_priv_refresh_interval
+
+    def test_listen_fallback_keeps_interval(self):
+        set_context(FakeAdapter())
+        refresher = PrivilegeRefresher(5, {}, channel="privileges")
+
+        async def start():
+            await refresher.start()
+            await refresher.stop()
+
+        asyncio.run(start())
+        assert refresher.interval == 5
+
+    def test_remove_tool(self):
+        mcp.add_tool(lambda: None, name="test_removed_tool")
+        assert has_tool("test_removed_tool")
+        assert remove_tool("test_removed_tool")
+        assert not has_tool("test_removed_tool")
+        assert not remove_tool("test_removed_tool")
+
+
+if __name__ == "__main__":
+    test_instance = TestPrivilegeRefresher()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
@@ -0,0 +1,74 @@
+import ast
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from tools.execution_tools import _execute, _stream
+
+
+class FakeAdapter:
+    """Database adapter returning canned results."""
+
+    def __init__(self, results):
+        self.results = results
+
+    async def execute_query(self, sql):
+        return self.results.pop(0)
+
+    async def execute_script(self, statements):
+        return [self.results.pop(0) for _ in statements]
+
+    async def stream_query(self, sql, chunk_size):
+        self.cursor_open = True
+        try:
+            rows = self.results.pop(0)
+            for i in range(0, len(rows), chunk_size):
+                yield rows[i:i + chunk_size]
+        finally:
+            self.cursor_open = False
+
+
+class TestRowLimit:
+    """Unit tests of the truncation of row-bounded results."""
+
+    def test_truncated(self):
+        adapter = FakeAdapter([[(1,), (2,), (3,), (4,)]])
+        response = asyncio.run(_execute(adapter, ["SELECT id FROM schools LIMIT 4"], {0: 3}))
+
+        # The note is part of the single content item, which stays parsable
+        assert len(response) == 1
+        assert ast.literal_eval(response[0].text) == [(1,), (2,), (3,)]
+        assert response[0].text.endswith("Add filters, aggregations or an explicit LIMIT clause to see more.")
+
+    def test_not_truncated(self):
+        adapter = FakeAdapter([[(1,), (2,), (3,)]])
+        response = asyncio.run(_execute(adapter, ["SELECT id FROM schools LIMIT 4"], {0: 3}))
+        assert len(response) == 1 and response[0].text == "[(1,), (2,), (3,)]"
+
+    def test_truncated_script(self):
+        adapter = FakeAdapter([[(1,), (2,)], [(1,), (2,), (3,)]])
+        response = asyncio.run(_execute(adapter, ["SELECT 1", "SELECT 2"], {0: 2, 1: 2}))
+        assert len(response) == 1
+        assert ast.literal_eval(response[0].text) == [[(1,), (2,)], [(1,), (2,)]]
+        assert "#2 (first 2 rows)" in response[0].text
+
+    def test_stream_truncated(self):
+        adapter = FakeAdapter([[(1,), (2,), (3,), (4,)]])
+        ctx = SimpleNamespace(request_context=SimpleNamespace(meta=None))
+
+        async def run():
+            with pytest.raises(RuntimeError, match="exceeds the limit of 3 rows"):
+                await _stream(adapter, "SELECT id FROM schools LIMIT 4", 3, ctx, 2)
+            # The cursor is closed when the stream fails, not when it is collected
+            assert not adapter.cursor_open
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_instance = TestRowLimit()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
@@ -0,0 +1,35 @@
+from tools.sql_checker import SQLChecker
+
+
+class TestSQLChecker:
+    """Unit tests of the splitting and parsing of SQL scripts, in the PostgreSQL dialect."""
+
+    def test_split_statements(self):
+        assert SQLChecker.split_statements("SELECT 1; SELECT 2;") == ["SELECT 1", "SELECT 2"]
+        assert SQLChecker.split_statements("SELECT 'a;b'; ; SELECT 2") == ["SELECT 'a;b'", "SELECT 2"]
+        assert SQLChecker.split_statements("  ;  ") == []
+
+    def test_split_dollar_quoted(self):
+        do = "DO $$ BEGIN INSERT INTO t VALUES (1); UPDATE t SET a = 2; END $$"
+        assert SQLChecker.split_statements(f"{do}; SELECT 1") == [do, "SELECT 1"]
+
+        function = "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql"
+        assert SQLChecker.split_statements(f"{function}; SELECT f()") == [function, "SELECT f()"]
+
+    def test_parse_dollar_quoted(self):
+        checker = SQLChecker("DO $$ BEGIN INSERT INTO t VALUES (1); UPDATE t SET a = 2; END $$")
+        assert checker.sql_type == "COMMAND"
+        assert not checker.is_ddl() and not checker.is_transaction_control()
+
+    def test_parse_postgres(self):
+        checker = SQLChecker("SELECT DISTINCT ON (City) City::text FROM schools WHERE County ILIKE 'a%'")
+        assert checker.sql_type == "SELECT"
+        assert SQLChecker("CREATE TABLE x (id int)").is_ddl()
+
+
+if __name__ == "__main__":
+    test_instance = TestSQLChecker()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
@@ -0,0 +1,68 @@
+from tools.sql_rewriter import add_returning, bound_rows, inject_limit
+
+
+class TestSQLRewriter:
+    """Unit tests of the SQL rewrites applied before execution."""
+
+    def test_bound_rows(self):
+        assert bound_rows("SELECT City FROM schools", 100) == "SELECT City FROM schools LIMIT 101"
+        assert bound_rows("SELECT City FROM schools LIMIT 5", 100) is None
+        assert bound_rows("SELECT COUNT(*) FROM schools", 100) is None
+
+    def test_bound_rows_select_into(self):
+        # Bounding it would create a truncated table
+        assert bound_rows("SELECT * INTO new_schools FROM schools", 100) is None
+        assert inject_limit("SELECT * INTO new_schools FROM schools", 100) is None
+
+    def test_bound_rows_locking_clause(self):
+        assert bound_rows("SELECT * FROM schools WHERE City = 'Fresno' FOR UPDATE", 100) is None
+        assert bound_rows("SELECT * FROM schools FOR SHARE SKIP LOCKED", 100) is None
+        assert bound_rows("SELECT * FROM (SELECT * FROM schools FOR UPDATE) AS s", 100) is None
+        assert inject_limit("SELECT * FROM schools FOR UPDATE", 100) is None
+
+    def test_bound_rows_data_modifying_cte(self):
+        for cte in [
+            "DELETE FROM schools WHERE City = 'Fresno' RETURNING *",
+            "UPDATE schools SET City = 'Fresno' RETURNING *",
+            "INSERT INTO schools (City) VALUES ('Fresno') RETURNING *",
+        ]:
+            assert bound_rows(f"WITH d AS ({cte}) SELECT * FROM d", 100) is None
+            assert inject_limit(f"WITH d AS ({cte}) SELECT * FROM d", 100) is None
+
+        sql = bound_rows("WITH c AS (SELECT City FROM schools) SELECT * FROM c", 100)
+        assert sql == "WITH c AS (SELECT City FROM schools) SELECT * FROM c LIMIT 101"
+
+    def test_add_returning_insert(self):
+        sql = add_returning("INSERT INTO schools (City, County) VALUES ('Fresno', 'Fresno')", ["City"])
+        assert sql == "INSERT INTO schools (City, County) VALUES ('Fresno', 'Fresno') RETURNING City"
+
+    def test_add_returning_insert_select(self):
+        sql = add_returning("INSERT INTO schools (City) SELECT City FROM frpm", ["City"])
+        assert sql == "INSERT INTO schools (City) SELECT City FROM frpm RETURNING City"
+
+    def test_add_returning_update(self):
+        sql = add_returning("UPDATE schools SET City = 'Fresno', County = 'Fresno' WHERE CDSCode = '1'", ["City", "County"])
+        assert sql == "UPDATE schools SET City = 'Fresno', County = 'Fresno' WHERE CDSCode = '1' RETURNING City, County"
+
+    def test_add_returning_quoted_column(self):
+        sql = add_returning('UPDATE frpm SET "County Name" = \'Alameda\'', ['"County Name"'])
+        assert sql == 'UPDATE frpm SET "County Name" = \'Alameda\' RETURNING "County Name"'
+
+    def test_add_returning_existing_returning(self):
+        assert add_returning("INSERT INTO schools (City) VALUES ('Fresno') RETURNING CDSCode", ["City"]) is None
+
+    def test_add_returning_other_statements(self):
+        assert add_returning("SELECT City FROM schools", ["City"]) is None
+        assert add_returning("DELETE FROM schools WHERE City = 'Fresno'", ["City"]) is None
+
+    def test_add_returning_unparsable(self):
+        assert add_returning("INSERT INTO schools (City VALUES", ["City"]) is None
+        assert add_returning("UPDATE schools SET City = 'Fresno'", ["City +"]) is None
+
+
+if __name__ == "__main__":
+    test_instance = TestSQLRewriter()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            getattr(test_instance, name)()
+            print(f"{name}: OK")
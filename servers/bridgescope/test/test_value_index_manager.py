@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from value_index.manager import ValueIndexManager, index_key
+
+
+class FakeModel:
+    """Embedding model mapping texts to deterministic random vectors."""
+
+    model_id = "fake"
+
+    def encode(self, texts):
+        return np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(8).astype(np.float32) for text in texts
+        ]) if texts else np.empty((0, 8), dtype=np.float32)
+
+    encode_uncached = encode
+
+
+class FakeLoader:
+    async def wait(self):
+        return FakeModel()
+
+
+class FakeAdapter:
+    """Database adapter returning the distinct values of one column."""
+
+    def __init__(self, values):
+        self.config = SimpleNamespace(db_host="localhost", db_port=5432, db_name="db", db_user="user", readonly=False)
+        self.in_nested = False
+        self.values = values
+        self.queries = []
+
+    async def execute_query(self, sql):
+        self.queries.append(sql)
+        return [(value,) for value in self.values]
+
+    async def gather(self, *aws):
+        return await asyncio.gather(*aws)
+
+
+class TestValueIndexManager:
+    """Unit tests of the building and keying of column value indexes."""
+
+    def test_background_build(self, tmp_path):
+        async def run():
+            manager = ValueIndexManager(str(tmp_path), FakeLoader())
+            adapter = FakeAdapter(["Fresno", "Oakland"])
+
+            # The first call does not wait for the build
+            indexes, embeddings = await manager.get_indexes(adapter, [("schools", "City")], ["Fresno"], wait=False)
+            assert indexes == [None] and len(embeddings) == 1
+            await manager._builds[index_key("schools", "City")]
+
+            indexes, embeddings = await manager.get_indexes(adapter, [("schools", "City")], ["Fresno"], wait=False)
+            assert indexes[0].search(embeddings[0], 1)[0][0] == "Fresno"
+            assert len(adapter.queries) == 1
+
+        asyncio.run(run())
+
+    def test_no_background_build_in_transaction(self, tmp_path):
+        async def run():
+            manager = ValueIndexManager(str(tmp_path), FakeLoader())
+            adapter = FakeAdapter(["Fresno"])
+            adapter.in_nested = True
+            indexes, _ = await manager.get_indexes(adapter, [("schools", "City")], wait=False)
+            assert indexes == [None] and not manager._builds and not adapter.queries
+
+        asyncio.run(run())
+
+    def test_normalized_keys(self, tmp_path):
+        async def run():
+            manager = ValueIndexManager(str(tmp_path), FakeLoader())
+            adapter = FakeAdapter(["Fresno"])
+            columns = [("schools", "City"), ("Schools", "city"), ('"schools"', '"City"')]
+            indexes, _ = await manager.get_indexes(adapter, columns)
+            # Spellings of the same column share one index, built once
+            assert indexes[0] is indexes[1] is indexes[2]
+            assert len(adapter.queries) == 1
+            assert list(manager._indexes) == [("schools", "city")]
+
+            # Qualified tables keep their schema
+            assert index_key("Public.Schools", "City") == ("public.schools", "city")
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    test_instance = TestValueIndexManager()
+    for name in dir(test_instance):
+        if name.startswith("test_"):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                getattr(test_instance, name)(tmp_dir)
+            print(f"{name}: OK")
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+
+from server import *
+from tools.utils import get_db_adapter, get_value_index_manager
+from value_index.column_index import normalize
+
+
+class mock_args:
+    def __init__(self):
+        self.dsn = ""
+        self.mp = ""
+        self.n = None
+        self.disable_tool_priv = False
+        self.disable_fine_gran_tool = False
+        self.wo = ''
+        self.bo = ''
+        self.wt = ''
+        self.bt = ''
+        self.persist = False
+        self.embedding_cache_path = ''
+
+
+class TestValueSampling:
+    """Compare latency and hit rate of frequency-aware candidates (pg_stats MCV + TABLESAMPLE) against SELECT DISTINCT."""
+
+    def __init__(self):
+        self.db = "california_schools"
+        self.user = "postgres"
+        self.k = 5
+        self.distinct_limit = 50
+        self.n_runs = 5
+        # (table, column, target value, expected value)
+        self.cases = [
+            ('frpm', '"County Name"', 'alameda county', 'Alameda'),
+            ('frpm', '"Educational Option Type"', 'Traditional', 'Traditional'),
+            ('frpm', '"School Type"', 'high school', 'High Schools (Public)'),
+            ('frpm', '"District Type"', 'unified district', 'Unified School District'),
+            ('schools', 'City', 'fresno', 'Fresno'),
+            ('schools', 'County', 'los angeles', 'Los Angeles'),
+            ('schools', 'FundingType', 'direct funded', 'Directly funded'),
+            ('schools', 'GSoffered', 'K-12', 'K-12'),
+        ]
+        self.args = mock_args()
+
+    async def distinct_search(self, manager, db_adapter, table, column, target):
+        rows = await db_adapter.execute_query(
+            f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT {self.distinct_limit}"
+        )
+        values = [str(row[0]) for row in rows]
+        embeddings = normalize(np.asarray(await manager.encode([target] + values), dtype=np.float32))
+        scores = embeddings[1:] @ embeddings[0]
+        return [values[j] for j in np.argsort(-scores)[:self.k]]
+
+    async def mcv_search(self, manager, db_adapter, table, column, target):
+        # Measure cold candidate sourcing
+        manager.sampler.invalidate(table, column)
+        return (await manager.frequency_search(db_adapter, [(table, column)], [target], self.k))[0]
+
+    async def test(self):
+        self.args.dsn = "postgresql://{}:{}@localhost:5432/{}".format(self.user, self.user, self.db)
+        mcp_context.context = await init_global_server_context(self.args)
+
+        db_adapter = get_db_adapter()
+        manager = get_value_index_manager()
+        await manager.ready()
+
+        for name, search in [("distinct", self.distinct_search), ("mcv", self.mcv_search)]:
+            latencies, hits = [], 0
+            for table, column, target, expected in self.cases:
+                for run in range(self.n_runs):
+                    start = time.perf_counter()
+                    values = await search(manager, db_adapter, table, column, target)
+                    latencies.append(time.perf_counter() - start)
+                hits += expected in values
+                print(f"  {name} {table}.{column} '{target}': {values}")
+
+            latencies = np.array(latencies) * 1000
+            print(f"{name}: hit@{self.k}={hits / len(self.cases):.2f}, "
+                  f"p50={np.median(latencies):.1f}ms, p99={np.percentile(latencies, 99):.1f}ms")
+
+        await db_adapter.close()
+
+
+if __name__ == "__main__":
+    test_instance = TestValueSampling()
+    asyncio.run(test_instance.test())
@@ -0,0 +1,184 @@
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import sqlglot
+
+from db_adapters.base_adapter import BaseAdapter
+from mcp_constants import (
+    admission_policies,
+    default_admission_limit,
+    plan_cache_size,
+    plan_cache_ttl,
+)
+from tools.sql_rewriter import get_limit, inject_limit, rewrite_dialect
+
+
+class AdmissionController:
+    """
+    Pre-flight admission control for SELECT statements based on planner estimates.
+    """
+
+    def __init__(self, max_rows: int = 0, max_cost: float = 0, policy: str = "limit", low_priority_slots: int = 1):
+        """
+        Initialize admission controller.
+
+        :param max_rows: Threshold of estimated rows, 0 for unlimited.
+        :param max_cost: Threshold of estimated total cost, 0 for unlimited.
+        :param policy: Action for expensive queries: "limit" (inject LIMIT), "reject" (return the plan to the agent)
+                       or "queue" (run in the low-priority lane).
+        :param low_priority_slots: Number of expensive queries allowed to run concurrently in the low-priority lane.
+        """
+        if policy not in admission_policies:
+            raise ValueError(f"Unsupported admission policy: {policy}")
+
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.policy = policy
+        self.low_priority_lane = asyncio.Semaphore(low_priority_slots)
+
+        # Fingerprint -> (timestamp, planner estimates)
+        self._plan_cache: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        # Hash of the exact SQL text -> (timestamp, (rewritten SQL, low priority, rejection message, row limit)),
+        # as rewritten SQL must not replace another statement with the same fingerprint
+        self._decision_cache: OrderedDict[str, Tuple[float, Tuple]] = OrderedDict()
+
+    @staticmethod
+    def fingerprint(sql: str) -> str:
+        """
+        Fingerprint a SQL statement, insensitive to whitespace outside of literals and identifiers.
+
+        :param sql: The SQL statement
+        :return: Fingerprint string
+        """
+        try:
+            sql = sqlglot.parse_one(sql, read=rewrite_dialect).sql(dialect=rewrite_dialect)
+        except Exception:
+            pass
+        return hashlib.sha1(sql.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _cache_get(cache: OrderedDict, key: str) -> Any:
+        cached = cache.get(key)
+        if cached is None:
+            return None
+
+        if time.monotonic() - cached[0] >= plan_cache_ttl:
+            del cache[key]
+            return None
+
+        cache.move_to_end(key)
+        return cached[1]
+
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key: str, value: Any):
+        cache[key] = (time.monotonic(), value)
+        cache.move_to_end(key)
+        while len(cache) > plan_cache_size:
+            cache.popitem(last=False)
+
+    async def estimate(self, db_adapter: BaseAdapter, sql: str) -> Dict[str, Any]:
+        """
+        Get planner estimates of a SQL statement, served from the plan cache when possible.
+
+        :param db_adapter: Database adapter used for EXPLAIN
+        :param sql: The SQL statement
+        :return: Dictionary with estimated "rows", "cost" and the raw "plan"
+        """
+        key = self.fingerprint(sql)
+        estimate = self._cache_get(self._plan_cache, key)
+        if estimate is None:
+            estimate = await db_adapter.explain(sql)
+            self._cache_put(self._plan_cache, key, estimate)
+
+        return estimate
+
+    def is_expensive(self, estimate: Dict[str, Any], extra_rows: int = 0) -> bool:
+        """
+        Check whether the planner estimates exceed the configured thresholds.
+
+        :param estimate: Planner estimates
+        :param extra_rows: Rows allowed beyond the threshold, e.g. the row fetched to detect truncation
+        :return: True if the query is too expensive, False otherwise
+        """
+        if self.max_rows and estimate["rows"] > self.max_rows + extra_rows:
+            return True
+        if self.max_cost and estimate["cost"] > self.max_cost:
+            return True
+        return False
+
+    async def admit(self, db_adapter: BaseAdapter, sql: str) -> Tuple[str, bool, Optional[int]]:
+        """
+        Decide how a SELECT statement is executed. Decisions are cached by SQL text.
+
+        :param db_adapter: Database adapter used for EXPLAIN
+        :param sql: The SELECT statement
+        :return: A tuple (sql, low_priority, row_limit) with the (possibly rewritten) SQL to execute, whether it
+                 should run in the low-priority lane, and the number of rows it is limited to, or None. A limited
+                 statement fetches one extra row, so that its truncation can be reported.
+        :raises RuntimeError: If the query is too expensive and cannot be admitted
+        """
+        key = hashlib.sha1(sql.encode("utf-8")).hexdigest()
+        decision = self._cache_get(self._decision_cache, key)
+        if decision is None:
+            decision = await self._decide(db_adapter, sql)
+            self._cache_put(self._decision_cache, key, decision)
+
+        rewritten_sql, low_priority, rejection, row_limit = decision
+        if rejection:
+            raise RuntimeError(rejection)
+
+        return rewritten_sql or sql, low_priority, row_limit
+
+    async def _decide(self, db_adapter: BaseAdapter, sql: str) -> Tuple[Optional[str], bool, Optional[str], Optional[int]]:
+        estimate = await self.estimate(db_adapter, sql)
+        if not self.is_expensive(estimate):
+            return None, False, None, None
+
+        if self.policy == "queue":
+            return None, True, None, None
+
+        if self.policy == "limit":
+            row_limit = self.max_rows or default_admission_limit
+            limited_sql = inject_limit(sql, row_limit + 1)
+            if limited_sql:
+                limited_estimate = await self.estimate(db_adapter, limited_sql)
+                if not self.is_expensive(limited_estimate, extra_rows=1):
+                    return limited_sql, False, None, row_limit
+            elif self._has_limit(sql) and not self.is_expensive(estimate, extra_rows=1):
+                # Already limited to at most one row more than the limit, e.g. by the row limit of the tool
+                return None, False, None, None
+
+        return None, False, (
+            f"Query is too expensive (estimated rows: {estimate['rows']}, estimated cost: {estimate['cost']}). "
+            f"Please make it more selective, e.g., add filters, aggregations or a LIMIT clause. "
+            f"Query plan: {self.summarize_plan(estimate['plan'])}"
+        ), None
+
+    @staticmethod
+    def _has_limit(sql: str) -> bool:
+        try:
+            return get_limit(sqlglot.parse_one(sql, read=rewrite_dialect)) is not None
+        except Exception:
+            return False
+
+    @staticmethod
+    def summarize_plan(plan: Dict[str, Any], depth: int = 0) -> str:
+        """
+        Summarize a JSON query plan as an indented tree of node types and estimates.
+
+        :param plan: Plan node in PostgreSQL JSON format
+        :param depth: Depth of the node in the plan tree
+        :return: Plan summary
+        """
+        relation = f" on {plan['Relation Name']}" if "Relation Name" in plan else ""
+        lines = [
+            f"{'  ' * depth}-> {plan.get('Node Type')}{relation} "
+            f"(cost={plan.get('Total Cost')} rows={plan.get('Plan Rows')})"
+        ]
+        for child in plan.get("Plans", []):
+            lines.append(AdmissionController.summarize_plan(child, depth + 1))
+        return "\n".join(lines)
+
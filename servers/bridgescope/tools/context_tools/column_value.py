@@ -1,8 +1,11 @@
-import numpy as np
 from typing import List, Dict, Any
 
+import sqlglot
+from sqlalchemy.exc import SQLAlchemyError
+
 from mcp_constants import response_type
-from tools.utils import get_db_adapter, get_semantic_model, format_response
+from tools.utils import get_db_adapter, get_value_index_manager, format_response, PayloadArg, load_argument
+from tools.sql_checker import SQLChecker
 from mcp_context import mcp
 
 
@@ -44,20 +47,19 @@ async def search_relative_column_values(
     """
 
     limit = 5
-    max_distinct_values = 50
 
     # Handle empty input case
     if not column_2_value:
         raise RuntimeError("No column-value map provided.")
 
     db_adapter = get_db_adapter()
-    semantic_model = get_semantic_model()
+    value_index_manager = get_value_index_manager()
 
     result = {}
+    columns, targets = [], []
 
-    # Process each column and its corresponding target value
+    # Validate the format of the column names
     for full_column, target_value in column_2_value.items():
-        # Validate the format of the column name
         if "." not in full_column:
             result[full_column] = [
                 "Invalid column format. Expected 'table.column'."
@@ -65,39 +67,136 @@ async def search_relative_column_values(
             continue
 
         # Split into table and column names
-        table, column = full_column.split(".", 1)
+        columns.append(tuple(full_column.split(".", 1)))
+        targets.append(str(target_value))
+
+    # Step 1: Make sure the user can still read the columns, as the indexes are served without querying them
+    await db_adapter.gather(*[
+        db_adapter.execute_query(f"SELECT {column} FROM {table} LIMIT 0") for table, column in columns
+    ])
+
+    if value_index_manager.mode == "hybrid":
+        # Step 2: Re-rank the top lexical candidates of each column with the embedding model
+        top_values = await value_index_manager.hybrid_search(db_adapter, columns, targets, limit)
+        for (table, column), values in zip(columns, top_values):
+            result[column] = values
+        return format_response(result)
+
+    if value_index_manager.mode == "mcv":
+        # Step 2: Rank the most common values from the planner statistics and a sample of the long tail
+        top_values = await value_index_manager.frequency_search(db_adapter, columns, targets, limit)
+        for (table, column), values in zip(columns, top_values):
+            result[column] = values
+        return format_response(result)
+
+    # Step 2: Load the indexes over all distinct values of the columns and encode the target values.
+    # Missing indexes are built in the background, as fetching and encoding all values may take minutes
+    indexes, target_embeddings = await value_index_manager.get_indexes(db_adapter, columns, targets, wait=False)
+
+    # Step 3: Get the top-k most similar values of each indexed column
+    for (table, column), index, target_embedding in zip(columns, indexes, target_embeddings):
+        if index is not None:
+            result[column] = [value for value, _ in index.search(target_embedding, limit)]
+
+    # Step 4: Answer for the other columns from their most common and sampled values until their index is ready
+    pending = [i for i, index in enumerate(indexes) if index is None]
+    if pending:
+        top_values = await value_index_manager.frequency_search(
+            db_adapter, [columns[i] for i in pending], [targets[i] for i in pending], limit
+        )
+        for i, values in zip(pending, top_values):
+            result[columns[i][1]] = values
 
-        # Step 1: Query all distinct values from the specified column
-        query = f"SELECT DISTINCT {column} FROM {table} LIMIT {max_distinct_values}"
-        values = await db_adapter.execute_query(query)
+    return format_response(result)
 
-        # Extract values assuming rows are dictionaries
-        all_values = [str(value[0]) for value in values]
 
-        # Skip if no valid data found
-        if not all_values:
-            result[column] = []
-            continue
+@mcp.tool()
+async def value_exists(
+    column: str,
+    values: PayloadArg(List[Any]),
+) -> response_type:
+    """
+    Check whether literal values exist in a column, e.g., before using them in a predicate.
+    Much cheaper than searching similar values; use `search_relative_column_values` only for values that do not exist.
 
-        # Convert all values to strings for semantic encoding
-        target_value = str(target_value)
+    Parameters:
+        column (str): Column in the format 'table.column'.
+        values (List[Any]): Literal values to check, or a payload or handle of them.
 
-        # Step 2: Encode all texts and the target text into vectors
-        embeddings = semantic_model.encode(all_values)
-        target_embedding = semantic_model.encode([target_value])[0]
+    Returns:
+        Dict[str, bool]:
+            A dictionary mapping each value to whether it exists in the column.
 
-        # Step 3: Compute cosine similarity between each value and the target
-        similarities = np.dot(embeddings, target_embedding) / (
-            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(target_embedding)
-        )
+    Example:
+        Input:
+            column: "schools.City", values: ["Los Angeles", "Los Angles"]
 
-        # Step 4: Get indices of top-k most similar values
-        top_indices = np.argsort(similarities)[::-1][
-            :limit
-        ]  # Descending order, take top-k
-        top_values = [all_values[i] for i in top_indices]
+        Output:
+            {"Los Angeles": true, "Los Angles": false}
+    """
+    if "." not in column:
+        raise RuntimeError("Invalid column format. Expected 'table.column'.")
+    values = load_argument(values)
+    if not values:
+        raise RuntimeError("No values provided.")
+
+    table, column_name = column.split(".", 1)
+    literals = [sqlglot.exp.convert(value) for value in values]
+    probe_sql = _probe_sql(table, column_name, literals)
+
+    # Step 1: The probe must be allowed as if it were run as a query
+    checker = SQLChecker(probe_sql)
+    if not checker.check_privilege():
+        raise RuntimeError("SQL exceeds user privilege.")
+    if not checker.check_object_acl():
+        raise RuntimeError("SQL violates user-configured ACL.")
 
-        # Store result for this column
-        result[column] = top_values
+    db_adapter = get_db_adapter()
+    value_index_manager = get_value_index_manager()
+    texts = [str(value) for value in values]
+
+    # Step 2: Values missing from the Bloom filter do not exist, up to the writes by other clients since the
+    # last reconciliation. Without reconciliation, within an explicit transaction (whose writes are not in
+    # the filter until commit) and while the filter is being built, all values are checked in the database.
+    bloom = None
+    if value_index_manager.maintainer.running and not getattr(db_adapter, "in_nested", False):
+        bloom = value_index_manager.blooms.get(db_adapter, table, column_name)
+    maybe = bloom.contains_many(texts) if bloom is not None else [True] * len(texts)
+    result = {text: False for text in texts}
+
+    # Step 3: Confirm the positive hits with one indexable EXISTS per value, so that each answer maps
+    # back to its value even if the database spells it differently (e.g., 1.5 matching 1.50)
+    hits = [i for i, hit in enumerate(maybe) if hit]
+    batches = [hits[start:start + _probe_batch_size] for start in range(0, len(hits), _probe_batch_size)]
+    for batch in batches:
+        try:
+            rows = await db_adapter.execute_query(_probe_sql(table, column_name, [literals[i] for i in batch]))
+        except SQLAlchemyError:
+            # Literals that do not cast to the column type, compare as text
+            rows = await db_adapter.execute_query(
+                _probe_sql(table, column_name, [sqlglot.exp.Literal.string(texts[i]) for i in batch], as_text=True)
+            )
+        for i, found in zip(batch, rows[0]):
+            result[texts[i]] = result[texts[i]] or bool(found)
 
     return format_response(result)
+
+
+# Maximum number of values checked by one query, below the limit of 1664 columns of PostgreSQL
+_probe_batch_size = 1000
+
+
+def _probe_sql(table: str, column: str, literals: List[Any], as_text: bool = False) -> str:
+    """
+    Build the query returning one row with whether each of the literals exists in a column.
+
+    :param table: Table name
+    :param column: Column name
+    :param literals: Literal expressions
+    :param as_text: Compare the column as text
+    :return: SQL query
+    """
+    target = f"{column}::text" if as_text else column
+    return "SELECT " + ", ".join(
+        f"EXISTS (SELECT 1 FROM {table} WHERE {target} = {literal.sql(dialect='postgres')})" for literal in literals
+    )
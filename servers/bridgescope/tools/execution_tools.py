@@ -1,20 +1,39 @@
-from mcp_context import global_privilege_operations, mcp
+from collections import defaultdict
+from contextlib import aclosing
+from mcp.server.fastmcp import Context
+from sqlalchemy.exc import SQLAlchemyError
+
+from mcp_context import global_privilege_operations, mcp, has_tool, remove_tool
 
 from tools.utils import (
-    format_response,
+    format_result,
+    stream_result,
+    ResultFormat,
+    ChunkSize,
+    DEFAULT_CHUNK_SIZE,
     response_type,
     get_db_adapter,
     get_context_attribute,
 )
 from tools.sql_checker import SQLChecker
+from tools.sql_rewriter import bound_rows, add_returning
 
 
-async def execute_sql_by_action(sql, action: str | None = None) -> response_type:
+async def execute_sql_by_action(
+        sql, action: str | None = None, row_limit: int | None = None, result_format: str = "text",
+        ctx: Context | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> response_type:
     """
     Executing SQL of a specific action type.
 
     :param sql: The SQL statement to execute
     :param action: The action type (SELECT, INSERT, UPDATE, DELETE, etc.). If None, any SQL type is allowed.
+    :param row_limit: Maximum number of rows returned by each SELECT statement. If None, the server default is used;
+                      0 for unlimited.
+    :param result_format: "text", or "payload" / "handle" to pass the results to other tools through the proxy,
+                          or "stream" to send the rows of a single SELECT in chunks as they are fetched
+    :param ctx: Context of the tool call, to send the chunks of a streamed result
+    :param chunk_size: Number of rows per chunk of a streamed result
     :return: A formatted response containing the query results or affected row count
     """
     db_adapter = get_db_adapter()
@@ -23,23 +42,245 @@ async def execute_sql_by_action(sql, action: str | None = None) -> response_type
         if action not in global_privilege_operations:
             raise RuntimeError("SQL function not supported.")
 
-    # Pre-execution security checks
-    checker = SQLChecker(sql)
-    if action is not None and not checker.check_operation_match(action):
-        raise RuntimeError("SQL and tool function mismatch.")
+    # Pre-execution security checks on every statement of the script
+    statements = SQLChecker.split_statements(sql)
+    if not statements:
+        raise RuntimeError("No SQL statement provided.")
+
+    checkers = [SQLChecker(statement) for statement in statements]
+    for checker in checkers:
+        if len(statements) > 1 and checker.is_transaction_control():
+            raise RuntimeError("Transaction control statements are not allowed in multi-statement SQL.")
+
+        if action is not None and not checker.check_operation_match(action):
+            raise RuntimeError("SQL and tool function mismatch.")
+
+        if not checker.check_privilege():
+            raise RuntimeError("SQL exceeds user privilege.")
+
+        if not checker.check_object_acl():
+            raise RuntimeError("SQL violates user-configured ACL.")
+
+    # Bound unlimited SELECTs with LIMIT n+1, so the database can stop early and truncation remains detectable
+    if row_limit is None:
+        row_limit = get_context_attribute("row_limit")
+    row_limits = {}
+    if row_limit:
+        for i, checker in enumerate(checkers):
+            if checker.sql_type == "SELECT":
+                bounded_sql = bound_rows(statements[i], row_limit)
+                if bounded_sql:
+                    statements[i] = bounded_sql
+                    row_limits[i] = row_limit
+
+    # Pre-flight admission control of expensive queries based on planner estimates
+    admission_controller = get_context_attribute("admission_controller")
+    low_priority = (
+        await _admit(db_adapter, admission_controller, statements, checkers, row_limits)
+        if admission_controller else False
+    )
+
+    # Capture the values written to indexed columns, so value indexes can be updated incrementally
+    captures = _capture_written_values(db_adapter, statements, checkers)
+
+    if result_format == "stream":
+        if len(statements) == 1 and checkers[0].sql_type == "SELECT" and ctx is not None:
+            if low_priority:
+                async with admission_controller.low_priority_lane:
+                    return await _stream(db_adapter, statements[0], row_limits.get(0), ctx, chunk_size)
+            return await _stream(db_adapter, statements[0], row_limits.get(0), ctx, chunk_size)
+        # Only single SELECT statements are streamed
+        result_format = "handle"
+
+    if low_priority:
+        async with admission_controller.low_priority_lane:
+            return await _execute(db_adapter, statements, row_limits, captures, result_format)
+
+    return await _execute(db_adapter, statements, row_limits, captures, result_format)
+
+
+async def _admit(db_adapter, admission_controller, statements, checkers, row_limits):
+    """
+    Admit the SELECT statements of a script based on their planner estimates.
+
+    The script is planned before any statement runs, so a SELECT that follows DDL may reference objects
+    that do not exist yet. If EXPLAIN fails for such a statement, its estimate is unknown and it is admitted.
+
+    :param db_adapter: Database adapter instance
+    :param admission_controller: Admission controller
+    :param statements: The SQL statements to execute, rewritten in place
+    :param checkers: SQL checkers of the statements
+    :param row_limits: Mapping from indexes of row-bounded statements to their row limits, updated in place
+                       for statements limited by the admission controller, so their truncation is reported
+    :return: True if an expensive statement requires the low-priority lane
+    :raises RuntimeError: If a statement is too expensive and cannot be admitted
+    """
+    low_priority, follows_ddl = False, False
+    for i, checker in enumerate(checkers):
+        if checker.sql_type == "SELECT":
+            try:
+                statements[i], expensive, limit = await admission_controller.admit(db_adapter, statements[i])
+            except SQLAlchemyError:
+                if not follows_ddl:
+                    raise
+                expensive, limit = False, None
+            if limit is not None:
+                row_limits[i] = min(limit, row_limits.get(i, limit))
+            low_priority = low_priority or expensive
+
+        follows_ddl = follows_ddl or checker.is_ddl()
+
+    return low_priority
+
+
+def _capture_written_values(db_adapter, statements, checkers):
+    """
+    Add RETURNING clauses to INSERT and UPDATE statements that write columns with loaded value indexes.
+    RETURNING requires the SELECT privilege on the returned columns, so statements of users without it
+    are left unchanged and their writes are caught by the periodic reconciliation.
+
+    :param db_adapter: Database adapter instance
+    :param statements: The SQL statements to execute, rewritten in place
+    :param checkers: SQL checkers of the statements
+    :return: Mapping from indexes of rewritten statements to the index keys of their returned columns
+    """
+    value_index_manager = get_context_attribute("value_index_manager")
+    if value_index_manager is None:
+        return {}
+
+    # Changes outside explicit transactions are rolled back in readonly mode
+    if db_adapter.config.readonly and not getattr(db_adapter, "in_nested", False):
+        return {}
+
+    captures = {}
+    for i, checker in enumerate(checkers):
+        modified = checker.get_modified_columns()
+        if not modified:
+            continue
+
+        keys = value_index_manager.maintainer.indexed_columns(*modified)
+        if not keys:
+            continue
 
-    if not checker.check_privilege():
-        raise RuntimeError("SQL exceeds user privilege.")
+        columns = [column for _, column in keys]
+        if not SQLChecker(f"SELECT {', '.join(columns)} FROM {modified[0]}").check_privilege():
+            continue
 
-    if not checker.check_object_acl():
-        raise RuntimeError("SQL violates user-configured ACL.")
+        # Statements that already return rows are left to the periodic reconciliation
+        rewritten_sql = add_returning(statements[i], columns)
+        if rewritten_sql:
+            statements[i] = rewritten_sql
+            captures[i] = keys
 
-    # Execute query
-    rows = await db_adapter.execute_query(sql)
+    return captures
+
+
+async def _execute(db_adapter, statements, row_limits, captures=None, result_format="text") -> response_type:
+    """
+    Execute checked SQL statements.
+
+    :param db_adapter: Database adapter instance
+    :param statements: The SQL statements to execute
+    :param row_limits: Mapping from indexes of row-bounded statements to their row limits
+    :param captures: Mapping from indexes of statements returning written values to the index keys of the values
+    :param result_format: "text", "payload" or "handle"
+    :return: A formatted response containing the query results or affected row count
+    """
+    if len(statements) == 1:
+        results = [await db_adapter.execute_query(statements[0])]
+    else:
+        # Run all statements in order on one connection within a single call
+        results = await db_adapter.execute_script(statements)
+
+    if captures:
+        # Report the affected row count as without the RETURNING clause
+        deltas, written_rows = defaultdict(set), defaultdict(int)
+        for i, keys in captures.items():
+            rows = results[i]
+            for j, key in enumerate(keys):
+                deltas[key].update(str(row[j]) for row in rows if row[j] is not None)
+            written_rows[keys[0][0]] += len(rows)
+            results[i] = len(rows)
+        get_context_attribute("value_index_manager").maintainer.record(db_adapter, deltas, written_rows)
+
+    # Drop the extra row fetched for truncation detection
+    truncated = []
+    for i, row_limit in row_limits.items():
+        if isinstance(results[i], list) and len(results[i]) > row_limit:
+            results[i] = results[i][:row_limit]
+            truncated.append(i)
+
+    # The note is kept in the single content item of the result, which the proxy expects
+    note = _truncation_note(truncated, row_limits, len(statements)) if truncated else None
+    if len(statements) == 1:
+        return format_result(_format_result(results[0]), result_format, note)
+    return format_result([_format_result(rows) for rows in results], result_format, note)
+
+
+async def _stream(db_adapter, statement, row_limit, ctx, chunk_size) -> response_type:
+    """
+    Execute a checked SELECT statement and stream its rows in chunks as they are fetched from a server-side cursor.
+
+    :param db_adapter: Database adapter instance
+    :param statement: The SELECT statement to execute
+    :param row_limit: Row limit of the statement, or None if it is not row-bounded
+    :param ctx: Context of the tool call
+    :param chunk_size: Number of rows per chunk
+    :return: The end of the stream, see data_plane.stream_result
+    :raises RuntimeError: If the statement returns more rows than its row limit, as a streamed result cannot
+                          carry a truncation note and its consumer would get incomplete data
+    """
+    async def chunks():
+        n_rows = 0
+        # Close the cursor and its session as soon as the stream stops, not when the generator is collected
+        async with aclosing(db_adapter.stream_query(statement, chunk_size)) as partitions:
+            async for rows in partitions:
+                # The extra row fetched for truncation detection
+                if row_limit is not None and n_rows + len(rows) > row_limit:
+                    raise RuntimeError(
+                        f"Truncated: the result exceeds the limit of {row_limit} rows and cannot be streamed. "
+                        f"Add filters, aggregations or an explicit LIMIT clause, or set `limit` to 0 to stream all rows."
+                    )
+                n_rows += len(rows)
+                if rows:
+                    yield _format_result(rows)
+
+    return await stream_result(ctx, chunks())
+
+
+def _truncation_note(truncated, row_limits, n_statements) -> str:
+    """
+    Generate a note telling the agent which results were truncated.
+
+    :param truncated: Indexes of truncated statements
+    :param row_limits: Mapping from indexes of row-bounded statements to their row limits
+    :param n_statements: Number of executed statements
+    :return: Truncation note
+    """
+    if n_statements == 1:
+        return (
+            f"Truncated: only the first {row_limits[0]} rows are returned. "
+            f"Add filters, aggregations or an explicit LIMIT clause to see more."
+        )
+
+    statements = ", ".join(f"#{i + 1} (first {row_limits[i]} rows)" for i in truncated)
+    return (
+        f"Truncated: results of statements {statements} are incomplete. "
+        f"Add filters, aggregations or an explicit LIMIT clause to see more."
+    )
+
+
+def _format_result(rows):
+    """
+    Format the result of a single SQL statement.
+
+    :param rows: Rows returned by the statement or #rows affected
+    :return: List of rows or a message of affected row count
+    """
     if isinstance(rows, list):
-        return format_response(list([r for r in rows]))
+        return list([r for r in rows])
     else:
-        return format_response(f"{rows} rows affected.")
+        return f"{rows} rows affected."
 
 
 def create_tool(action=None):
@@ -50,12 +291,51 @@ def create_tool(action=None):
     :return: An async function that performs SQL execution with the specified action constraint
     """
 
+    if action == "SELECT":
+        async def select_tool(sql, ctx: Context, limit: int | None = None, result_format: ResultFormat = "text",
+                              chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE):
+            return await execute_sql_by_action(sql, action=action, row_limit=limit, result_format=result_format,
+                                               ctx=ctx, chunk_size=chunk_size)
+
+        return select_tool
+
     async def tool(sql):
         return await execute_sql_by_action(sql, action=action)
 
     return tool
 
 
+def get_permitted_actions():
+    """
+    Determine the SQL actions that should be exposed as fine-grained tools.
+
+    :return: List of actions granted by user privileges and allowed by the tool ACLs
+    """
+    user_privilege = get_context_attribute("user_privilege")
+    if not user_privilege:
+        return []
+
+    privileged_operations = [
+        o for o in global_privilege_operations if o in user_privilege.keys()
+    ]
+
+    # Apply white list filter if configured
+    white_tool_list = get_context_attribute("white_tool_list")
+    if white_tool_list:
+        privileged_operations = [
+            o for o in privileged_operations if o in white_tool_list
+        ]
+    else:
+        # Apply black list filter if configured
+        black_tool_list = get_context_attribute("black_tool_list")
+        if black_tool_list:
+            privileged_operations = [
+                o for o in privileged_operations if o not in black_tool_list
+            ]
+
+    return privileged_operations
+
+
 def build_sql_exec_tools():
     """
     Build and register SQL execution tools with MCP based on user privileges and configuration.
@@ -70,33 +350,44 @@ def build_sql_exec_tools():
         )
     else:
         # Fine-grained tools for each allowed operation
-        user_privilege = get_context_attribute("user_privilege")
-        if user_privilege:
-            privileged_operations = [
-                o for o in global_privilege_operations if o in user_privilege.keys()
-            ]
+        for action in get_permitted_actions():
+            mcp.add_tool(
+                create_tool(action),
+                name=action.lower(),
+                description=_common_sql_exe_param_prompt(action),
+            )
+
+
+def refresh_sql_exec_tools() -> bool:
+    """
+    Re-align registered fine-grained SQL execution tools with current privileges and tool ACLs.
+
+    :return: True if any tool was added or removed, False otherwise
+    """
+    if get_context_attribute("disable_fine_gran_tool"):
+        return False
+
+    permitted = set(get_permitted_actions())
+    changed = False
+
+    for action in global_privilege_operations:
+        name = action.lower()
+        registered = has_tool(name)
+
+        if registered and action not in permitted:
+            # Privilege revoked or tool denied by ACL
+            remove_tool(name)
+            changed = True
+        elif not registered and action in permitted:
+            mcp.add_tool(
+                create_tool(action),
+                name=name,
+                description=_common_sql_exe_param_prompt(action),
+            )
+            changed = True
+
+    return changed
 
-            # Apply white list filter if configured
-            white_tool_list = get_context_attribute("white_tool_list")
-            if white_tool_list:
-                privileged_operations = [
-                    o for o in privileged_operations if o in white_tool_list
-                ]
-            else:
-                # Apply black list filter if configured
-                black_tool_list = get_context_attribute("black_tool_list")
-                if black_tool_list:
-                    privileged_operations = [
-                        o for o in privileged_operations if o not in black_tool_list
-                    ]
-
-            for action in privileged_operations:
-                mcp.add_tool(
-                    create_tool(action),
-                    name=action.lower(),
-                    description=_common_sql_exe_param_prompt(action),
-                )
-    
 
 def _common_sql_exe_param_prompt(action):
     """
@@ -105,9 +396,15 @@ def _common_sql_exe_param_prompt(action):
     :param action: The SQL action type
     :return: Formatted tool description
     """
-    return f"""
+    description = f"""
 Execute a `{action}` SQL statement
-    - sql (str): The {action} SQL. Other operations is not allowed"""
+    - sql (str): The {action} SQL. Other operations is not allowed. Multiple {action} statements separated by ';' are executed in order within a single call, and a list with the result of each statement is returned."""
+
+    if action == "SELECT":
+        description += """
+    - limit (int, optional): Maximum number of rows returned by a query without LIMIT or aggregation. Defaults to the server setting; 0 for unlimited. Truncated results are followed by a note."""
+
+    return description
 
 
 def _common_sql_exe_param_prompt_with_single():
@@ -119,5 +416,5 @@ def _common_sql_exe_param_prompt_with_single():
     return f"""
 Execute any SQL statement
     - sql (str): The SQL statement to run. This SQL string can contain a wide variety of database operations, including but not limited to SELECT, DELETE, UPDATE, INSERT, and other valid SQL commands that interact with the database. It allows for flexible execution of queries tailored to different use cases such as retrieving data, modifying records, or managing database structure.
-    The execute tool is designed to run only a single command at a time. If you need to perform multiple operations, such as transactions, they must be executed separately. For example, the following calling is not supported: execute("BEGIN; Query; COMMIT;")
+    Multiple statements separated by ';' are executed in order on one connection within a single call and are applied atomically; a list with the result of each statement is returned. Transaction control statements are not allowed among them. For example, the following calling is not supported: execute("BEGIN; Query; COMMIT;")
 """
@@ -1,8 +1,10 @@
 import sqlglot
 from collections import defaultdict
+from typing import List
 
 from db_adapters.db_constants import DB_OBJ_TYPE_ENUM
 from tools.utils import get_context_attribute
+from tools.sql_rewriter import rewrite_dialect
 
 
 class SQLChecker:
@@ -22,7 +24,7 @@ class SQLChecker:
         self.permissions = None
 
         try:
-            self._parsed = sqlglot.parse_one(self.sql)
+            self._parsed = sqlglot.parse_one(self.sql, read=rewrite_dialect)
         except Exception as e:
             raise RuntimeError(f"Invalid SQL format: {str(e)}")
 
@@ -37,6 +39,60 @@ class SQLChecker:
 
         self.sql_type = sql_type
 
+    @staticmethod
+    def split_statements(sql: str) -> List[str]:
+        """
+        Split a SQL script into individual statements, keeping the original text of each statement.
+
+        :param sql: One or more SQL statements separated by semicolons
+        :return: List of non-empty SQL statements
+        :raises RuntimeError: If the SQL cannot be tokenized
+        """
+        try:
+            tokens = sqlglot.tokenize(sql, read=rewrite_dialect)
+        except Exception as e:
+            raise RuntimeError(f"Invalid SQL format: {str(e)}")
+
+        statements = []
+        start, end = None, None
+        for token in tokens:
+            if token.token_type == sqlglot.TokenType.SEMICOLON:
+                if start is not None:
+                    statements.append(sql[start:end + 1])
+                start = None
+            else:
+                # Statement spans from its first to its last token (comments in between are kept)
+                if start is None:
+                    start = token.start
+                end = token.end
+
+        if start is not None:
+            statements.append(sql[start:end + 1])
+
+        return statements
+
+    def is_transaction_control(self) -> bool:
+        """
+        Check whether the SQL statement is a transaction control statement (BEGIN, COMMIT, ROLLBACK).
+
+        :return: True if the statement controls transactions, False otherwise
+        """
+        return isinstance(
+            self._parsed,
+            (sqlglot.exp.Transaction, sqlglot.exp.Commit, sqlglot.exp.Rollback),
+        )
+
+    def is_ddl(self) -> bool:
+        """
+        Check whether the SQL statement creates, alters or drops database objects.
+
+        :return: True if the statement is DDL, False otherwise
+        """
+        return isinstance(
+            self._parsed,
+            (sqlglot.exp.Create, sqlglot.exp.Alter, sqlglot.exp.Drop),
+        )
+
     def check_operation_match(self, action) -> bool:
         """
         Verify if the SQL statement matches the specified action type.
@@ -125,6 +181,25 @@ class SQLChecker:
 
         return True
 
+    def get_modified_columns(self):
+        """
+        Get the table and columns whose values are written by an INSERT or UPDATE statement.
+
+        :return: A tuple (table, columns) where columns is None if all columns are written
+                 (INSERT without a column list), or None if the statement writes no values
+        """
+        if self.sql_type == "INSERT":
+            table = self._get_insert_target_table()
+            columns = self._get_insert_target_columns()
+            return (table, columns or None) if table else None
+
+        if self.sql_type == "UPDATE":
+            table = self._get_update_target_table()
+            columns = self._get_update_target_columns()
+            return (table, columns) if table and columns else None
+
+        return None
+
     def _extract_tables_and_columns(self):
         """
         Parse the SQL statement and extract all accessed tables and columns.
@@ -0,0 +1,135 @@
+import sqlglot
+from typing import List, Optional
+
+# Dialect used for rewriting SQL that is executed as-is on the database
+rewrite_dialect = "postgres"
+
+
+def get_limit(expression) -> Optional[int]:
+    """
+    Get the constant LIMIT of a top-level query.
+
+    :param expression: Parsed SQL expression
+    :return: The limit value, or None if there is no constant LIMIT
+    """
+    limit = expression.args.get("limit")
+    if limit is None:
+        return None
+
+    value = limit.args.get("expression")
+    if isinstance(value, sqlglot.exp.Literal) and not value.is_string:
+        try:
+            return int(value.this)
+        except ValueError:
+            return None
+    return None
+
+
+def is_plain_query(expression) -> bool:
+    """
+    Check whether a statement is a query whose only effect is to return rows, so that bounding them has no
+    other effect: not SELECT INTO, and without locking clauses or data-modifying CTEs.
+
+    :param expression: Parsed SQL expression
+    :return: True if the statement is a plain query
+    """
+    if not isinstance(expression, sqlglot.exp.Query):
+        return False
+
+    if expression.args.get("into") is not None or expression.find(sqlglot.exp.Lock) is not None:
+        return False
+
+    return expression.find(sqlglot.exp.Insert, sqlglot.exp.Update, sqlglot.exp.Delete, sqlglot.exp.Merge) is None
+
+
+def inject_limit(sql: str, limit: int) -> Optional[str]:
+    """
+    Bound the number of rows returned by a top-level query with a LIMIT clause.
+
+    An existing constant LIMIT is kept if it is already tighter than the given one.
+
+    :param sql: The SELECT statement
+    :param limit: Maximum number of rows to return
+    :return: The rewritten SQL, or None if the SQL is unchanged or cannot be rewritten
+    """
+    try:
+        expression = sqlglot.parse_one(sql, read=rewrite_dialect)
+    except Exception:
+        return None
+
+    if not is_plain_query(expression):
+        return None
+
+    current_limit = get_limit(expression)
+    if current_limit is not None and current_limit <= limit:
+        return None
+
+    return expression.limit(limit).sql(dialect=rewrite_dialect)
+
+
+def has_aggregate(expression) -> bool:
+    """
+    Check whether a top-level query aggregates its rows.
+
+    :param expression: Parsed SQL expression
+    :return: True if the query has GROUP BY or aggregate functions in its projections
+    """
+    if not isinstance(expression, sqlglot.exp.Select):
+        return False
+
+    if expression.args.get("group"):
+        return True
+
+    for projection in expression.expressions:
+        for func in projection.find_all(sqlglot.exp.AggFunc):
+            # Skip aggregates inside subqueries or window functions
+            if func.find_ancestor(sqlglot.exp.Subquery, sqlglot.exp.Window) is None:
+                return True
+    return False
+
+
+def bound_rows(sql: str, row_limit: int) -> Optional[str]:
+    """
+    Add LIMIT row_limit + 1 to a top-level query without LIMIT or aggregates, so that the
+    database can stop early while truncation remains detectable.
+
+    :param sql: The SELECT statement
+    :param row_limit: Maximum number of rows to return
+    :return: The rewritten SQL, or None if the SQL needs no bound or cannot be rewritten
+    """
+    try:
+        expression = sqlglot.parse_one(sql, read=rewrite_dialect)
+    except Exception:
+        return None
+
+    if not is_plain_query(expression):
+        return None
+
+    if expression.args.get("limit") is not None or has_aggregate(expression):
+        return None
+
+    return expression.limit(row_limit + 1).sql(dialect=rewrite_dialect)
+
+
+def add_returning(sql: str, columns: List[str]) -> Optional[str]:
+    """
+    Add a RETURNING clause to an INSERT or UPDATE statement, capturing the written values of columns.
+
+    :param sql: The INSERT or UPDATE statement
+    :param columns: Columns to return
+    :return: The rewritten SQL, or None if the SQL already returns rows or cannot be rewritten
+    """
+    try:
+        expression = sqlglot.parse_one(sql, read=rewrite_dialect)
+        returned = [sqlglot.parse_one(column, read=rewrite_dialect) for column in columns]
+    except Exception:
+        return None
+
+    if not isinstance(expression, (sqlglot.exp.Insert, sqlglot.exp.Update)):
+        return None
+
+    if expression.args.get("returning") is not None:
+        return None
+
+    expression.set("returning", sqlglot.exp.Returning(expressions=returned))
+    return expression.sql(dialect=rewrite_dialect)
@@ -1,4 +1,4 @@
-from tools.utils import get_db_adapter, format_response, response_type
+from tools.utils import get_db_adapter, get_context_attribute, format_response, response_type
 from mcp_constants import default_res
 from mcp_context import mcp
 
@@ -13,6 +13,15 @@ async def begin() -> response_type:
     db_adapter = get_db_adapter()
 
     await db_adapter.begin()
+
+    # A pending transaction is released like a non-transactional statement
+    value_index_manager = get_context_attribute("value_index_manager")
+    if value_index_manager:
+        if db_adapter.config.readonly:
+            value_index_manager.maintainer.rollback()
+        else:
+            value_index_manager.maintainer.commit()
+
     return format_response(default_res)
 
 @mcp.tool(description="Commit current transaction")
@@ -25,6 +34,12 @@ async def commit() -> response_type:
     db_adapter = get_db_adapter()
 
     await db_adapter.commit()
+
+    # Apply the value index updates of the transaction
+    value_index_manager = get_context_attribute("value_index_manager")
+    if value_index_manager:
+        value_index_manager.maintainer.commit()
+
     return format_response(default_res)
 
 
@@ -38,4 +53,9 @@ async def rollback() -> response_type:
     db_adapter = get_db_adapter()
 
     await db_adapter.rollback()
+
+    value_index_manager = get_context_attribute("value_index_manager")
+    if value_index_manager:
+        value_index_manager.maintainer.rollback()
+
     return format_response(default_res)
\ No newline at end of file
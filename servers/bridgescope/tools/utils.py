@@ -2,13 +2,31 @@ import mcp.types as types
 from typing import Any, Dict, List
 from collections import defaultdict
 
-from sentence_transformers import SentenceTransformer
-
 import mcp_context
 from mcp_context import MCPContext
 from mcp_constants import response_type
 
 from db_adapters.base_adapter import BaseAdapter
+from embeddings.base import EmbeddingBackend
+
+# Data plane of the proxy server (`pip install mcp-proxy-exec`), to exchange large results as payloads or
+# shared-memory handles. Without it, results are only exchanged as text.
+try:
+    from mpe.data_plane import PayloadArg, ResultFormat, ChunkSize, DEFAULT_CHUNK_SIZE, format_result, load_argument, stream_result
+except ImportError:
+    ResultFormat, ChunkSize, DEFAULT_CHUNK_SIZE = str, int, 10000
+
+    def PayloadArg(annotation: Any) -> Any:
+        return annotation
+
+    def load_argument(arg: Any) -> Any:
+        return arg
+
+    def format_result(value: Any, result_format: str = "text", note: str | None = None) -> response_type:
+        return [types.TextContent(type="text", text=str(value) + (f"\n# {note}" if note else ""))]
+
+    async def stream_result(ctx, chunks) -> response_type:
+        return format_result([row async for chunk in chunks for row in chunk])
 
 
 def format_response(res: Any) -> response_type:
@@ -34,11 +52,11 @@ def get_db_adapter() -> BaseAdapter:
     return db_adapter
 
 
-def get_semantic_model() -> SentenceTransformer:
+def get_semantic_model() -> EmbeddingBackend:
     """
     Get the semantic model from the global context.
 
-    :return: SentenceTransformer instance.
+    :return: Embedding backend instance.
     :raises RuntimeError: If the model is not initialized.
     """
     semantic_model = get_context_attribute("semantic_model")
@@ -47,6 +65,19 @@ def get_semantic_model() -> SentenceTransformer:
     return semantic_model
 
 
+def get_value_index_manager():
+    """
+    Get the value index manager from the global context.
+
+    :return: ValueIndexManager instance.
+    :raises RuntimeError: If the manager is not initialized.
+    """
+    value_index_manager = get_context_attribute("value_index_manager")
+    if value_index_manager is None:
+        raise RuntimeError("Value index not initialized")
+    return value_index_manager
+
+
 def get_context_attribute(attribute_name: str) -> Any:
     """
     Get the value of a specific attribute from the global MCP context.
@@ -0,0 +1,183 @@
+import math
+import asyncio
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from db_adapters.base_adapter import BaseAdapter
+from mcp_constants import bloom_fp_rate, value_index_max_values
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings. Positions are derived from one 128-bit BLAKE2 digest by double hashing.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = bloom_fp_rate):
+        """
+        Initialize filter.
+
+        :param capacity: Expected number of values.
+        :param fp_rate: Target false positive rate at capacity.
+        """
+        capacity = max(capacity, 1)
+        self.n_bits = max(int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)), 64)
+        self.n_hashes = max(int(round(self.n_bits / capacity * math.log(2))), 1)
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, values: List[str]) -> np.ndarray:
+        digests = np.frombuffer(
+            b"".join(hashlib.blake2b(v.encode("utf-8"), digest_size=16).digest() for v in values),
+            dtype=np.uint64,
+        ).reshape(-1, 2)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        return (digests[:, :1] + steps * digests[:, 1:]) % np.uint64(self.n_bits)
+
+    def add_many(self, values: Iterable[str]):
+        """
+        Add values to the filter.
+
+        :param values: Values
+        """
+        values = list(values)
+        if not values:
+            return
+        positions = self._positions(values).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+        self.count += len(values)
+
+    def contains_many(self, values: List[str]) -> List[bool]:
+        """
+        Probe values. False means the value is certainly absent; True means it is probably present.
+
+        :param values: Values
+        :return: Probe result of each value
+        """
+        if not values:
+            return []
+        positions = self._positions(values)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1).tolist()
+
+    def __contains__(self, value: str) -> bool:
+        return self.contains_many([value])[0]
+
+
+class BloomFilterManager:
+    """
+    Per-column Bloom filters over distinct values, built in the background on first probe of a column.
+
+    Only text columns get a filter: other types have several spellings of the same value (e.g., 5 and 5.0),
+    so a miss in the filter would not prove that the value is absent. Columns with more than
+    `value_index_max_values` distinct values get none either, as their values are not all fetched.
+    """
+
+    def __init__(self, track=None, fp_rate: float = bloom_fp_rate):
+        """
+        Initialize manager.
+
+        :param track: Optional coroutine function (db_adapter, keys) called before the values of columns are
+                      fetched, so that writes by other clients during a build are caught up later.
+        :param fp_rate: Target false positive rate of the filters.
+        """
+        self.track = track
+        self.fp_rate = fp_rate
+        self.filters: Dict[Tuple[str, str], BloomFilter] = {}
+        self._builds: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._unsupported = set()
+
+        # Values written while a filter is being built
+        self._added: Dict[Tuple[str, str], List[str]] = {}
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """
+        Get the columns whose filter is built or being built.
+
+        :return: Keys as (table, column)
+        """
+        return [*self.filters, *self._builds]
+
+    def get(self, db_adapter: BaseAdapter, table: str, column: str) -> Optional[BloomFilter]:
+        """
+        Get the filter of a column, starting to build it in the background if needed.
+
+        :param db_adapter: Database adapter used to fetch distinct values
+        :param table: Table name
+        :param column: Column name
+        :return: The filter, or None while it is being built or if the column is not a text column
+        """
+        key = (table, column)
+        bloom = self.filters.get(key)
+        # Builds run detached from the call, so they must not share the session of an explicit transaction
+        if getattr(db_adapter, "in_nested", False):
+            return bloom
+        if bloom is None and key not in self._builds and key not in self._unsupported:
+            self._added[key] = []
+            self._builds[key] = asyncio.create_task(self._build(db_adapter, key))
+        return bloom
+
+    async def _build(self, db_adapter: BaseAdapter, key: Tuple[str, str]):
+        table, column = key
+        try:
+            if self.track:
+                await self.track(db_adapter, [key])
+
+            if getattr(db_adapter, "in_nested", False):
+                # A transaction began in the meantime, build again on a later probe
+                return
+
+            rows = await db_adapter.execute_query(
+                f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT {value_index_max_values}"
+            )
+            values = [row[0] for row in rows]
+            if len(values) >= value_index_max_values:
+                # A filter missing some values would have false negatives
+                logger.info(f"Too many distinct values in {key[0]}.{key[1]} for a Bloom filter")
+                self._unsupported.add(key)
+                return
+            if not all(isinstance(value, str) for value in values):
+                self._unsupported.add(key)
+                return
+
+            def build():
+                # Leave room for values added by later writes
+                bloom = BloomFilter(2 * len(values), self.fp_rate)
+                bloom.add_many(values)
+                return bloom
+
+            bloom = await asyncio.to_thread(build)
+            # Values written during the build
+            bloom.add_many(self._added[key])
+            self.filters[key] = bloom
+            logger.info(f"Built Bloom filter of {key[0]}.{key[1]} with {len(values)} values")
+        except Exception as e:
+            logger.warning(f"Failed to build Bloom filter of {key[0]}.{key[1]}: {str(e)}")
+        finally:
+            self._builds.pop(key, None)
+            self._added.pop(key, None)
+
+    def add(self, key: Tuple[str, str], values: Iterable[str]):
+        """
+        Add written values to the filter of a column, if built or being built.
+
+        :param key: Filter key as (table, column)
+        :param values: New values
+        """
+        bloom = self.filters.get(key)
+        if bloom is not None:
+            bloom.add_many(values)
+        elif key in self._added:
+            self._added[key].extend(values)
+
+    def invalidate(self, table: str, column: str):
+        """
+        Drop the filter of a column.
+
+        :param table: Table name
+        :param column: Column name
+        """
+        self.filters.pop((table, column), None)
+        self._unsupported.discard((table, column))
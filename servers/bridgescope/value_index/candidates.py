@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_adapters.base_adapter import BaseAdapter
+from value_index.trigram import TrigramIndex
+
+
+class CandidateGenerator:
+    """
+    Lexical candidate generation for value search. Uses PostgreSQL pg_trgm similarity on the full column,
+    served by a trigram index if one exists, or an in-process trigram index when the extension is unavailable.
+    """
+
+    def __init__(self, fetch_values):
+        """
+        Initialize generator.
+
+        :param fetch_values: Coroutine function (db_adapter, table, column) -> distinct values, used to build
+                             in-process trigram indexes.
+        """
+        self.fetch_values = fetch_values
+        self.pg_trgm: Optional[bool] = None
+        self._indexes: Dict[Tuple[str, str], TrigramIndex] = {}
+
+    async def check_pg_trgm(self, db_adapter: BaseAdapter) -> bool:
+        """
+        Check whether the pg_trgm extension is installed in the database.
+
+        :param db_adapter: Database adapter
+        :return: True if pg_trgm is available, False otherwise
+        """
+        if self.pg_trgm is None:
+            try:
+                rows = await db_adapter.execute_query("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                self.pg_trgm = bool(rows)
+            except SQLAlchemyError:
+                self.pg_trgm = False
+
+            if not self.pg_trgm:
+                logger.info("pg_trgm is not available, fall back to in-process trigram indexes")
+
+        return self.pg_trgm
+
+    async def generate(self, db_adapter: BaseAdapter, table: str, column: str, target: str, n: int) -> List[str]:
+        """
+        Get the top-n lexically similar values of a column.
+
+        :param db_adapter: Database adapter
+        :param table: Table name
+        :param column: Column name
+        :param target: Target value
+        :param n: Number of candidates
+        :return: Candidate values in descending order of trigram similarity
+        """
+        if await self.check_pg_trgm(db_adapter):
+            # KNN ordering by trigram distance, which a GiST trigram index on the column serves directly.
+            # Rows are oversampled since the column may contain duplicates.
+            literal = sqlglot.exp.Literal.string(target).sql(dialect="postgres")
+            query = (
+                f"SELECT {column}::text FROM {table} WHERE {column} IS NOT NULL "
+                f"ORDER BY {column}::text <-> {literal} LIMIT {n * 4}"
+            )
+            rows = await db_adapter.execute_query(query)
+            return list(dict.fromkeys(row[0] for row in rows))[:n]
+
+        key = (table, column)
+        index = self._indexes.get(key)
+        if index is None:
+            index = TrigramIndex(await self.fetch_values(db_adapter, table, column))
+            self._indexes[key] = index
+
+        return index.search(target, n)
+
+    def invalidate(self, table: str, column: str):
+        """
+        Drop the in-process trigram index of a column.
+
+        :param table: Table name
+        :param column: Column name
+        """
+        self._indexes.pop((table, column), None)
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from value_index.hnsw import HNSWIndex
+from value_index.ivf import IVFIndex
+
+EMBEDDINGS_FILE = "embeddings.npy"
+VALUES_FILE = "values.jsonl"
+META_FILE = "meta.json"
+SEGMENT_PREFIX = "segment-"
+
+
+class ColumnValueIndex:
+    """
+    Persistent embedding index of the distinct values of a single column.
+
+    The index directory holds:
+        - embeddings.npy: L2-normalized float32 matrix (one row per value), memory-mapped on load
+        - values.jsonl: the values, one JSON string per line, in the same order as the matrix rows
+        - meta.json: model id, embedding dimension and number of values
+        - optional ANN index files (HNSW graph or IVF lists) for high-cardinality columns
+        - optional segments (segment-<time>-<id>.npy / .jsonl) of values appended after the build
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize index.
+
+        :param path: Directory of the index.
+        """
+        self.path = path
+        self.meta: Optional[dict] = None
+        self.embeddings: Optional[np.ndarray] = None
+        self.values: List[str] = []
+        self.ann = None
+
+        # Appended (values, embeddings) segments, always searched exactly
+        self.segments: List[Tuple[List[str], np.ndarray]] = []
+        self._value_set: Optional[set] = None
+
+    def exists(self, model_id: Optional[str] = None) -> bool:
+        """
+        Check whether a complete index exists on disk.
+
+        :param model_id: If given, the index must also be built with this model.
+        :return: True if the index can be loaded, False otherwise
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return False
+        return model_id is None or meta.get("model_id") == model_id
+
+    def load(self) -> "ColumnValueIndex":
+        """
+        Load the index from disk. The embedding matrix is memory-mapped rather than read into memory.
+
+        :return: The index itself
+        """
+        self.meta = self._read_meta()
+        if self.meta is None:
+            raise FileNotFoundError(f"No value index found in {self.path}")
+
+        self.embeddings = np.load(os.path.join(self.path, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(self.path, VALUES_FILE), "r", encoding="utf-8") as f:
+            self.values = [json.loads(line) for line in f]
+
+        self.ann = HNSWIndex.load(self.path, self.embeddings) or IVFIndex.load(self.path, self.embeddings)
+
+        self.segments = []
+        self._value_set = None
+        for name in sorted(os.listdir(self.path)):
+            # The values file is written last and marks a segment as complete
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl"):
+                segment = os.path.join(self.path, name[:-len(".jsonl")])
+                with open(segment + ".jsonl", "r", encoding="utf-8") as f:
+                    values = [json.loads(line) for line in f]
+                self.segments.append((values, np.load(segment + ".npy")))
+
+        return self
+
+    @property
+    def count(self) -> int:
+        """
+        Number of values in the index, including appended segments.
+        """
+        return len(self.values) + sum(len(values) for values, _ in self.segments)
+
+    def contains(self, value: str) -> bool:
+        """
+        Check whether a value is in the index.
+
+        :param value: The value
+        :return: True if the value is indexed, False otherwise
+        """
+        if self._value_set is None:
+            self._value_set = set(self.values)
+            for values, _ in self.segments:
+                self._value_set.update(values)
+        return value in self._value_set
+
+    def append(self, values: List[str], embeddings: np.ndarray):
+        """
+        Append new values as a segment, without rebuilding the index.
+
+        :param values: New distinct values
+        :param embeddings: Embeddings of the values, one row per value
+        """
+        if not values:
+            return
+
+        embeddings = normalize(np.asarray(embeddings, dtype=np.float32))
+        # Servers sharing the index directory append concurrently, so segment names are unique, and
+        # ordered by time of append
+        segment = os.path.join(self.path, f"{SEGMENT_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex[:12]}")
+        with open(segment + ".npy.tmp", "wb") as f:
+            np.save(f, embeddings)
+        os.replace(segment + ".npy.tmp", segment + ".npy")
+        with open(segment + ".jsonl.tmp", "w", encoding="utf-8") as f:
+            for value in values:
+                f.write(json.dumps(value, ensure_ascii=False) + "\n")
+        os.replace(segment + ".jsonl.tmp", segment + ".jsonl")
+
+        self.segments = self.segments + [(list(values), embeddings)]
+        if self._value_set is not None:
+            self._value_set.update(values)
+
+    def build_ann(self, backend: str = "auto"):
+        """
+        Build and persist an approximate nearest-neighbour index over the loaded embeddings.
+        Searches keep using the exact path until the ANN index is complete.
+
+        :param backend: "hnsw", "ivf", or "auto" (HNSW if hnswlib is installed, IVF otherwise)
+        """
+        if backend == "auto":
+            backend = "hnsw" if HNSWIndex.available() else "ivf"
+
+        ann = HNSWIndex(self.embeddings).build() if backend == "hnsw" else IVFIndex(self.embeddings).build()
+        ann.save(self.path)
+        self.ann = ann
+
+    def build(self, values: List[str], encode: Callable[[List[str]], np.ndarray], model_id: str, batch_size: int = 4096) -> "ColumnValueIndex":
+        """
+        Encode values and persist the index. Values are encoded and written in batches, so the full
+        matrix never has to be held in memory.
+
+        :param values: Distinct values of the column
+        :param encode: Function that encodes a batch of texts into a 2-D array
+        :param model_id: Identifier of the model used by `encode`
+        :param batch_size: Number of values encoded per batch
+        :return: The loaded index
+        """
+        batches = (encode(values[start:start + batch_size]) for start in range(0, len(values), batch_size))
+        return self.write(values, batches, model_id)
+
+    def write(self, values: List[str], batches: Iterable[np.ndarray], model_id: str) -> "ColumnValueIndex":
+        """
+        Persist the index from already encoded values. The index is written in a temporary directory
+        and moved into place at the end, so readers never see a partial index.
+
+        :param values: Distinct values of the column
+        :param batches: Consecutive batches of embeddings, one row per value
+        :param model_id: Identifier of the model that produced the embeddings
+        :return: The loaded index
+        """
+        parent = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=parent, prefix=".building-")
+
+        try:
+            matrix = None
+            start = 0
+            for batch in batches:
+                batch = np.asarray(batch, dtype=np.float32)
+                if matrix is None:
+                    matrix = np.lib.format.open_memmap(
+                        os.path.join(tmp_path, EMBEDDINGS_FILE),
+                        mode="w+",
+                        dtype=np.float32,
+                        shape=(len(values), batch.shape[1]),
+                    )
+                matrix[start:start + len(batch)] = normalize(batch)
+                start += len(batch)
+
+            dim = 0
+            if matrix is None:
+                np.save(os.path.join(tmp_path, EMBEDDINGS_FILE), np.zeros((0, 0), dtype=np.float32))
+            else:
+                dim = matrix.shape[1]
+                matrix.flush()
+                del matrix
+
+            with open(os.path.join(tmp_path, VALUES_FILE), "w", encoding="utf-8") as f:
+                for value in values:
+                    f.write(json.dumps(value, ensure_ascii=False) + "\n")
+
+            # meta.json is written last and marks the index as complete
+            with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"model_id": model_id, "dim": dim, "count": len(values)}, f)
+
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        return self.load()
+
+    def search(self, query: np.ndarray, k: int, exact: Optional[bool] = None) -> List[Tuple[str, float]]:
+        """
+        Find the values most similar to a query vector by cosine similarity.
+
+        :param query: Query embedding
+        :param k: Number of values to return
+        :param exact: Force exact (True) or approximate (False) search. By default, the ANN index is used if built.
+        :return: List of (value, similarity) pairs in descending order of similarity
+        """
+        if self.embeddings is None:
+            self.load()
+
+        if self.count == 0 or k <= 0:
+            return []
+
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+
+        ann = self.ann
+        if ann is not None and not exact:
+            ids, scores = ann.search(query, k)
+            results = [(self.values[i], float(score)) for i, score in zip(ids, scores)]
+        else:
+            results = self._search_exact(self.values, self.embeddings, query, k)
+
+        # Merge the top-k of appended segments
+        for values, embeddings in self.segments:
+            results.extend(self._search_exact(values, embeddings, query, k))
+        if self.segments:
+            results = sorted(results, key=lambda r: -r[1])[:k]
+
+        return results
+
+    @staticmethod
+    def _search_exact(values: List[str], embeddings: np.ndarray, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        n = len(values)
+        if n == 0:
+            return []
+
+        scores = embeddings @ query
+
+        # Partial selection of the top-k, then sort only those
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top])]
+
+        return [(values[i], float(scores[i])) for i in top]
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize the rows of a matrix.
+
+    :param matrix: 2-D array
+    :return: Row-normalized array (zero rows are left unchanged)
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
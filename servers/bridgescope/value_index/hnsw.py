@@ -0,0 +1,100 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+HNSW_FILE = "hnsw.bin"
+
+
+class HNSWIndex:
+    """
+    HNSW graph index over L2-normalized embeddings, backed by hnswlib (optional dependency).
+    """
+
+    name = "hnsw"
+
+    def __init__(self, embeddings: np.ndarray, ef_search: int = 64):
+        """
+        Initialize index.
+
+        :param embeddings: L2-normalized embedding matrix (may be memory-mapped).
+        :param ef_search: Size of the dynamic candidate list during search.
+        """
+        if hnswlib is None:
+            raise ImportError("hnswlib is not installed")
+
+        self.embeddings = embeddings
+        self.ef_search = ef_search
+        self.graph = None
+
+    @staticmethod
+    def available() -> bool:
+        """
+        Check whether hnswlib is installed.
+
+        :return: True if HNSW indexes can be built, False otherwise
+        """
+        return hnswlib is not None
+
+    def build(self, m: int = 16, ef_construction: int = 200, chunk_size: int = 65536) -> "HNSWIndex":
+        """
+        Insert every vector into the graph.
+
+        :param m: Number of bi-directional links per node.
+        :param ef_construction: Size of the dynamic candidate list during construction.
+        :param chunk_size: Number of vectors inserted at a time.
+        :return: The index itself
+        """
+        n, dim = self.embeddings.shape
+        self.graph = hnswlib.Index(space="ip", dim=dim)
+        self.graph.init_index(max_elements=n, ef_construction=ef_construction, M=m)
+
+        for start in range(0, n, chunk_size):
+            chunk = np.asarray(self.embeddings[start:start + chunk_size], dtype=np.float32)
+            self.graph.add_items(chunk, np.arange(start, start + len(chunk)))
+
+        return self
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximate top-k vectors by inner product.
+
+        :param query: L2-normalized query vector
+        :param k: Number of results
+        :return: Tuple of (row ids, scores) in descending order of score
+        """
+        k = min(k, self.graph.get_current_count())
+        self.graph.set_ef(max(self.ef_search, k))
+        labels, distances = self.graph.knn_query(query.reshape(1, -1), k=k)
+        # hnswlib reports inner product distance as 1 - <x, q>
+        return labels[0].astype(np.int64), (1 - distances[0]).astype(np.float32)
+
+    def save(self, path: str):
+        """
+        Persist the graph next to the embeddings.
+
+        :param path: Directory of the column index
+        """
+        self.graph.save_index(os.path.join(path, HNSW_FILE))
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray) -> Optional["HNSWIndex"]:
+        """
+        Load a persisted graph.
+
+        :param path: Directory of the column index
+        :param embeddings: Embedding matrix of the column index
+        :return: The index, or None if it does not exist or hnswlib is not installed
+        """
+        if hnswlib is None or not os.path.exists(os.path.join(path, HNSW_FILE)):
+            return None
+
+        index = cls(embeddings)
+        index.graph = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+        index.graph.load_index(os.path.join(path, HNSW_FILE), max_elements=len(embeddings))
+        return index
@@ -0,0 +1,148 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+ORDER_FILE = "ivf_order.npy"
+OFFSETS_FILE = "ivf_offsets.npy"
+
+
+class IVFIndex:
+    """
+    Inverted file index over L2-normalized embeddings in pure NumPy.
+
+    A spherical k-means coarse quantizer partitions the vectors into lists. A query only scores the
+    vectors in the `n_probe` lists whose centroids are closest to it.
+    """
+
+    name = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, n_probe: int = 16):
+        """
+        Initialize index.
+
+        :param embeddings: L2-normalized embedding matrix (may be memory-mapped).
+        :param n_probe: Number of lists scanned per query.
+        """
+        self.embeddings = embeddings
+        self.n_probe = n_probe
+
+        self.centroids: Optional[np.ndarray] = None
+        # Row ids grouped by list, and the start offset of each list in `order`
+        self.order: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    def build(self, n_lists: Optional[int] = None, n_iter: int = 10, sample_per_list: int = 64, chunk_size: int = 65536, seed: int = 0) -> "IVFIndex":
+        """
+        Train the coarse quantizer and assign every vector to a list.
+
+        :param n_lists: Number of lists, sqrt(n) by default.
+        :param n_iter: Number of k-means iterations.
+        :param sample_per_list: Number of training vectors sampled per list.
+        :param chunk_size: Number of vectors assigned at a time.
+        :param seed: Random seed.
+        :return: The index itself
+        """
+        n = len(self.embeddings)
+        if n_lists is None:
+            n_lists = int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(n, size=min(n, n_lists * sample_per_list), replace=False))
+        sample = np.asarray(self.embeddings[sample_ids], dtype=np.float32)
+
+        # Spherical k-means on the sample
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = self._assign(sample, centroids, chunk_size)
+            counts = np.bincount(assign, minlength=n_lists)
+
+            # Sum the vectors of each list in one pass over the sample sorted by list
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            non_empty = counts > 0
+            sums = np.zeros_like(centroids)
+            sums[non_empty] = np.add.reduceat(sample[order], starts[non_empty], axis=0)
+
+            # Re-seed empty lists with random training vectors
+            empty = ~non_empty
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            centroids = sums / norms
+
+        # Assign all vectors in chunks to bound memory usage
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, chunk_size):
+            chunk = np.asarray(self.embeddings[start:start + chunk_size], dtype=np.float32)
+            assign[start:start + len(chunk)] = self._assign(chunk, centroids, chunk_size)
+
+        self.centroids = centroids.astype(np.float32)
+        self.order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+        return self
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximate top-k vectors by inner product.
+
+        :param query: L2-normalized query vector
+        :param k: Number of results
+        :return: Tuple of (row ids, scores) in descending order of score
+        """
+        n_probe = min(self.n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+
+        candidates = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Sorted ids give sequential reads on memory-mapped embeddings
+        candidates.sort()
+        scores = self.embeddings[candidates] @ query
+
+        if k < len(candidates):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    def save(self, path: str):
+        """
+        Persist the index next to the embeddings.
+
+        :param path: Directory of the column index
+        """
+        np.save(os.path.join(path, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, ORDER_FILE), self.order)
+        np.save(os.path.join(path, OFFSETS_FILE), self.offsets)
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray) -> Optional["IVFIndex"]:
+        """
+        Load a persisted index.
+
+        :param path: Directory of the column index
+        :param embeddings: Embedding matrix of the column index
+        :return: The index, or None if it does not exist
+        """
+        if not os.path.exists(os.path.join(path, OFFSETS_FILE)):
+            return None
+
+        index = cls(embeddings)
+        index.centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+        index.order = np.load(os.path.join(path, ORDER_FILE), mmap_mode="r")
+        index.offsets = np.load(os.path.join(path, OFFSETS_FILE))
+        return index
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int) -> np.ndarray:
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            assign[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+        return assign
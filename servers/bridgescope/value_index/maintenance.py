@@ -0,0 +1,270 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from db_adapters.base_adapter import BaseAdapter
+from db_adapters.db_exception import DatabaseError
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a table or column name for matching: drop the schema and quotes, and ignore case.
+
+    :param name: Table or column name, possibly qualified or quoted
+    :return: Normalized name
+    """
+    return name.rsplit(".", 1)[-1].strip('"').lower()
+
+
+class IndexMaintainer:
+    """
+    Keeps loaded column value indexes and Bloom filters up to date without rebuilding them.
+
+    Values written by BridgeScope's own DML tools are captured and appended to the indexes as deltas.
+    Writes by other clients are detected by a periodic reconciliation of the table modification counters,
+    which are also raised by the captured writes: those are deducted so that they do not trigger a re-fetch.
+    """
+
+    def __init__(self, manager):
+        """
+        Initialize maintainer.
+
+        :param manager: ValueIndexManager whose loaded indexes are maintained.
+        """
+        self.manager = manager
+
+        # Deltas captured inside an explicit transaction, applied on commit only
+        self._staged: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._staged_rows: Dict[str, int] = defaultdict(int)
+        self._pending: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._flush_task: Optional[asyncio.Task] = None
+
+        # Last seen modification counter of each indexed column, and the number of rows written
+        # by captured statements since then
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._credits: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.interval: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._db_adapter: Optional[BaseAdapter] = None
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """
+        Get the columns with a loaded index, or a Bloom filter built or being built.
+
+        :return: Keys as (table, column)
+        """
+        return list(dict.fromkeys([*self.manager._indexes, *self.manager.blooms.keys()]))
+
+    def indexed_columns(self, table: str, columns: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+        """
+        Get the maintained columns among the columns of a table.
+
+        :param table: Table name
+        :param columns: Column names, or None for all columns of the table
+        :return: Keys as (table, column)
+        """
+        table = normalize_name(table)
+        columns = {normalize_name(column) for column in columns} if columns is not None else None
+        return [
+            key for key in self.keys()
+            if normalize_name(key[0]) == table and (columns is None or normalize_name(key[1]) in columns)
+        ]
+
+    def record(self, db_adapter: BaseAdapter, deltas: Dict[Tuple[str, str], List[str]],
+               written_rows: Optional[Dict[str, int]] = None):
+        """
+        Record values written to indexed columns by a successful statement.
+
+        :param db_adapter: Database adapter that executed the statement
+        :param deltas: Mapping from index keys to the written values
+        :param written_rows: Mapping from table names to the number of rows written by captured statements,
+                             whose values are all in the deltas
+        """
+        if getattr(db_adapter, "in_nested", False):
+            target, target_rows = self._staged, self._staged_rows
+        elif db_adapter.config.readonly:
+            # Changes outside explicit transactions are rolled back in readonly mode
+            return
+        else:
+            target, target_rows = self._pending, None
+
+        for key, values in deltas.items():
+            target[key].update(values)
+
+        for table, n in (written_rows or {}).items():
+            if target_rows is None:
+                self._credit(table, n)
+            else:
+                target_rows[table] += n
+
+        if target is self._pending:
+            self._schedule_flush()
+
+    def commit(self):
+        """
+        Apply the deltas of the committed transaction.
+        """
+        for key, values in self._staged.items():
+            self._pending[key].update(values)
+        for table, n in self._staged_rows.items():
+            self._credit(table, n)
+        self._staged.clear()
+        self._staged_rows.clear()
+        self._schedule_flush()
+
+    def rollback(self):
+        """
+        Discard the deltas of the rolled back transaction.
+        """
+        self._staged.clear()
+        self._staged_rows.clear()
+
+    def _credit(self, table: str, n: int):
+        # Only columns with a baseline counter, which the written rows will raise
+        for key in self.indexed_columns(table):
+            if key in self._counters:
+                self._credits[key] += n
+
+    def _schedule_flush(self):
+        if self._pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending:
+            pending, self._pending = self._pending, defaultdict(set)
+            for key, values in pending.items():
+                try:
+                    await self.append(key, values)
+                except Exception as e:
+                    logger.warning(f"Failed to update value index of {key[0]}.{key[1]}: {str(e)}")
+
+    async def append(self, key: Tuple[str, str], values: Iterable[str]) -> int:
+        """
+        Add values to the Bloom filter of a column, and embed the values missing from its loaded index
+        and append them to it.
+
+        :param key: Index key as (table, column)
+        :param values: Candidate new values
+        :return: Number of values appended to the index
+        """
+        values = list(dict.fromkeys(values))
+        self.manager.blooms.add(key, values)
+
+        index = self.manager._indexes.get(key)
+        if index is None:
+            return 0
+
+        new_values = [value for value in values if not index.contains(value)]
+        if not new_values:
+            return 0
+
+        embeddings = await self.manager.encode(new_values)
+        async with self.manager._locks[key]:
+            await asyncio.to_thread(index.append, new_values, embeddings)
+
+        logger.info(f"Appended {len(new_values)} new values to the value index of {key[0]}.{key[1]}")
+        return len(new_values)
+
+    async def track(self, db_adapter: BaseAdapter, keys: List[Tuple[str, str]]):
+        """
+        Take the current modification counters as the baseline of columns whose values are about to be
+        fetched, so that writes by other clients during the fetch are caught by the next reconciliation.
+
+        :param db_adapter: Database adapter
+        :param keys: Keys as (table, column)
+        """
+        keys = [key for key in keys if key not in self._counters]
+        if not keys or self._task is None:
+            return
+
+        try:
+            counters = await db_adapter.get_modification_counters(sorted({key[0] for key in keys}))
+        except (DatabaseError, NotImplementedError):
+            return
+        counters = {normalize_name(table): n for table, n in counters.items()}
+
+        for key in keys:
+            n = counters.get(normalize_name(key[0]))
+            if n is not None:
+                self._counters[key] = n
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the periodic reconciliation loop is running, i.e., writes by other clients are caught up.
+        """
+        return self._task is not None and not self._task.done()
+
+    async def start(self, db_adapter: BaseAdapter, interval: float):
+        """
+        Start the periodic reconciliation loop.
+
+        :param db_adapter: Database adapter
+        :param interval: Seconds between two reconciliation rounds
+        """
+        self._db_adapter = db_adapter
+        self.interval = interval
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the periodic reconciliation loop.
+        """
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile(self._db_adapter)
+            except NotImplementedError as e:
+                logger.warning(f"Stop reconciling value indexes: {str(e)}.")
+                return
+            except Exception as e:
+                logger.error(f"Failed to reconcile value indexes: {str(e)}.")
+
+    async def reconcile(self, db_adapter: BaseAdapter) -> int:
+        """
+        Catch up with writes by other clients. Only the modification counters of the indexed tables
+        are read, and distinct values are re-fetched only for tables whose counter has changed.
+
+        :param db_adapter: Database adapter
+        :return: Number of appended values
+        """
+        keys = self.keys()
+        if not keys:
+            return 0
+
+        try:
+            counters = await db_adapter.get_modification_counters(sorted({key[0] for key in keys}))
+        except DatabaseError as e:
+            logger.warning(f"Could not read table modification counters: {str(e)}.")
+            return 0
+        counters = {normalize_name(table): n for table, n in counters.items()}
+
+        changed = []
+        for key in keys:
+            n = counters.get(normalize_name(key[0]))
+            previous = self._counters.get(key)
+            self._counters[key] = n
+            if previous is None or n is None or n == previous:
+                continue
+
+            # Rows written by captured statements are already in the index. Their counts may reach the
+            # statistics later than the statements complete, so the credit is kept until used up.
+            credit = self._credits.pop(key, 0)
+            if 0 < n - previous <= credit:
+                self._credits[key] = credit - (n - previous)
+            else:
+                changed.append(key)
+
+        values = await db_adapter.gather(*[self.manager.fetch_values(db_adapter, *key) for key in changed])
+
+        appended = 0
+        for key, column_values in zip(changed, values):
+            appended += await self.append(key, column_values)
+        return appended
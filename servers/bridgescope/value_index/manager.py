@@ -0,0 +1,337 @@
+import os
+import asyncio
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from db_adapters.base_adapter import BaseAdapter
+from embeddings.base import EmbeddingBackend
+from embeddings.loader import ModelLoader
+from mcp_constants import value_index_max_values, value_index_batch_limit, default_ann_threshold, hybrid_candidates, mcv_frequency_weight
+from value_index.bloom import BloomFilterManager
+from value_index.candidates import CandidateGenerator
+from value_index.column_index import ColumnValueIndex, normalize
+from value_index.maintenance import IndexMaintainer, normalize_name
+from value_index.sampling import FrequencySampler, frequency_prior
+
+
+def index_key(table: str, column: str) -> Tuple[str, str]:
+    """
+    Get the key of a column index, so that spellings of the same column share one index.
+
+    :param table: Table name, possibly qualified or quoted
+    :param column: Column name, possibly quoted
+    :return: Key as (table, column), with the schema of a qualified table kept
+    """
+    return ".".join(normalize_name(part) for part in table.split(".")), normalize_name(column)
+
+
+class ValueIndexManager:
+    """
+    Manages persistent value indexes of columns. Indexes are built lazily on first use and reused
+    across calls and server restarts.
+    """
+
+    def __init__(self, index_dir: str, model_loader: ModelLoader, ann_threshold: int = default_ann_threshold, mode: str = "index"):
+        """
+        Initialize manager.
+
+        :param index_dir: Root directory of the indexes.
+        :param model_loader: Loader of the model used to encode values. Indexes built by other models are rebuilt.
+        :param ann_threshold: Number of distinct values from which a column also gets an ANN index, 0 to disable.
+        :param mode: Value search mode: "index" (semantic search over all values), "hybrid"
+                     (lexical candidates re-ranked semantically) or "mcv" (frequent and sampled values
+                     ranked by similarity and frequency).
+        """
+        self.index_dir = index_dir
+        self.model_loader = model_loader
+        self.semantic_model: Optional[EmbeddingBackend] = None
+        self.model_id: Optional[str] = None
+        self.ann_threshold = ann_threshold
+        self.mode = mode
+        self.candidates = CandidateGenerator(self.fetch_values)
+        self.sampler = FrequencySampler()
+
+        # The model is only used from one dedicated thread, keeping inference off the event loop
+        self._encode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+
+        # ANN indexes are built one at a time in the background
+        self._ann_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ann-build")
+        self._ann_pending = set()
+
+        self._indexes: Dict[Tuple[str, str], ColumnValueIndex] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._builds: Dict[Tuple[str, str], asyncio.Task] = {}
+
+        # Incremental updates of loaded indexes after writes
+        self.maintainer = IndexMaintainer(self)
+        self.blooms = BloomFilterManager(self.maintainer.track)
+
+    def index_path(self, db_adapter: BaseAdapter, table: str, column: str) -> str:
+        """
+        Get the directory of a column index. Indexes are separated per database and user.
+
+        :param db_adapter: Database adapter
+        :param table: Table name
+        :param column: Column name
+        :return: Directory path
+        """
+        config = db_adapter.config
+        key = f"{config.db_host}:{config.db_port}/{config.db_name}/{config.db_user}/{table}.{column}"
+        return os.path.join(self.index_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    async def get_index(self, db_adapter: BaseAdapter, table: str, column: str) -> ColumnValueIndex:
+        """
+        Get the index of a column, loading it from disk or building it if needed.
+
+        :param db_adapter: Database adapter used to fetch distinct values
+        :param table: Table name
+        :param column: Column name
+        :return: Loaded column index
+        """
+        indexes, _ = await self.get_indexes(db_adapter, [(table, column)])
+        return indexes[0]
+
+    async def get_indexes(self, db_adapter: BaseAdapter, columns: List[Tuple[str, str]], queries: List[str] = (),
+                          wait: bool = True) -> Tuple[List[Optional[ColumnValueIndex]], np.ndarray]:
+        """
+        Get the indexes of several columns and encode query texts at the same time.
+
+        Distinct values of unindexed columns are fetched concurrently. The queries and the values of
+        all unindexed columns up to `value_index_batch_limit` are encoded in a single batched call,
+        while larger columns are encoded in batches to bound memory. Encoding runs in a dedicated
+        thread, off the event loop.
+
+        :param db_adapter: Database adapter used to fetch distinct values
+        :param columns: List of (table, column)
+        :param queries: Texts to encode along with the column values
+        :param wait: Whether to build missing indexes before returning. Otherwise, they are built in the
+                     background and None is returned for them until they are ready.
+        :return: Tuple of (indexes in the order of `columns`, embeddings of `queries`)
+        """
+        await self.ready()
+        keys = [index_key(*column) for column in columns]
+        names = dict(zip(keys, columns))
+        # Columns being built in the background are not waited for
+        missing = sorted({key for key in keys if key not in self._indexes and (wait or key not in self._builds)})
+
+        async with AsyncExitStack() as stack:
+            # Avoid concurrent builds of the same column; locks are taken in order to avoid deadlocks
+            for key in missing:
+                await stack.enter_async_context(self._locks[key])
+
+            to_build = []
+            for key in missing:
+                if key in self._indexes:
+                    continue
+                index = ColumnValueIndex(self.index_path(db_adapter, *key))
+                if index.exists(self.model_id):
+                    self._register(key, index.load())
+                elif wait:
+                    to_build.append((key, index))
+                else:
+                    self._start_build(db_adapter, key, names[key], index)
+
+            await self.maintainer.track(db_adapter, [key for key, _ in to_build])
+            values = await db_adapter.gather(*[self.fetch_values(db_adapter, *names[key]) for key, _ in to_build])
+
+            # Encode queries and small columns in one call
+            batched = [i for i, v in enumerate(values) if len(v) <= value_index_batch_limit]
+            texts = list(queries) + [value for i in batched for value in values[i]]
+            embeddings = await self.encode(texts) if texts else np.empty((0, 0), dtype=np.float32)
+
+            offset = len(queries)
+            for i in batched:
+                (key, index), n = to_build[i], len(values[i])
+                logger.info(f"Building value index of {key[0]}.{key[1]} with {n} values")
+                await asyncio.to_thread(index.write, values[i], [embeddings[offset:offset + n]] if n else [], self.model_id)
+                self._register(key, index)
+                offset += n
+
+            for i in set(range(len(to_build))) - set(batched):
+                key, index = to_build[i]
+                logger.info(f"Building value index of {key[0]}.{key[1]} with {len(values[i])} values")
+                await asyncio.get_running_loop().run_in_executor(
+                    self._encode_executor, index.build, values[i], self.semantic_model.encode_uncached, self.model_id
+                )
+                self._register(key, index)
+
+        return [self._indexes.get(key) for key in keys], embeddings[:len(queries)]
+
+    def _start_build(self, db_adapter: BaseAdapter, key: Tuple[str, str], names: Tuple[str, str], index: ColumnValueIndex):
+        """
+        Build the index of a column in the background.
+
+        :param db_adapter: Database adapter used to fetch distinct values
+        :param key: Index key
+        :param names: Table and column names as given by the caller, used in queries
+        :param index: Index to build
+        """
+        # Builds run detached from the call, so they must not share the session of an explicit transaction
+        if key in self._builds or getattr(db_adapter, "in_nested", False):
+            return
+        self._builds[key] = asyncio.create_task(self._build(db_adapter, key, names, index))
+
+    async def _build(self, db_adapter: BaseAdapter, key: Tuple[str, str], names: Tuple[str, str], index: ColumnValueIndex):
+        try:
+            async with self._locks[key]:
+                if key in self._indexes:
+                    return
+
+                await self.maintainer.track(db_adapter, [key])
+                if getattr(db_adapter, "in_nested", False):
+                    # A transaction began in the meantime, build again on a later call
+                    return
+
+                values = await self.fetch_values(db_adapter, *names)
+                logger.info(f"Building value index of {key[0]}.{key[1]} with {len(values)} values in the background")
+                await asyncio.get_running_loop().run_in_executor(
+                    self._encode_executor, index.build, values, self.semantic_model.encode_uncached, self.model_id
+                )
+                self._register(key, index)
+        except Exception as e:
+            logger.warning(f"Failed to build value index of {key[0]}.{key[1]}: {str(e)}")
+        finally:
+            self._builds.pop(key, None)
+
+    async def hybrid_search(self, db_adapter: BaseAdapter, columns: List[Tuple[str, str]], targets: List[str], k: int, n_candidates: int = hybrid_candidates) -> List[List[str]]:
+        """
+        Two-stage value search: top-n lexical candidates by trigram similarity, re-ranked by the
+        embedding model. Encoding cost is bounded by the number of candidates rather than the column cardinality.
+
+        :param db_adapter: Database adapter
+        :param columns: List of (table, column)
+        :param targets: Target value of each column
+        :param k: Number of values returned per column
+        :param n_candidates: Number of lexical candidates per column
+        :return: Top-k values of each column
+        """
+        await self.ready()
+        candidates = await db_adapter.gather(*[
+            self.candidates.generate(db_adapter, table, column, target, n_candidates)
+            for (table, column), target in zip(columns, targets)
+        ])
+
+        # Encode all targets and candidates in one call
+        texts = list(targets) + [value for values in candidates for value in values]
+        embeddings = normalize(np.asarray(await self.encode(texts), dtype=np.float32))
+
+        results = []
+        offset = len(targets)
+        for i, values in enumerate(candidates):
+            scores = embeddings[offset:offset + len(values)] @ embeddings[i]
+            offset += len(values)
+            results.append([values[j] for j in np.argsort(-scores)[:k]])
+        return results
+
+    async def frequency_search(self, db_adapter: BaseAdapter, columns: List[Tuple[str, str]], targets: List[str], k: int, frequency_weight: float = mcv_frequency_weight) -> List[List[str]]:
+        """
+        Value search over frequency-aware candidates: the most common values from the planner statistics
+        and a block sample of the long tail. Values are ranked by semantic similarity plus a frequency prior.
+
+        :param db_adapter: Database adapter
+        :param columns: List of (table, column)
+        :param targets: Target value of each column
+        :param k: Number of values returned per column
+        :param frequency_weight: Weight of the log-scaled frequency prior in [0, 1] added to the cosine similarity
+        :return: Top-k values of each column
+        """
+        await self.ready()
+        candidates = await db_adapter.gather(*[
+            self.sampler.candidates(db_adapter, table, column) for table, column in columns
+        ])
+
+        # Encode all targets and candidates in one call
+        texts = list(targets) + [value for values in candidates for value in values]
+        embeddings = normalize(np.asarray(await self.encode(texts), dtype=np.float32))
+
+        results = []
+        offset = len(targets)
+        for i, values in enumerate(candidates):
+            scores = embeddings[offset:offset + len(values)] @ embeddings[i]
+            scores = scores + frequency_weight * np.asarray(frequency_prior(list(values.values())), dtype=np.float32)
+            offset += len(values)
+
+            values = list(values)
+            results.append([values[j] for j in np.argsort(-scores)[:k]])
+        return results
+
+    async def ready(self):
+        """
+        Wait until the semantic model is loaded.
+
+        :raises RuntimeError: If the model could not be loaded
+        """
+        if self.semantic_model is None:
+            self.semantic_model = await self.model_loader.wait()
+            self.model_id = self.semantic_model.model_id
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in the dedicated encoding thread.
+
+        :param texts: Texts to encode
+        :return: 2-D array of embeddings
+        """
+        await self.ready()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._encode_executor, self.semantic_model.encode, texts
+        )
+
+    async def fetch_values(self, db_adapter: BaseAdapter, table: str, column: str) -> List[str]:
+        """
+        Fetch the distinct non-null values of a column.
+
+        :param db_adapter: Database adapter
+        :param table: Table name
+        :param column: Column name
+        :return: Values as strings
+        """
+        query = (
+            f"SELECT DISTINCT {column} FROM {table} "
+            f"WHERE {column} IS NOT NULL LIMIT {value_index_max_values}"
+        )
+        rows = await db_adapter.execute_query(query)
+        return [str(row[0]) for row in rows]
+
+    def _register(self, key: Tuple[str, str], index: ColumnValueIndex):
+        self._indexes[key] = index
+        self._schedule_ann(index)
+
+    def _schedule_ann(self, index: ColumnValueIndex):
+        """
+        Build the ANN index of a high-cardinality column in the background. Exact search is used meanwhile.
+
+        :param index: Loaded column index
+        """
+        if not self.ann_threshold or len(index.values) < self.ann_threshold:
+            return
+        if index.ann is not None or index.path in self._ann_pending:
+            return
+
+        self._ann_pending.add(index.path)
+        logger.info(f"Building ANN index for {len(index.values)} values in the background")
+
+        def done(future):
+            self._ann_pending.discard(index.path)
+            if future.exception() is not None:
+                logger.warning(f"Failed to build ANN index: {future.exception()}. Keep using exact search.")
+
+        self._ann_executor.submit(index.build_ann).add_done_callback(done)
+
+    def invalidate(self, table: str, column: str):
+        """
+        Drop the in-memory handle of a column index.
+
+        :param table: Table name
+        :param column: Column name
+        """
+        self._indexes.pop(index_key(table, column), None)
+        self.candidates.invalidate(table, column)
+        self.sampler.invalidate(table, column)
+        self.blooms.invalidate(table, column)
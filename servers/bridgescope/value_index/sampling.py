@@ -0,0 +1,167 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_adapters.base_adapter import BaseAdapter
+from mcp_constants import mcv_sample_rows, mcv_tail_values
+
+
+def _literal(value: str) -> str:
+    return sqlglot.exp.Literal.string(value).sql(dialect="postgres")
+
+
+def _catalog_name(name: str) -> Tuple[Optional[str], str]:
+    """
+    Get the schema and object name of an identifier as stored in the catalog.
+
+    :param name: Table or column name, possibly qualified or quoted
+    :return: Tuple of (schema or None, name)
+    """
+    identifiers = []
+    for part in sqlglot.parse_one(name, read="postgres").parts:
+        identifiers.append(part.name if part.args.get("quoted") else part.name.lower())
+    return (identifiers[-2] if len(identifiers) > 1 else None), identifiers[-1]
+
+
+class FrequencySampler:
+    """
+    Frequency-aware candidate values of a column. The most common values and their frequencies are read
+    from the planner statistics in `pg_stats` without touching the table, and the long tail is sampled
+    with `TABLESAMPLE SYSTEM`, which reads a fraction of the table blocks.
+    """
+
+    def __init__(self, sample_rows: int = mcv_sample_rows, tail_values: int = mcv_tail_values):
+        """
+        Initialize sampler.
+
+        :param sample_rows: Target number of rows read by the tail sample.
+        :param tail_values: Maximum number of tail values taken from the sample.
+        """
+        self.sample_rows = sample_rows
+        self.tail_values = tail_values
+        self._candidates: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    async def candidates(self, db_adapter: BaseAdapter, table: str, column: str) -> Dict[str, float]:
+        """
+        Get the candidate values of a column with their estimated frequencies.
+
+        :param db_adapter: Database adapter
+        :param table: Table name
+        :param column: Column name
+        :return: Mapping from values to their estimated fraction of rows
+        """
+        key = (table, column)
+        if key not in self._candidates:
+            mcv, null_frac = await self.most_common_values(db_adapter, table, column)
+            tail = await self.sample_tail(db_adapter, table, column, null_frac)
+
+            # Frequencies of the statistics are more accurate than those of the sample
+            self._candidates[key] = {**tail, **mcv}
+
+        return self._candidates[key]
+
+    async def most_common_values(self, db_adapter: BaseAdapter, table: str, column: str) -> Tuple[Dict[str, float], float]:
+        """
+        Read the most common values of a column from `pg_stats`.
+
+        :param db_adapter: Database adapter
+        :param table: Table name
+        :param column: Column name
+        :return: Tuple of (mapping from most common values to their frequencies, fraction of null rows).
+                 Empty if the column has not been analyzed.
+        """
+        schema, table_name = _catalog_name(table)
+        _, column_name = _catalog_name(column)
+
+        query = (
+            f"SELECT most_common_vals::text::text[], most_common_freqs, null_frac FROM pg_stats "
+            f"WHERE tablename = {_literal(table_name)} AND attname = {_literal(column_name)}"
+        )
+        if schema:
+            query += f" AND schemaname = {_literal(schema)}"
+        else:
+            query += " AND schemaname = ANY(current_schemas(false))"
+
+        try:
+            rows = await db_adapter.execute_query(query + " LIMIT 1")
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not read statistics of {table}.{column}: {str(e)}")
+            return {}, 0.0
+
+        if not rows:
+            return {}, 0.0
+
+        values, freqs, null_frac = rows[0]
+        mcv = dict(zip(values or [], freqs or []))
+        return {value: float(freq) for value, freq in mcv.items() if value is not None}, float(null_frac or 0.0)
+
+    async def sample_tail(self, db_adapter: BaseAdapter, table: str, column: str, null_frac: float = 0.0) -> Dict[str, float]:
+        """
+        Sample the most frequent values of a fraction of the table blocks.
+
+        :param db_adapter: Database adapter
+        :param table: Table name
+        :param column: Column name
+        :param null_frac: Fraction of null rows, to scale the frequencies
+        :return: Mapping from sampled values to their estimated frequencies
+        """
+        percent = 100.0
+        try:
+            rows = await db_adapter.execute_query(
+                f"SELECT reltuples FROM pg_class WHERE oid = to_regclass({_literal(table)})"
+            )
+            if rows and rows[0][0] and rows[0][0] > self.sample_rows:
+                percent = max(100.0 * self.sample_rows / rows[0][0], 0.01)
+        except SQLAlchemyError:
+            pass
+
+        # The window sum is computed before LIMIT, over all non-null sampled rows
+        def query(sample: str) -> str:
+            return (
+                f"SELECT {column}::text, count(*), sum(count(*)) OVER () FROM {table}{sample} WHERE {column} IS NOT NULL "
+                f"GROUP BY 1 ORDER BY 2 DESC LIMIT {self.tail_values}"
+            )
+
+        sample = f" TABLESAMPLE SYSTEM ({percent:.4g})" if percent < 100 else ""
+        try:
+            rows = await db_adapter.execute_query(query(sample))
+        except SQLAlchemyError:
+            if not sample:
+                raise
+            # Views and foreign tables do not support TABLESAMPLE
+            rows = await db_adapter.execute_query(query(""))
+
+        total = float(rows[0][2]) if rows else 0
+        return {value: (1.0 - null_frac) * count / total for value, count, _ in rows} if total else {}
+
+    def invalidate(self, table: str, column: str):
+        """
+        Drop the cached candidate values of a column.
+
+        :param table: Table name
+        :param column: Column name
+        """
+        self._candidates.pop((table, column), None)
+
+
+def frequency_prior(frequencies: List[float]) -> List[float]:
+    """
+    Map frequencies to [0, 1] on a log scale, so that frequent values are preferred without
+    drowning rare but similar values.
+
+    :param frequencies: Estimated frequencies of values
+    :return: Prior of each value
+    """
+    positive = [f for f in frequencies if f > 0]
+    if not positive:
+        return [0.0] * len(frequencies)
+
+    low, high = min(positive), max(positive)
+    if high == low:
+        return [1.0 if f > 0 else 0.0 for f in frequencies]
+
+    span = math.log(high / low)
+    return [math.log(f / low) / span if f > 0 else 0.0 for f in frequencies]
@@ -0,0 +1,72 @@
+import re
+from collections import defaultdict
+from typing import List, Set
+
+import numpy as np
+
+_word_pattern = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Extract trigrams the same way as PostgreSQL pg_trgm: lower-cased alphanumeric words,
+    padded with two spaces in front and one behind.
+
+    :param text: Input text
+    :return: Set of trigrams
+    """
+    grams = set()
+    for word in _word_pattern.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    In-process trigram inverted index, used for lexical candidate generation when pg_trgm is unavailable.
+    """
+
+    def __init__(self, values: List[str]):
+        """
+        Build index.
+
+        :param values: Distinct values of a column
+        """
+        self.values = values
+        self.sizes = np.zeros(len(values), dtype=np.int32)
+
+        postings = defaultdict(list)
+        for i, value in enumerate(values):
+            grams = trigrams(value)
+            self.sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def search(self, query: str, n: int) -> List[str]:
+        """
+        Find the values with the highest pg_trgm similarity to the query.
+
+        :param query: Query text
+        :param n: Number of candidates
+        :return: Candidate values in descending order of similarity
+        """
+        grams = trigrams(query)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+
+        # Number of shared trigrams of every value that shares at least one
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.values))
+        ids = np.flatnonzero(shared)
+        similarity = shared[ids] / (self.sizes[ids] + len(grams) - shared[ids])
+
+        if n < len(ids):
+            top = np.argpartition(-similarity, n - 1)[:n]
+        else:
+            top = np.arange(len(ids))
+        top = top[np.argsort(-similarity[top])]
+
+        return [self.values[i] for i in ids[top]]